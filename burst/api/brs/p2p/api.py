@@ -5,6 +5,7 @@ from django.conf import settings
 
 from burst.api.brs.p2p import queries
 from burst.api.brs.v1.api import BrsApiBase
+from burst.api.transport import Transport
 
 
 class P2PApi(BrsApiBase):
@@ -13,6 +14,15 @@ class P2PApi(BrsApiBase):
     headers = {"User-Agent": f"BRS/{settings.BRS_P2P_VERSION}"}
 
     _default_port = settings.DEFAULT_P2P_PORT
+    _transport = Transport(
+        retries=settings.P2P_API_RETRIES,
+        backoff=settings.NODE_API_RETRY_BACKOFF,
+        pool_size=2,
+        max_hosts=5000,
+        connect_timeout=settings.NODE_API_CONNECT_TIMEOUT,
+        failure_threshold=1,
+        reset_timeout=settings.NODE_API_BREAKER_RESET,
+    )
 
     def get_peers(self) -> list:
         return self._request(queries.GetPeers())["peers"]
@@ -1,72 +1,73 @@
 """ https://github.com/burst-apps-team/burstcoin/tree/develop/src/brs/http
 """
 
+from functools import lru_cache
 from urllib.parse import urlparse
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
-from requests import session
-from requests.exceptions import RequestException
 
 from burst.api.brs.v1 import queries
 from burst.api.exceptions import APIException, ClientException
+from burst.api.transport import Transport
 from burst.api.typing import JSONType
 
 
+@lru_cache(maxsize=4096)
+def normalize_node_address(node_address: str, default_port: int) -> str:
+    """ Validate address and add schema and default port if omitted """
+    if not node_address.startswith("http"):
+        node_address = f"http://{node_address}"
+
+    validate = URLValidator()
+    try:
+        validate(node_address)
+    except ValidationError:
+        raise ClientException("Not valid address")
+
+    parsed_url = urlparse(node_address)
+
+    if not parsed_url.port and not parsed_url.query:
+        node_address = f"{node_address}:{default_port}"
+
+    return node_address
+
+
 class BrsApiBase:
     endpoint = "burst"
     headers = None
     _default_port = settings.DEFAULT_API_V1_PORT
-    _session = None
+    _transport = Transport(
+        retries=settings.NODE_API_RETRIES,
+        backoff=settings.NODE_API_RETRY_BACKOFF,
+        pool_size=settings.NODE_API_POOL_SIZE,
+        max_hosts=100,
+        connect_timeout=settings.NODE_API_CONNECT_TIMEOUT,
+        failure_threshold=settings.NODE_API_BREAKER_THRESHOLD,
+        reset_timeout=settings.NODE_API_BREAKER_RESET,
+    )
 
     def __init__(self, node_address: str) -> None:
         """Constructor
         :param node_address: domain or ip address
         """
-        if not node_address.startswith("http"):
-            node_address = f"http://{node_address}"
-
-        validate = URLValidator()
-        try:
-            validate(node_address)
-        except ValidationError:
-            raise ClientException("Not valid address")
-
-        parsed_url = urlparse(node_address)
-
-        if not parsed_url.port and not parsed_url.query:
-            node_address = f"{node_address}:{self._default_port}"
-
-        self.node_url = node_address
-        self._session = session()
-
-    def _close_session(self) -> None:
-        """ Close session if exists"""
-        if self._session:
-            self._session.close()
-
-    def __del__(self) -> None:
-        """ Destructor """
-        self._close_session()
+        self.node_url = normalize_node_address(node_address, self._default_port)
 
     def _request(self, query: queries.QueryBase) -> JSONType:
-        """ Make HTTP request using requests module """
+        """ Make HTTP request through the shared transport """
         url = f"{self.node_url}/{self.endpoint}"
 
-        try:
-            response = self._session.request(
-                query.http_method,
-                url,
-                headers=self.headers,
-                json=query.params if query.http_method == "POST" else None,
-                params=query.params if query.http_method == "GET" else None,
-                timeout=query.timeout,
-                verify=False,
-            )
-            response.raise_for_status()
-        except RequestException as e:
-            raise APIException("network", e)
+        response = self._transport.request(
+            query.http_method,
+            url,
+            query.request_type,
+            query.timeout,
+            headers=self.headers,
+            json=query.params if query.http_method == "POST" else None,
+            params=query.params if query.http_method == "GET" else None,
+            verify=False,
+        )
 
         try:
             json_response = response.json()
@@ -3,7 +3,8 @@
 
 import abc, os
 
-from jsonschema import ValidationError, validate
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
 from burst.api.exceptions import APIException, ClientException
 
@@ -65,6 +66,16 @@ class QueryBase(abc.ABC):
         if unknown_params:
             raise ClientException(f"Unknown params: {unknown_params}")
 
+    @classmethod
+    def _get_validator(cls):
+        # checking the schema costs much more than validating data, once per class
+        validator = cls.__dict__.get("_validator")
+        if validator is None:
+            validator_class = validator_for(cls._response_json_schema)
+            validator_class.check_schema(cls._response_json_schema)
+            validator = cls._validator = validator_class(cls._response_json_schema)
+        return validator
+
     def validate_response(self, data) -> bool:
         # TODO: return true or raise
         if not self._response_json_schema:
@@ -73,12 +84,10 @@ class QueryBase(abc.ABC):
         if self._error_field in data:
             raise APIException(data)
 
-        try:
-            validate(data, self._response_json_schema)
-        except ValidationError as e:
-            raise APIException("malformed_data", e)
-        else:
-            return True
+        error = best_match(self._get_validator().iter_errors(data))
+        if error:
+            raise APIException("malformed_data", error)
+        return True
 
 
 class GetPeers(QueryBase):
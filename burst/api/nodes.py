@@ -0,0 +1,227 @@
+""" Set of wallet nodes with health checks, failover to the fastest healthy
+node and optional hedged requests.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from burst.api.brs.v1.api import BrsApi
+from burst.api.exceptions import APIException, BurstException
+from burst.api.transport import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# errors of Transport, the node could not answer; others are answers, an
+# errorCode for a bad request the other nodes would refuse the same way
+TRANSPORT_ERRORS = ("network", "circuit_open")
+
+
+def is_transport_error(e: BurstException) -> bool:
+    return isinstance(e, APIException) and bool(e.args) and e.args[0] in TRANSPORT_ERRORS
+
+
+class Node:
+    # weight of the last sample in the moving average
+    _alpha = 0.3
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self.api = BrsApi(address)
+        self.healthy = True
+        self.height = None
+        self.latency = None
+
+    def __repr__(self) -> str:
+        return f"Node({self.address})"
+
+    def observe(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = self._alpha * seconds + (1 - self._alpha) * self.latency
+
+
+class NodeSet:
+    """Routes calls of BrsApi methods to the lowest latency healthy node."""
+
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(
+        self,
+        addresses: list,
+        check_interval: float = 30,
+        max_height_lag: int = 3,
+        hedge: bool = False,
+        hedge_delay: float = 0.5,
+        hedge_min_samples: int = 20,
+    ) -> None:
+        if not addresses:
+            raise ValueError("Empty node set")
+
+        self.nodes = [Node(address) for address in addresses]
+        self.check_interval = check_interval
+        self.max_height_lag = max_height_lag
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._checking = False
+        self._histograms = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(4, 2 * len(self.nodes)), thread_name_prefix="nodeset"
+        )
+
+    def _check_node(self, node: Node) -> None:
+        started = self._clock()
+        try:
+            status = node.api.get_block_chain_status()
+        except BurstException as e:
+            logger.warning("Node health check failed: %s - %r", node.address, e)
+            node.healthy = False
+            return
+        node.observe(self._clock() - started)
+        node.height = status["numberOfBlocks"] - 1
+        node.healthy = True
+
+    def check_health(self) -> None:
+        try:
+            list(self._executor.map(self._check_node, self.nodes))
+
+            heights = [n.height for n in self.nodes if n.healthy]
+            if heights:
+                best = max(heights)
+                for node in self.nodes:
+                    # node is busy with sync
+                    if node.healthy and best - node.height > self.max_height_lag:
+                        node.healthy = False
+        finally:
+            with self._lock:
+                self._checked_at = self._clock()
+                self._checking = False
+
+    def _refresh_health(self) -> None:
+        """Schedule a health check in background if the last one is stale."""
+        with self._lock:
+            if self._checking:
+                return
+            if (
+                self._checked_at is not None
+                and self._clock() - self._checked_at < self.check_interval
+            ):
+                return
+            self._checking = True
+        self._executor.submit(self.check_health)
+
+    def ranked(self) -> list:
+        """Healthy nodes first, fastest first. Unknown latency goes last."""
+        return sorted(
+            self.nodes,
+            key=lambda n: (
+                not n.healthy,
+                n.latency is None,
+                n.latency or 0,
+            ),
+        )
+
+    def histogram(self, method: str) -> LatencyHistogram:
+        with self._lock:
+            return self._histograms.setdefault(method, LatencyHistogram())
+
+    def _hedge_delay(self, method: str) -> float:
+        histogram = self.histogram(method)
+        if histogram.total < self.hedge_min_samples:
+            return self.hedge_delay
+        return histogram.percentile(95)
+
+    def _call_node(self, node: Node, method: str, *args, **kwargs):
+        started = self._clock()
+        try:
+            result = getattr(node.api, method)(*args, **kwargs)
+        except BurstException as e:
+            if is_transport_error(e):
+                node.healthy = False
+            raise
+        elapsed = self._clock() - started
+        node.observe(elapsed)
+        self.histogram(method).observe(elapsed)
+        return result
+
+    def call(self, method: str, *args, **kwargs):
+        """Call BrsApi method on the best node, fail over to the next ones."""
+        self._refresh_health()
+        candidates = self.ranked()
+
+        if self.hedge and len(candidates) > 1:
+            return self._call_hedged(candidates, method, *args, **kwargs)
+
+        error = None
+        for node in candidates:
+            try:
+                return self._call_node(node, method, *args, **kwargs)
+            except BurstException as e:
+                if not is_transport_error(e):
+                    raise
+                logger.debug("Node failed: %s - %r", node.address, e)
+                error = e
+        raise error
+
+    def _call_hedged(self, candidates: list, method: str, *args, **kwargs):
+        pending = {
+            self._executor.submit(
+                self._call_node, candidates[0], method, *args, **kwargs
+            )
+        }
+        rest = iter(candidates[1:])
+        error = None
+        hedged = False
+
+        while True:
+            timeout = None if hedged else self._hedge_delay(method)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    return future.result()
+                except BurstException as e:
+                    if not is_transport_error(e):
+                        raise
+                    error = e
+
+            # slow first node or failed node: fire the next one
+            node = next(rest, None)
+            if node:
+                hedged = hedged or not done
+                pending.add(
+                    self._executor.submit(self._call_node, node, method, *args, **kwargs)
+                )
+            elif not pending:
+                raise error or APIException("no_nodes")
+            else:
+                hedged = True
+
+
+_node_set = None
+_node_set_lock = threading.Lock()
+
+
+def get_node_set() -> NodeSet:
+    """Process wide node set built from settings."""
+    global _node_set
+
+    if _node_set is None:
+        with _node_set_lock:
+            if _node_set is None:
+                _node_set = NodeSet(
+                    settings.SIGNUM_NODES,
+                    check_interval=settings.SIGNUM_NODES_CHECK_INTERVAL,
+                    max_height_lag=settings.SIGNUM_NODES_MAX_HEIGHT_LAG,
+                    hedge=settings.SIGNUM_NODES_HEDGE,
+                    hedge_delay=settings.SIGNUM_NODES_HEDGE_DELAY,
+                )
+    return _node_set
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import parse_qs, urlparse
+
+from burst.api.exceptions import APIException
+from burst.api.nodes import NodeSet
+
+
+class StubNode(ThreadingHTTPServer):
+    """Wallet node answering getBlockchainStatus and getUnconfirmedTransactions."""
+
+    def __init__(self, height: int = 100, delay: float = 0, fail: bool = False):
+        self.height = height
+        self.delay = delay
+        self.fail = fail
+        self.hits = 0
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        node = self.server
+        node.hits += 1
+        time.sleep(node.delay)
+        if node.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        request_type = parse_qs(urlparse(self.path).query)["requestType"][0]
+        if request_type == "getBlockchainStatus":
+            data = {
+                "application": "BRS",
+                "version": "v3.7.2",
+                "time": 0,
+                "lastBlock": "1",
+                "cumulativeDifficulty": "1",
+                "numberOfBlocks": node.height + 1,
+                "lastBlockchainFeeder": "",
+                "lastBlockchainFeederHeight": node.height,
+                "isScanning": False,
+                "requestProcessingTime": 0,
+            }
+        elif request_type == "getAsset":
+            data = {"errorCode": 5, "errorDescription": "Unknown asset"}
+        else:
+            data = {
+                "unconfirmedTransactions": [{"node": node.address}],
+                "requestProcessingTime": 0,
+            }
+
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class NodeSetTest(TestCase):
+    def make_nodes(self, *nodes):
+        for node in nodes:
+            self.addCleanup(node.server_close)
+            self.addCleanup(node.shutdown)
+        return nodes
+
+    def test_lowest_latency_healthy(self):
+        slow, fast, lagging = self.make_nodes(
+            StubNode(delay=0.2), StubNode(), StubNode(height=50)
+        )
+        node_set = NodeSet([slow.address, fast.address, lagging.address])
+        node_set.check_health()
+
+        self.assertEqual(node_set.ranked()[0].address, fast.address)
+        self.assertFalse(node_set.nodes[2].healthy)
+        txs = node_set.call("get_unconfirmed_transactions")
+        self.assertEqual(txs[0]["node"], fast.address)
+
+    def test_failover(self):
+        broken, good = self.make_nodes(StubNode(fail=True), StubNode())
+        node_set = NodeSet([broken.address, good.address], check_interval=3600)
+        node_set._checked_at = node_set._clock()
+
+        txs = node_set.call("get_unconfirmed_transactions")
+        self.assertEqual(txs[0]["node"], good.address)
+        self.assertFalse(node_set.nodes[0].healthy)
+
+    def test_error_response(self):
+        """A node refusing a bad request stays healthy, the others are not asked"""
+        first, second = self.make_nodes(StubNode(), StubNode())
+        node_set = NodeSet([first.address, second.address], check_interval=3600)
+        node_set._checked_at = node_set._clock()
+
+        with self.assertRaises(APIException):
+            node_set.call("get_asset", 1)
+        self.assertTrue(all(node.healthy for node in node_set.nodes))
+        self.assertEqual(first.hits + second.hits, 1)
+
+    def test_hedged(self):
+        busy, idle = self.make_nodes(StubNode(delay=1), StubNode())
+        node_set = NodeSet(
+            [busy.address, idle.address], hedge=True, hedge_delay=0.05, check_interval=3600
+        )
+        node_set._checked_at = node_set._clock()
+
+        started = time.monotonic()
+        txs = node_set.call("get_unconfirmed_transactions")
+        self.assertEqual(txs[0]["node"], idle.address)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_all_down(self):
+        (broken,) = self.make_nodes(StubNode(fail=True))
+        node_set = NodeSet([broken.address], check_interval=3600)
+        node_set._checked_at = node_set._clock()
+
+        with self.assertRaises(APIException):
+            node_set.call("get_unconfirmed_transactions")
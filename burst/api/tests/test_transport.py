@@ -0,0 +1,117 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from burst.api.exceptions import APIException
+from burst.api.transport import CircuitBreaker, LatencyHistogram, Transport
+
+
+class LatencyHistogramTest(TestCase):
+    def test_empty(self):
+        self.assertIsNone(LatencyHistogram().percentile(95))
+
+    def test_percentile(self):
+        h = LatencyHistogram()
+        for _ in range(95):
+            h.observe(0.01)
+        for _ in range(5):
+            h.observe(3)
+
+        self.assertEqual(h.percentile(50), 0.025)
+        self.assertEqual(h.percentile(95), 0.025)
+        self.assertEqual(h.percentile(99), 3)
+        self.assertEqual(h.snapshot()["count"], 100)
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self) -> None:
+        self.now = 0
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        self.breaker._clock = lambda: self.now
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_single_trial(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class TransportTest(TestCase):
+    def setUp(self) -> None:
+        self.transport = Transport(retries=2, backoff=0, failure_threshold=10)
+        self.session = MagicMock()
+        patcher = patch.object(Transport, "session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries(self):
+        ok = MagicMock()
+        self.session.request.side_effect = [ConnectionError(), ConnectionError(), ok]
+        response = self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+
+        self.assertIs(response, ok)
+        self.assertEqual(self.session.request.call_count, 3)
+        self.assertEqual(self.transport.histograms["getState"]["count"], 3)
+
+    def test_fail_fast_when_open(self):
+        self.transport = Transport(retries=0, failure_threshold=1)
+        self.session.request.side_effect = ConnectionError()
+
+        with self.assertRaises(APIException):
+            self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+        with self.assertRaises(APIException) as e:
+            self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+
+        self.assertEqual(e.exception.args[0], "circuit_open")
+        self.assertEqual(self.session.request.call_count, 1)
+
+    def test_read_timeout_not_retried(self):
+        self.session.request.side_effect = ReadTimeout()
+
+        with self.assertRaises(APIException):
+            self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+        self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.transport.breaker("node:8125")._failures, 1)
+
+    def test_deadline(self):
+        self.session.request.side_effect = ConnectionError()
+        clock = iter([0, 0, 4, 4, 4, 11, 11])
+        with patch("burst.api.transport.time.monotonic", lambda: next(clock)):
+            with self.assertRaises(APIException):
+                self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+
+        # the second attempt gets the time left, no third one after the deadline
+        self.assertEqual(self.session.request.call_count, 2)
+        self.assertEqual(self.session.request.call_args.kwargs["timeout"], (3, 6))
+
+    def test_half_open_trial_released_on_any_exception(self):
+        self.transport = Transport(retries=0, failure_threshold=1, reset_timeout=0)
+        self.session.request.side_effect = [ConnectionError(), ValueError(), ConnectionError()]
+
+        with self.assertRaises(APIException):
+            self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+        with self.assertRaises(ValueError):
+            self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+        # the trial is over, the next request gets its own
+        with self.assertRaises(APIException) as e:
+            self.transport.request("GET", "http://node:8125/burst", "getState", 10)
+
+        self.assertEqual(e.exception.args[0], "network")
+        self.assertEqual(self.session.request.call_count, 3)
@@ -0,0 +1,260 @@
+""" Shared HTTP transport for the node APIs: pooled sessions per host,
+retries with jitter, a circuit breaker per host and latency histograms
+per request type.
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, HTTPError, ReadTimeout, RequestException, Timeout
+
+from burst.api.exceptions import APIException
+
+
+class LatencyHistogram:
+    """Fixed buckets histogram of request durations in seconds."""
+
+    buckets = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float or None:
+        """Upper bound of the bucket holding the q-th percentile (0 < q <= 100)."""
+        with self._lock:
+            if not self.total:
+                return None
+            rank = self.total * q / 100
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(bound, self.max)
+            return self.max
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.total,
+                "sum": self.sum,
+                "max": self.max,
+                "buckets": dict(zip(self.buckets, self.counts)),
+            }
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets a single
+    trial request through once `reset_timeout` seconds have passed.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+class Transport:
+    """Process-wide HTTP layer, one instance per kind of API."""
+
+    def __init__(
+        self,
+        retries: int = 0,
+        backoff: float = 0.2,
+        pool_size: int = 10,
+        max_hosts: int = 1000,
+        connect_timeout: float = 3,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.connect_timeout = connect_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._breakers = OrderedDict()
+        self._histograms = {}
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc
+
+    def session(self, host: str) -> Session:
+        with self._lock:
+            s = self._sessions.get(host)
+            if s:
+                self._sessions.move_to_end(host)
+                return s
+
+            s = Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.pool_size, max_retries=0
+            )
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            self._sessions[host] = s
+
+            # the crawler talks to thousands of hosts, keep only recent ones
+            if len(self._sessions) > self.max_hosts:
+                _, old = self._sessions.popitem(last=False)
+                old.close()
+            return s
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            b = self._breakers.get(host)
+            if b:
+                self._breakers.move_to_end(host)
+                return b
+
+            b = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self._breakers[host] = b
+            if len(self._breakers) > self.max_hosts:
+                self._breakers.popitem(last=False)
+            return b
+
+    def histogram(self, request_type: str) -> LatencyHistogram:
+        with self._lock:
+            return self._histograms.setdefault(request_type, LatencyHistogram())
+
+    @property
+    def histograms(self) -> dict:
+        return {k: v.snapshot() for k, v in self._histograms.items()}
+
+    def _sleep_before_retry(self, attempt: int, remaining: float) -> None:
+        # full jitter: spread retries of concurrent workers over the window
+        time.sleep(min(random.uniform(0, self.backoff * 2 ** attempt), remaining))
+
+    def request(
+        self, method: str, url: str, request_type: str, timeout: float, **kwargs
+    ):
+        host = self._host(url)
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise APIException("circuit_open", host)
+
+        histogram = self.histogram(request_type)
+        # one deadline for all attempts, a slow node holds the caller for
+        # the timeout at most
+        deadline = time.monotonic() + timeout
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            remaining = deadline - started
+            try:
+                response = self.session(host).request(
+                    method,
+                    url,
+                    timeout=(min(self.connect_timeout, remaining), remaining),
+                    **kwargs,
+                )
+                response.raise_for_status()
+            except RequestException as e:
+                histogram.observe(time.monotonic() - started)
+                if not self._is_failure(e):
+                    # the node answered, it is alive
+                    breaker.record_success()
+                    raise APIException("network", e)
+
+                breaker.record_failure()
+                remaining = deadline - time.monotonic()
+                if (
+                    not self._is_retryable(e)
+                    or attempt >= self.retries
+                    or remaining <= 0
+                    or not breaker.allow()
+                ):
+                    raise APIException("network", e)
+
+                self._sleep_before_retry(attempt, remaining)
+                attempt += 1
+                continue
+            except Exception:
+                # anything else, a half-open trial must not stay running
+                breaker.record_failure()
+                raise
+
+            histogram.observe(time.monotonic() - started)
+            breaker.record_success()
+            return response
+
+    @staticmethod
+    def _is_failure(e: RequestException) -> bool:
+        """The node didn't answer or is overloaded"""
+        if isinstance(e, Timeout):
+            return True
+        return Transport._is_retryable(e)
+
+    @staticmethod
+    def _is_retryable(e: RequestException) -> bool:
+        # a node slow to answer is not asked again, connect timeouts are
+        # connection errors too
+        if isinstance(e, ReadTimeout):
+            return False
+        if isinstance(e, ConnectionError):
+            return True
+        if isinstance(e, HTTPError) and e.response is not None:
+            return e.response.status_code >= 500 or e.response.status_code == 429
+        return False
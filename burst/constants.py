@@ -16,6 +16,10 @@ MAX_MULTI_SAME_OUT_RECIPIENTS = 128
 
 BLOCK_CHAIN_START_AT = 1407722400
 
+# fees are multiples of the quant since SIP-3, blocks hold up to 1020 txs
+FEE_QUANT = 735000
+MAX_NUMBER_OF_TRANSACTIONS = 1020
+
 
 """ https://github.com/burst-apps-team/burstcoin/blob/master/src/brs/TransactionType.java
 """
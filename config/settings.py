@@ -267,6 +267,23 @@ MIN_PEER_VERSION = os.environ.get("MIN_PEER_VERSION", "3.6.0")
 
 SIGNUM_NODE = os.environ.get("SIGNUM_NODE")
 
+# failover and hedged requests over several nodes, SIGNUM_NODE if not set
+SIGNUM_NODES = json.loads(os.environ.get("SIGNUM_NODES", "[]")) or [SIGNUM_NODE]
+SIGNUM_NODES_CHECK_INTERVAL = float(os.environ.get("SIGNUM_NODES_CHECK_INTERVAL", 30))
+SIGNUM_NODES_MAX_HEIGHT_LAG = int(os.environ.get("SIGNUM_NODES_MAX_HEIGHT_LAG", 3))
+SIGNUM_NODES_HEDGE = os.environ.get("SIGNUM_NODES_HEDGE", "False").lower() in ("true", "1", "on")
+SIGNUM_NODES_HEDGE_DELAY = float(os.environ.get("SIGNUM_NODES_HEDGE_DELAY", 0.5))
+
+# node API transport
+NODE_API_RETRIES = int(os.environ.get("NODE_API_RETRIES", 2))
+NODE_API_RETRY_BACKOFF = float(os.environ.get("NODE_API_RETRY_BACKOFF", 0.2))
+NODE_API_POOL_SIZE = int(os.environ.get("NODE_API_POOL_SIZE", 10))
+NODE_API_CONNECT_TIMEOUT = float(os.environ.get("NODE_API_CONNECT_TIMEOUT", 3))
+NODE_API_BREAKER_THRESHOLD = int(os.environ.get("NODE_API_BREAKER_THRESHOLD", 5))
+NODE_API_BREAKER_RESET = float(os.environ.get("NODE_API_BREAKER_RESET", 30))
+# dead peers are common on p2p, don't spend the scan retrying them
+P2P_API_RETRIES = int(os.environ.get("P2P_API_RETRIES", 0))
+
 BLOCK_REWARD_LIMIT_HEIGHT = 972000
 BLOCK_REWARD_LIMIT_AMOUNT = 100
 
@@ -281,10 +298,62 @@ BRS_BOOTSTRAP_PEERS = json.loads(os.environ.get("BRS_BOOTSTRAP_PEERS", "[]"))
 AUTO_BOOTSTRAP_PEERS = os.environ.get("AUTO_BOOTSTRAP_PEERS", "False").lower() in ("true", "1", "on")
 
 PEERS_SCAN_DELAY = int(os.environ.get("PEERS_SCAN_DELAY", "0"))
+PEERS_SCAN_CONCURRENCY = int(os.environ.get("PEERS_SCAN_CONCURRENCY", "100"))
+# budget of one scan, it stops once unknown peers stop answering
+PEERS_SCAN_MAX_REQUESTS = int(os.environ.get("PEERS_SCAN_MAX_REQUESTS", "20000"))
+PEERS_SCAN_MAX_SECONDS = int(os.environ.get("PEERS_SCAN_MAX_SECONDS", "600"))
+PEERS_SCAN_CONVERGENCE_WINDOW = int(os.environ.get("PEERS_SCAN_CONVERGENCE_WINDOW", "200"))
+# per peer timeouts: percentile of the last answer times * factor, within floor and ceiling
+PEERS_RTT_SAMPLES = int(os.environ.get("PEERS_RTT_SAMPLES", "20"))
+PEERS_TIMEOUT_PERCENTILE = int(os.environ.get("PEERS_TIMEOUT_PERCENTILE", "90"))
+PEERS_TIMEOUT_FACTOR = float(os.environ.get("PEERS_TIMEOUT_FACTOR", "3"))
+PEERS_TIMEOUT_FLOOR = float(os.environ.get("PEERS_TIMEOUT_FLOOR", "2"))
+PEERS_TIMEOUT_CEILING = float(os.environ.get("PEERS_TIMEOUT_CEILING", "10"))
+# manage.py peers --daemon
+PEERS_DAEMON_INTERVAL = int(os.environ.get("PEERS_DAEMON_INTERVAL", "300"))
+PEERS_DAEMON_MAX_INTERVAL = int(os.environ.get("PEERS_DAEMON_MAX_INTERVAL", "21600"))
+PEERS_DAEMON_TICK = int(os.environ.get("PEERS_DAEMON_TICK", "10"))
+PEERS_DAEMON_BATCH = int(os.environ.get("PEERS_DAEMON_BATCH", "500"))
+PEERS_DAEMON_DISCOVERY_NODES = int(os.environ.get("PEERS_DAEMON_DISCOVERY_NODES", "20"))
+# blocks whose cumulative difficulty is kept to verify peers behind us
+PEERS_DIFFICULTY_CACHE_WINDOW = int(os.environ.get("PEERS_DIFFICULTY_CACHE_WINDOW", "1440"))
+# peers history: per scan snapshots, hourly then daily buckets
+PEERS_HISTORY_SCAN_DAYS = int(os.environ.get("PEERS_HISTORY_SCAN_DAYS", "2"))
+PEERS_HISTORY_HOURLY_DAYS = int(os.environ.get("PEERS_HISTORY_HOURLY_DAYS", "60"))
+PEERS_HISTORY_TREND_DAYS = int(os.environ.get("PEERS_HISTORY_TREND_DAYS", "30"))
 TASKS_SCAN_DELAY = int(os.environ.get("TASKS_SCAN_DELAY", "0"))
+# recent blocks in the fee statistics, about a day
+FEE_STATS_BLOCKS = int(os.environ.get("FEE_STATS_BLOCKS", "360"))
+# per task overrides of scan/tasks.py get_tasks, {"exchange": {"interval": 120}}
+TASKS_SCHEDULE = json.loads(os.environ.get("TASKS_SCHEDULE", "{}"))
+
+# one holder of every background command cluster-wide, see scan/helpers/leader.py
+# "redis" (the cache redis), "local" (in-process stand-in, tests) or "off"
+LEADER_ELECTION = os.environ.get("LEADER_ELECTION", "redis").lower()
+LEADER_LEASE_TTL = float(os.environ.get("LEADER_LEASE_TTL", "30"))
+
+# detail page sections loaded concurrently, see scan/views/base.py
+SECTION_LOADER_THREADS = int(os.environ.get("SECTION_LOADER_THREADS", "8"))
+# seconds before a section is rendered as loading
+SECTION_TIMEOUT = float(os.environ.get("SECTION_TIMEOUT", "5"))
+
+# block headers in memory by height for list pages, see scan/block_index.py
+BLOCK_INDEX = os.environ.get("BLOCK_INDEX", "True").lower() in ("true", "1", "on")
+
+# address page counts from the account counters table, build it first with
+# the account_counters command, watch_new_block keeps it up to date
+ACCOUNT_COUNTERS = os.environ.get("ACCOUNT_COUNTERS", "False").lower() in ("true", "1", "on")
+# deepest reorg the counters can take back
+ACCOUNT_COUNTERS_KEEP_BLOCKS = int(os.environ.get("ACCOUNT_COUNTERS_KEEP_BLOCKS", "1440"))
 
 SITE_HOSTING = os.environ.get("SITE_HOSTING", " ")
 
+# offline ip to country database (.mmdb or csv ranges), see scan/helpers/geoip.py
+GEOIP_DATABASE = os.environ.get("GEOIP_DATABASE")
+GEOIP_CACHE_SIZE = int(os.environ.get("GEOIP_CACHE_SIZE", "10000"))
+# ask ipwho.is for ips not found in the local database
+GEOIP_HTTP_FALLBACK = os.environ.get("GEOIP_HTTP_FALLBACK", "True").lower() in ("true", "1", "on")
+
 # for fork solving
 AGGR_STORE_BLOCK_SIGNATURE = 3600 * 24 * 7
 
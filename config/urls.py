@@ -2,7 +2,7 @@ from django.conf import settings
 from django.urls import include, path
 from django.views.decorators.cache import cache_page
 
-from scan.views.accounts import AccountsListView, AddressDetailView
+from scan.views.accounts import AccountsListView, AddressDetailView, address_section_view
 from scan.views.aliases import AliasListView
 from scan.views.assets import (
     AssetDetailView,
@@ -19,7 +19,7 @@ from scan.views.cashbacks import CBListView
 from scan.views.distribution import DistributionListView
 from scan.views.forged_blocks import ForgedBlocksListView
 from scan.views.index import index
-from scan.views.json import TopAccountsJson, getSNRjson, getStatejson, getNodejson, getallNodejson
+from scan.views.json import TopAccountsJson, getAssetCandlesjson, getFeesjson, getSNRjson, getStatejson, getNodejson, getallNodejson
 from scan.views.marketplace import (
     MarketPlaceDetailView,
     MarketPlaceListView,
@@ -48,6 +48,7 @@ urlpatterns = [
     path("tx/<str:id>", TxDetailView.as_view(), name="tx-detail"),
     path("accounts/", cache_page(3600)(AccountsListView.as_view()), name="accounts"),
     path("address/<str:id>", AddressDetailView.as_view(), name="address-detail"),
+    path("address/<str:id>/<str:section>", address_section_view, name="address-section"),
     path("csv/<str:id>", tx_export_csv, name="account-csv"),
     path("asset/trades", AssetTradesListView.as_view(), name="asset-trades"),
     path("asset/transfers", AssetTransfersListView.as_view(), name="asset-transfers"),
@@ -75,6 +76,12 @@ urlpatterns = [
     path("json/state/<str:address>", getStatejson, name="state"),
     path("json/accounts/", TopAccountsJson, name="json-account"),
     path("json/accounts/<int:results>", TopAccountsJson),
+    path("json/fees/", getFeesjson, name="json-fees"),
+    path(
+        "json/asset/<int:asset_id>/candles",
+        cache_page(60)(getAssetCandlesjson),
+        name="json-asset-candles",
+    ),
     path("pools/", cache_page(240)(PoolListView.as_view()), name="pools"),
     path("miner/", MinerListView.as_view(), name="miner"),
     path("forged-blocks/", ForgedBlocksListView.as_view(), name="forged-blocks"),
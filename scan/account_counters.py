@@ -0,0 +1,309 @@
+""" Counts of the address page tabs by account, kept in the explorer
+database instead of counting the node tables on every visit.
+
+Counts of rows added by blocks (transactions, transfers, trades, mined
+blocks, cashbacks) change by the deltas of every new block, which are kept
+for a while to take them back on a reorg. Counts of the current state
+(assets, aliases, ATs, subscriptions) are counted again for the accounts a
+block touches.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from java_wallet.models import (
+    AccountAsset,
+    Alias,
+    AssetTransfer,
+    At,
+    Block,
+    IndirectIncoming,
+    Subscription,
+    Trade,
+    Transaction,
+)
+from scan.helpers.leader import ensure_leader
+from scan.models import AccountCounters, CountedBlock
+
+logger = logging.getLogger(__name__)
+
+BLOCK_FIELDS = (
+    "txs_cnt",
+    "indirects_cnt",
+    "assets_transfers_cnt",
+    "assets_trades_cnt",
+    "mined_blocks_cnt",
+    "cbs_cnt",
+    "cbs_fee",
+)
+STATE_FIELDS = ("assets_cnt", "alias_cnt", "ats_cnt", "subscription_cnt")
+
+BATCH_SIZE = 500
+# the watcher stays responsive while catching up
+MAX_BLOCKS_PER_UPDATE = 100
+
+
+class CountersOutOfSync(Exception):
+    """The counters are not built or a reorg went below the kept deltas,
+    they need a rebuild"""
+
+
+def _group_count(queryset, column: str, ids=None, value=None):
+    """(account id, count) of the rows of queryset by column"""
+    queryset = queryset.filter(**{f"{column}__isnull": False}).order_by()
+    chunks = [None] if ids is None else [
+        ids[i:i + BATCH_SIZE] for i in range(0, len(ids), BATCH_SIZE)
+    ]
+    for chunk in chunks:
+        qs = queryset if chunk is None else queryset.filter(**{f"{column}__in": chunk})
+        yield from (
+            qs.values(column)
+            .annotate(n=value or Count("db_id"))
+            .values_list(column, "n")
+        )
+
+
+def _block_counts(height_filter: dict, ids=None) -> dict:
+    """Counts of BLOCK_FIELDS by account of the rows matching height_filter"""
+    txs = Transaction.objects.using("java_wallet").filter(**height_filter)
+    transfers = AssetTransfer.objects.using("java_wallet").filter(**height_filter)
+    trades = Trade.objects.using("java_wallet").filter(**height_filter)
+    sources = (
+        # a row of both sides of the same account counts once
+        ("txs_cnt", txs, "sender_id", None),
+        ("txs_cnt", txs.exclude(recipient_id=F("sender_id")), "recipient_id", None),
+        (
+            "indirects_cnt",
+            IndirectIncoming.objects.using("java_wallet").filter(**height_filter),
+            "account_id",
+            None,
+        ),
+        ("assets_transfers_cnt", transfers, "sender_id", None),
+        (
+            "assets_transfers_cnt",
+            transfers.exclude(recipient_id=F("sender_id")),
+            "recipient_id",
+            None,
+        ),
+        ("assets_trades_cnt", trades, "buyer_id", None),
+        ("assets_trades_cnt", trades.exclude(seller_id=F("buyer_id")), "seller_id", None),
+        (
+            "mined_blocks_cnt",
+            Block.objects.using("java_wallet").filter(**height_filter),
+            "generator_id",
+            None,
+        ),
+        ("cbs_cnt", txs, "cash_back_id", None),
+        ("cbs_fee", txs, "cash_back_id", Sum("fee")),
+    )
+
+    counts = defaultdict(lambda: [0] * len(BLOCK_FIELDS))
+    for field, queryset, column, value in sources:
+        i = BLOCK_FIELDS.index(field)
+        for account_id, n in _group_count(queryset, column, ids, value):
+            counts[account_id][i] += n
+    return counts
+
+
+def _state_querysets(**filters) -> tuple:
+    return (
+        ("assets_cnt", AccountAsset.objects.using("java_wallet").filter(**filters), "account_id"),
+        ("alias_cnt", Alias.objects.using("java_wallet").filter(**filters), "account_id"),
+        ("ats_cnt", At.objects.using("java_wallet").filter(**filters), "creator_id"),
+        (
+            "subscription_cnt",
+            Subscription.objects.using("java_wallet").filter(**filters),
+            "sender_id",
+        ),
+    )
+
+
+def _state_counts(ids=None) -> dict:
+    """Counts of STATE_FIELDS of the accounts, of all of them if ids is None"""
+    counts = defaultdict(lambda: [0] * len(STATE_FIELDS))
+    # touched accounts without rows anymore count 0
+    counts.update((account_id, [0] * len(STATE_FIELDS)) for account_id in ids or ())
+    for field, queryset, column in _state_querysets():
+        if field != "ats_cnt":
+            queryset = queryset.filter(latest=True)
+        i = STATE_FIELDS.index(field)
+        for account_id, n in _group_count(queryset, column, ids):
+            counts[account_id][i] = n
+    return counts
+
+
+def _state_touched(height: int) -> set:
+    """Accounts with state rows changed at height"""
+    return {
+        account_id
+        for _, queryset, column in _state_querysets(height=height)
+        for account_id, _ in _group_count(queryset, column)
+    }
+
+
+def _new_counters(account_id: int, block_counts, state_counts) -> AccountCounters:
+    return AccountCounters(
+        account_id=account_id,
+        **dict(zip(BLOCK_FIELDS, block_counts)),
+        **dict(zip(STATE_FIELDS, state_counts)),
+    )
+
+
+def _apply(deltas: dict, state: dict, sign: int) -> None:
+    # in the transaction of the block, a former leader writes nothing
+    ensure_leader()
+    rows = AccountCounters.objects.in_bulk(list(set(deltas) | set(state)))
+    new, changed = [], []
+    for account_id in set(deltas) | set(state):
+        row = rows.get(account_id)
+        if row is None:
+            row = AccountCounters(account_id=account_id)
+            new.append(row)
+        else:
+            changed.append(row)
+        for field, n in zip(BLOCK_FIELDS, deltas.get(account_id, ())):
+            setattr(row, field, getattr(row, field) + sign * n)
+        for field, n in zip(STATE_FIELDS, state.get(account_id, ())):
+            setattr(row, field, n)
+
+    AccountCounters.objects.bulk_create(new, batch_size=BATCH_SIZE)
+    AccountCounters.objects.bulk_update(changed, BLOCK_FIELDS + STATE_FIELDS, batch_size=BATCH_SIZE)
+
+
+def _last_counted(lock: bool = False) -> CountedBlock or None:
+    queryset = CountedBlock.objects.order_by("-height")
+    if lock:
+        queryset = queryset.select_for_update()
+    return queryset.first()
+
+
+def _chain_block_id(height: int) -> int or None:
+    return (
+        Block.objects.using("java_wallet")
+        .filter(height=height)
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def _count_block(height: int, block_id: int) -> bool:
+    deltas = _block_counts({"height": height})
+    touched = set(deltas) | _state_touched(height)
+    state = _state_counts(list(touched))
+
+    with transaction.atomic():
+        last = _last_counted(lock=True)
+        if last is None or last.height != height - 1:
+            # rebuilt or counted meanwhile
+            return False
+        _apply(deltas, state, 1)
+        CountedBlock.objects.create(
+            height=height,
+            block_id=block_id,
+            deltas={str(account_id): deltas.get(account_id, []) for account_id in touched},
+        )
+    return True
+
+
+def _uncount_block(block: CountedBlock) -> bool:
+    deltas = {int(account_id): d for account_id, d in block.deltas.items()}
+    state = _state_counts(list(deltas))
+
+    with transaction.atomic():
+        last = _last_counted(lock=True)
+        if last is None or last.height != block.height:
+            return False
+        _apply(deltas, state, -1)
+        last.delete()
+    return True
+
+
+def update_account_counters(height: int) -> None:
+    """Counts the new blocks up to height, after taking back the counted
+    blocks which are not on the chain anymore"""
+    last = _last_counted()
+    if last is None:
+        if AccountCounters.objects.exists():
+            raise CountersOutOfSync("No counted block left")
+        # not built
+        return
+
+    while last.height > height or _chain_block_id(last.height) != last.block_id:
+        if last.deltas is None:
+            raise CountersOutOfSync(f"Reorg below the counted block {last.height}")
+        logger.info("Account counters: taking back block %s", last.height)
+        if not _uncount_block(last):
+            return
+        last = _last_counted()
+        if last is None:
+            raise CountersOutOfSync("No counted block left")
+
+    for h in range(last.height + 1, min(height, last.height + MAX_BLOCKS_PER_UPDATE) + 1):
+        block_id = _chain_block_id(h)
+        if block_id is None or not _count_block(h, block_id):
+            return
+
+    # behind the chain after a rebuild or a downtime, the last counted
+    # block is kept whatever the distance
+    last = _last_counted()
+    with transaction.atomic():
+        ensure_leader()
+        CountedBlock.objects.filter(
+            height__lt=last.height - settings.ACCOUNT_COUNTERS_KEEP_BLOCKS
+        ).delete()
+
+
+def rebuild_account_counters() -> int:
+    """Counts every account from the whole chain, returns the number of
+    accounts"""
+    height, block_id = (
+        Block.objects.using("java_wallet")
+        .order_by("-height")
+        .values_list("height", "id")
+        .first()
+    )
+    blocks = _block_counts({"height__lte": height})
+    state = _state_counts()
+    rows = [
+        _new_counters(account_id, blocks[account_id], state[account_id])
+        for account_id in set(blocks) | set(state)
+    ]
+
+    with transaction.atomic():
+        CountedBlock.objects.all().delete()
+        AccountCounters.objects.all().delete()
+        AccountCounters.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        CountedBlock.objects.create(height=height, block_id=block_id, deltas=None)
+    return len(rows)
+
+
+def recount_accounts(account_ids: list) -> None:
+    """Counts the accounts again, at the last counted block"""
+    with transaction.atomic():
+        last = _last_counted(lock=True)
+        if last is None:
+            raise CountersOutOfSync("The account counters are not built")
+
+        blocks = _block_counts({"height__lte": last.height}, account_ids)
+        state = _state_counts(account_ids)
+        AccountCounters.objects.filter(account_id__in=account_ids).delete()
+        AccountCounters.objects.bulk_create(
+            [
+                _new_counters(account_id, blocks[account_id], state[account_id])
+                for account_id in account_ids
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def get_account_counters(account_id: int) -> dict or None:
+    """Counts of the address page, None if the account is not counted"""
+    return (
+        AccountCounters.objects.filter(account_id=account_id)
+        .values(*BLOCK_FIELDS, *STATE_FIELDS)
+        .first()
+    )
@@ -0,0 +1,166 @@
+""" OHLCV candles of the asset trades by hour, day and week. Each update
+counts the trades since the hour of the last counted trades again, a few
+blocks back in case of a reorg, and rolls the changed hours up into days
+and weeks. Charts read the candles of any range instead of trades.
+"""
+
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, IntegerField, Max
+
+from burst.constants import BLOCK_CHAIN_START_AT
+from java_wallet.models import Block, Trade
+from scan.helpers.leader import ensure_leader
+from scan.models import AssetCandle
+
+Resolution = AssetCandle.Resolution
+
+HOUR = 3600
+DAY = 86400
+WEEK = 7 * DAY
+PERIODS = {Resolution.HOUR: HOUR, Resolution.DAY: DAY, Resolution.WEEK: WEEK}
+RESOLUTIONS = {"1h": Resolution.HOUR, "1d": Resolution.DAY, "1w": Resolution.WEEK}
+# 1970-01-05, weeks start on monday
+WEEK_START = 4 * DAY
+
+# blocks counted again on every update, in case of a reorg
+REORG_DEPTH = 10
+BATCH_SIZE = 1000
+
+# timestamps as the node stores them, seconds since the chain start
+SECONDS = ExpressionWrapper(F("timestamp") + 0, output_field=IntegerField())
+
+
+def period_start(timestamp: int, resolution: int) -> int:
+    if resolution == Resolution.WEEK:
+        return timestamp - (timestamp - WEEK_START) % WEEK
+    return timestamp - timestamp % PERIODS[resolution]
+
+
+def _add(candles: dict, key: tuple, candle: dict) -> None:
+    """Merges a later candle, or a trade, into the one of key"""
+    current = candles.get(key)
+    if current is None:
+        candles[key] = dict(candle)
+        return
+    current["high"] = max(current["high"], candle["high"])
+    current["low"] = min(current["low"], candle["low"])
+    current["close"] = candle["close"]
+    current["volume"] += candle["volume"]
+    current["trades"] += candle["trades"]
+    current["height"] = max(current["height"], candle["height"])
+
+
+def _hour_candles(height: int) -> dict:
+    candles = {}
+    trades = (
+        Trade.objects.using("java_wallet")
+        .filter(height__gte=height)
+        .annotate(seconds=SECONDS)
+        .order_by("height", "db_id")
+        .values_list("asset_id", "seconds", "height", "price", "quantity")
+    )
+    for asset_id, seconds, height, price, quantity in trades.iterator():
+        start = period_start(seconds + BLOCK_CHAIN_START_AT, Resolution.HOUR)
+        _add(candles, (asset_id, start), {
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "volume": quantity,
+            "trades": 1,
+            "height": height,
+        })
+    return candles
+
+
+def _roll_up(hours, resolution: int) -> dict:
+    candles = {}
+    for hour in hours:
+        _add(candles, (hour["asset_id"], period_start(hour["start"], resolution)), hour)
+    return candles
+
+
+def _save(candles: dict, resolution: int) -> None:
+    AssetCandle.objects.bulk_create(
+        [
+            AssetCandle(
+                asset_id=asset_id,
+                resolution=resolution,
+                start=start,
+                **{k: v for k, v in candle.items() if k not in ("asset_id", "start")},
+            )
+            for (asset_id, start), candle in candles.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _since() -> tuple:
+    """First height and unix time of the hour of the trades to count again"""
+    height = AssetCandle.objects.aggregate(Max("height"))["height__max"]
+    if height is None:
+        return 0, 0
+
+    blocks = (
+        Block.objects.using("java_wallet")
+        .annotate(seconds=SECONDS)
+        .order_by("-height")
+    )
+    seconds = (
+        blocks.filter(height__lte=max(height - REORG_DEPTH, 0))
+        .values_list("seconds", flat=True)
+        .first()
+    )
+    if seconds is None:
+        return 0, 0
+    since = period_start(seconds + BLOCK_CHAIN_START_AT, Resolution.HOUR)
+
+    # the last block of the hour before, going down from the height index
+    before = (
+        blocks.filter(height__lte=height, seconds__lt=since - BLOCK_CHAIN_START_AT)
+        .values_list("height", flat=True)
+        .first()
+    )
+    return (0 if before is None else before + 1), since
+
+
+def update_asset_candles() -> None:
+    height, since = _since()
+    hours = _hour_candles(height)
+
+    with transaction.atomic():
+        ensure_leader()
+        stale = AssetCandle.objects.filter(resolution=Resolution.HOUR, start__gte=since)
+        assets = set(stale.values_list("asset_id", flat=True))
+        assets.update(asset_id for asset_id, _ in hours)
+        stale.delete()
+        _save(hours, Resolution.HOUR)
+
+        for resolution in (Resolution.DAY, Resolution.WEEK):
+            start = period_start(since, resolution)
+            changed = AssetCandle.objects.filter(start__gte=start)
+            if since:
+                # all assets on the first run
+                changed = changed.filter(asset_id__in=assets)
+            changed.filter(resolution=resolution).delete()
+            hours_changed = (
+                changed.filter(resolution=Resolution.HOUR)
+                .order_by("asset_id", "start")
+                .values("asset_id", "start", "open", "high", "low", "close", "volume", "trades", "height")
+            )
+            _save(_roll_up(hours_changed.iterator(), resolution), resolution)
+
+
+def get_candles(asset_id: int, resolution: int, start: int = None, end: int = None) -> list:
+    """[start, open, high, low, close, volume, trades] of the periods
+    starting from start up to end"""
+    candles = AssetCandle.objects.filter(asset_id=asset_id, resolution=resolution)
+    if start is not None:
+        candles = candles.filter(start__gte=period_start(start, resolution))
+    if end is not None:
+        candles = candles.filter(start__lte=end)
+    return list(
+        candles.order_by("start").values_list(
+            "start", "open", "high", "low", "close", "volume", "trades"
+        )
+    )
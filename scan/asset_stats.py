@@ -0,0 +1,222 @@
+""" Holders, transfers, trades, volumes, last price and circulating quantity
+by asset, kept in the explorer database for the asset list leaderboards and
+the asset page header instead of counting the node tables on every visit.
+
+Each update counts again the assets with rows since their last counted
+change, a few blocks back in case of a reorg, and the assets traded in the
+last 7 days, whose volumes move with time without new rows.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+
+from burst.constants import TxSubtypeColoredCoins, TxType
+from java_wallet.models import AccountAsset, Asset, AssetTransfer, Block, Trade, Transaction
+from scan.asset_candles import DAY, SECONDS, WEEK
+from scan.helpers.leader import ensure_leader
+from scan.models import AssetStats
+
+# asset list orderings by the sort parameter
+LEADERBOARDS = {
+    "holders": ("-holders", "asset_id"),
+    "volume": ("-volume_24h", "asset_id"),
+    "volume_7d": ("-volume_7d", "asset_id"),
+    "trades": ("-trades", "asset_id"),
+}
+
+# blocks counted again on every update, in case of a reorg
+REORG_DEPTH = 10
+BATCH_SIZE = 500
+
+
+def _chunks(ids) -> list:
+    ids = sorted(ids)
+    return [ids[i:i + BATCH_SIZE] for i in range(0, len(ids), BATCH_SIZE)]
+
+
+def _group(queryset, value=None) -> dict:
+    """value, the rows count by default, of queryset by asset"""
+    return dict(
+        queryset.order_by()
+        .values("asset_id")
+        .annotate(n=value or Count("asset_id"))
+        .values_list("asset_id", "n")
+    )
+
+
+def _treasury_txs():
+    return Transaction.objects.using("java_wallet").filter(
+        type=TxType.COLORED_COINS,
+        subtype=TxSubtypeColoredCoins.ADD_TREASURY_ACCOUNT,
+    )
+
+
+def _window_heights() -> tuple:
+    """Last height and the last heights before the 24 hours and 7 days
+    before its block, -1 if the chain is younger"""
+    blocks = (
+        Block.objects.using("java_wallet")
+        .annotate(seconds=SECONDS)
+        .order_by("-height")
+    )
+    last = blocks.values_list("height", "seconds").first()
+    if last is None:
+        return None, None, None
+    height, now = last
+
+    def before(seconds: int) -> int:
+        # going down from the last block, a few thousands rows at most
+        found = (
+            blocks.filter(seconds__lte=seconds)
+            .values_list("height", flat=True)
+            .first()
+        )
+        return -1 if found is None else found
+
+    return height, before(now - DAY), before(now - WEEK)
+
+
+def _changed_assets(height: int) -> set:
+    """Assets with rows from height on, and the ones changed there before
+    which a reorg may have taken back"""
+    assets = set(
+        AssetStats.objects.filter(height__gte=height).values_list("asset_id", flat=True)
+    )
+    assets.update(
+        Asset.objects.using("java_wallet")
+        .filter(height__gte=height)
+        .values_list("id", flat=True)
+    )
+    for model in (AccountAsset, AssetTransfer, Trade):
+        assets.update(
+            model.objects.using("java_wallet")
+            .filter(height__gte=height)
+            .values_list("asset_id", flat=True)
+            .distinct()
+        )
+
+    issuances = (
+        _treasury_txs()
+        .filter(height__gte=height)
+        .values_list("referenced_transaction_fullhash", flat=True)
+    )
+    assets.update(
+        Transaction.objects.using("java_wallet")
+        .filter(full_hash__in=list(issuances))
+        .values_list("id", flat=True)
+    )
+    return assets
+
+
+def _traded_assets(week_height: int) -> set:
+    assets = set(
+        AssetStats.objects.filter(volume_7d__gt=0).values_list("asset_id", flat=True)
+    )
+    assets.update(
+        Trade.objects.using("java_wallet")
+        .filter(height__gt=week_height)
+        .values_list("asset_id", flat=True)
+        .distinct()
+    )
+    return assets
+
+
+def _treasury_balances(asset_ids: list) -> dict:
+    """Sum of the balances of the treasury accounts by asset"""
+    # treasury accounts reference the issuance, the asset id is its id
+    issued = dict(
+        Transaction.objects.using("java_wallet")
+        .filter(id__in=asset_ids)
+        .values_list("full_hash", "id")
+    )
+    if not issued:
+        return {}
+    treasuries = {
+        (account_id, issued[full_hash])
+        for full_hash, account_id in _treasury_txs()
+        .filter(referenced_transaction_fullhash__in=list(issued))
+        .values_list("referenced_transaction_fullhash", "recipient_id")
+    }
+    if not treasuries:
+        return {}
+
+    balances = {}
+    for account_id, asset_id, quantity in (
+        AccountAsset.objects.using("java_wallet")
+        .filter(
+            latest=True,
+            asset_id__in={asset_id for _, asset_id in treasuries},
+            account_id__in={account_id for account_id, _ in treasuries},
+        )
+        .values_list("account_id", "asset_id", "quantity")
+    ):
+        if (account_id, asset_id) in treasuries:
+            balances[asset_id] = balances.get(asset_id, 0) + quantity
+    return balances
+
+
+def _count(asset_ids: list, day_height: int, week_height: int) -> list:
+    assets = (
+        Asset.objects.using("java_wallet")
+        .filter(id__in=asset_ids)
+        .values_list("id", "quantity", "height")
+    )
+    holdings = AccountAsset.objects.using("java_wallet").filter(asset_id__in=asset_ids)
+    transfers = AssetTransfer.objects.using("java_wallet").filter(asset_id__in=asset_ids)
+    trades = Trade.objects.using("java_wallet").filter(asset_id__in=asset_ids)
+
+    holders = _group(holdings.filter(latest=True))
+    transfers_cnt = _group(transfers)
+    trades_cnt = _group(trades)
+    volume = Sum(F("price") * F("quantity"))
+    volume_24h = _group(trades.filter(height__gt=day_height), volume)
+    volume_7d = _group(trades.filter(height__gt=week_height), volume)
+    last_prices = dict(
+        Trade.objects.using("java_wallet")
+        .filter(db_id__in=_group(trades, Max("db_id")).values())
+        .values_list("asset_id", "price")
+    )
+    treasuries = _treasury_balances(asset_ids)
+    heights = [_group(qs, Max("height")) for qs in (holdings, transfers, trades)]
+
+    return [
+        AssetStats(
+            asset_id=asset_id,
+            holders=holders.get(asset_id, 0),
+            transfers=transfers_cnt.get(asset_id, 0),
+            trades=trades_cnt.get(asset_id, 0),
+            volume_24h=volume_24h.get(asset_id) or 0,
+            volume_7d=volume_7d.get(asset_id) or 0,
+            last_price=last_prices.get(asset_id, 0),
+            circulating=max(quantity - treasuries.get(asset_id, 0), 0),
+            height=max([height] + [h.get(asset_id, 0) for h in heights]),
+        )
+        for asset_id, quantity, height in assets
+    ]
+
+
+def update_asset_stats() -> int:
+    """Counts the changed assets again, returns how many"""
+    height, day_height, week_height = _window_heights()
+    if height is None:
+        return 0
+
+    counted = AssetStats.objects.aggregate(Max("height"))["height__max"]
+    if counted is None:
+        assets = set(Asset.objects.using("java_wallet").values_list("id", flat=True))
+    else:
+        assets = _changed_assets(max(counted - REORG_DEPTH, 0))
+        assets.update(_traded_assets(week_height))
+
+    for chunk in _chunks(assets):
+        stats = _count(chunk, day_height, week_height)
+        with transaction.atomic():
+            ensure_leader()
+            # popped assets go away
+            AssetStats.objects.filter(asset_id__in=chunk).delete()
+            AssetStats.objects.bulk_create(stats)
+    return len(assets)
+
+
+def get_asset_stats(asset_id: int) -> AssetStats or None:
+    return AssetStats.objects.filter(asset_id=asset_id).first()
@@ -0,0 +1,186 @@
+""" Headers of every block in typed arrays indexed by height: timestamp,
+generator, base target, fees and transactions count. Loaded once per
+process in the background and extended on each new block, so the per row
+lookups of list pages are array reads instead of queries. About 32 bytes a
+block, some 45 MB for 1.4M blocks.
+"""
+
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+
+from burst.constants import BLOCK_CHAIN_START_AT
+from java_wallet.models import Block, Transaction
+from scan.caching_data.last_block_id import CachingLastBlockId
+from scan.caching_data.last_height import CachingLastHeight
+
+logger = logging.getLogger(__name__)
+
+# typecodes of the columns, timestamps in seconds since the chain start as
+# in the node database; transactions count last, it sets the height
+COLUMNS = (
+    ("timestamp", "I"),
+    ("generator_id", "Q"),
+    ("base_target", "Q"),
+    ("total_fee", "Q"),
+    ("tx_count", "I"),
+)
+
+# blocks read again on every refresh, in case of a reorg
+REORG_DEPTH = 10
+# seconds between checks of the last height
+REFRESH_INTERVAL = 1
+LOAD_CHUNK = 50000
+
+# the node stores ids as signed
+UNSIGNED_64 = 0xFFFFFFFFFFFFFFFF
+
+
+class BlockIndex:
+    def __init__(self) -> None:
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS}
+        # id of the last indexed block, a reorg may replace it at the same height
+        self.head_id = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._thread = None
+
+    @property
+    def height(self) -> int:
+        """Last indexed height, -1 if empty"""
+        return len(self.columns["tx_count"]) - 1
+
+    @staticmethod
+    def _block_id(height: int) -> int or None:
+        return (
+            Block.objects.using("java_wallet")
+            .filter(height=height)
+            .values_list("id", flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def _read(start: int, end: int) -> list:
+        """(height, timestamp, generator_id, base_target, total_fee, tx_count)
+        of the blocks from start to end"""
+        connection = connections["java_wallet"]
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            # timestamp + 0: seconds on every backend, not a datetime column
+            cursor.execute(
+                f"SELECT {quote('height')}, {quote('timestamp')} + 0, {quote('generator_id')}, "
+                f"{quote('base_target')}, {quote('total_fee')} "
+                f"FROM {quote(Block._meta.db_table)} "
+                f"WHERE {quote('height')} BETWEEN %s AND %s ORDER BY {quote('height')}",
+                [start, end],
+            )
+            blocks = cursor.fetchall()
+            cursor.execute(
+                f"SELECT {quote('height')}, COUNT(*) FROM {quote(Transaction._meta.db_table)} "
+                f"WHERE {quote('height')} BETWEEN %s AND %s GROUP BY {quote('height')}",
+                [start, end],
+            )
+            tx_counts = dict(cursor.fetchall())
+
+        return [
+            (
+                height,
+                timestamp,
+                generator_id & UNSIGNED_64,
+                base_target & UNSIGNED_64,
+                total_fee,
+                tx_counts.get(height, 0),
+            )
+            for height, timestamp, generator_id, base_target, total_fee in blocks
+        ]
+
+    def _set(self, row: tuple) -> bool:
+        height, values = row[0], row[1:]
+        if height > self.height + 1:
+            logger.warning("Block index: no block before %s", height)
+            return False
+        for (name, _), value in zip(COLUMNS, values):
+            column = self.columns[name]
+            if height < len(column):
+                column[height] = value
+            else:
+                column.append(value)
+        return True
+
+    def update(self, last_height: int) -> None:
+        """Index the blocks up to last_height, the last ones again"""
+        with self._lock:
+            if last_height < self.height:
+                # popped blocks, transactions count first
+                for name, _ in reversed(COLUMNS):
+                    del self.columns[name][last_height + 1:]
+
+            # before the blocks: replaced while they are read, the next
+            # refresh sees another id and reads them again
+            head_id = self._block_id(last_height)
+            self.head_id = None
+            start = max(self.height - REORG_DEPTH + 1, 0)
+            while start <= last_height:
+                end = min(start + LOAD_CHUNK - 1, last_height)
+                for row in self._read(start, end):
+                    if not self._set(row):
+                        return
+                start = end + 1
+            self.head_id = head_id
+
+    def _update_in_thread(self, last_height: int) -> None:
+        try:
+            self.update(last_height)
+        except Exception:
+            logger.exception("Block index update failed")
+        finally:
+            connections.close_all()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < REFRESH_INTERVAL:
+            return
+        self._checked_at = now
+
+        last_height = CachingLastHeight().cached_data
+        if last_height is None:
+            return
+        if last_height == self.height and CachingLastBlockId().cached_data == self.head_id:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        # lookups never wait for the load, they miss until it is done
+        self._thread = threading.Thread(
+            target=self._update_in_thread,
+            args=(last_height,),
+            name="block-index",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def get(self, column: str, height: int) -> int or None:
+        """Value of a column at height, None if not indexed yet"""
+        if not settings.BLOCK_INDEX:
+            return None
+        self._refresh()
+        if not 0 <= height <= self.height:
+            return None
+        try:
+            return self.columns[column][height]
+        except IndexError:
+            # popped meanwhile
+            return None
+
+    def timestamp(self, height: int) -> datetime or None:
+        value = self.get("timestamp", height)
+        if value is None:
+            return None
+        return datetime.fromtimestamp(value + BLOCK_CHAIN_START_AT)
+
+
+block_index = BlockIndex()
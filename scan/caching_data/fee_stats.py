@@ -0,0 +1,15 @@
+from scan.caching_data.base import CachingDataBase
+from scan.caching_data.pending_txs import CachingPendingTxs
+from scan.fee_stats import get_fee_stats
+
+
+class CachingFeeStats(CachingDataBase):
+    """Fee statistics, refreshed with the pending transactions"""
+
+    _cache_key = "fee_stats"
+    _cache_expiring = 60
+    live_if_empty = True
+    default_data_if_empty = {}
+
+    def _get_live_data(self):
+        return get_fee_stats(CachingPendingTxs().cached_data)
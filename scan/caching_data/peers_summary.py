@@ -0,0 +1,99 @@
+import calendar
+
+from django.conf import settings
+
+from scan.caching_data.base import CachingDataBase
+from scan.models import PeerMonitor, PeerSnapshot
+from scan.peer_history import count_peers, get_trend
+
+
+def get_featured_peers() -> list:
+    bootstrap_peers = list(settings.BRS_BOOTSTRAP_PEERS)
+    if settings.AUTO_BOOTSTRAP_PEERS:
+        auto_peers = (
+            PeerMonitor.objects.filter(announced_address__contains=".signum.network")
+            .exclude(state__gt=PeerMonitor.State.ONLINE)
+            .order_by("announced_address")
+            .values_list("announced_address", flat=True)
+        )
+        bootstrap_peers.extend(p for p in auto_peers if p not in bootstrap_peers)
+
+    peers = PeerMonitor.objects.in_bulk(bootstrap_peers)
+    return [peers[address] for address in bootstrap_peers if address in peers]
+
+
+def get_consensus_height(featured_peers: list) -> int or None:
+    heights = [
+        peer.height
+        for peer in featured_peers
+        if peer.announced_address in settings.BRS_BOOTSTRAP_PEERS
+        and peer.state == PeerMonitor.State.ONLINE
+    ]
+    if not heights:
+        return None
+    return round(sum(heights) / len(heights))
+
+
+def get_states_trend() -> list:
+    """Highcharts series of peers count by state from the history"""
+    points = [
+        (calendar.timegm(created_at.timetuple()) * 1000, counts)
+        for created_at, counts in get_trend(settings.PEERS_HISTORY_TREND_DAYS)
+    ]
+    return [
+        {
+            "name": str(name),
+            "data": [[ts, round(counts.get(str(state), 0), 1)] for ts, counts in points],
+        }
+        for state, name in PeerMonitor.STATE_CHOICES
+    ]
+
+
+def histogram(counts: dict, key: str, order) -> list:
+    return sorted(({key: k, "cnt": cnt} for k, cnt in counts.items()), key=order)
+
+
+def get_peers_summary(snapshot: PeerSnapshot) -> dict:
+    state_names = dict(PeerMonitor.STATE_CHOICES)
+    states = histogram(snapshot.states, "state", lambda x: (-x["cnt"], int(x["state"])))
+    for state in states:
+        state["state"] = str(state_names[int(state["state"])])
+
+    # stable sorts: by version desc, then count desc within equal versions
+    versions = histogram(snapshot.versions, "version", lambda x: -x["cnt"])
+    versions.sort(key=lambda x: x["version"], reverse=True)
+
+    featured_peers = get_featured_peers()
+
+    return {
+        "online_now": snapshot.states.get(str(PeerMonitor.State.ONLINE), 0),
+        "versions": versions,
+        "votes": histogram(snapshot.platforms, "platform", lambda x: -x["cnt"]),
+        "countries": histogram(
+            snapshot.countries, "country_code", lambda x: (-x["cnt"], x["country_code"])
+        ),
+        "states": states,
+        "last_check": snapshot.created_at,
+        "states_trend": get_states_trend(),
+        "featured_peers": featured_peers,
+        "consensus_height": get_consensus_height(featured_peers),
+    }
+
+
+class CachingPeersSummary(CachingDataBase):
+    """Peers dashboard, written by the peers scan when it finishes"""
+
+    _cache_key = "peers_summary"
+    _cache_expiring = None
+    live_if_empty = True
+    default_data_if_empty = {}
+
+    def _get_live_data(self):
+        snapshot = (
+            PeerSnapshot.objects.filter(resolution=PeerSnapshot.Resolution.SCAN)
+            .order_by("-created_at")
+            .first()
+        )
+        if not snapshot:
+            snapshot = count_peers(0)
+        return get_peers_summary(snapshot)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+
+from scan.caching_data.base import CachingDataBase
+from scan.mempool import mempool
+
+# per transaction entries are set again on every refresh and deleted once
+# confirmed, the timeout only bounds how long a dropped one shows if the
+# tasks stop
+PENDING_TX_TIMEOUT = 600
+# unknown ids polled right after broadcast, until the next refresh at most
+PENDING_TX_MISS_TIMEOUT = 10
+
+
+def _tx_key(tx_id: str) -> str:
+    return f"pending_tx:{tx_id}"
+
+
+def _miss_key(tx_id: str) -> str:
+    return f"pending_tx_miss:{tx_id}"
+
+
+class CachingPendingTxs(CachingDataBase):
+    """Pending transactions by fee, refreshed every 10s by the tasks command.
+    Expires if the tasks stop, web processes then keep their own tracker."""
+
+    _cache_key = "pending_txs"
+    _cache_expiring = 30
+    live_if_empty = True
+    default_data_if_empty = []
+
+    def _get_live_data(self):
+        added, removed = mempool.refresh()
+        if mempool.txs:
+            # txs pending for longer than the timeout keep their entry
+            cache.set_many(
+                {_tx_key(tx_id): t for tx_id, t in mempool.txs.items()}, PENDING_TX_TIMEOUT
+            )
+        if added:
+            cache.delete_many([_miss_key(t["transaction"]) for t in added])
+        if removed:
+            cache.delete_many([_tx_key(tx_id) for tx_id in removed])
+        return mempool.by_fee()
+
+    def _get_cached_data(self):
+        # an empty pool is a value, not a miss
+        data = cache.get(self._get_cache_key())
+        if data is None:
+            data = self.live_data
+            self.update_data(data)
+        return data
+
+
+def get_pending_tx(tx_id: str) -> dict or None:
+    tx = cache.get(_tx_key(tx_id))
+    if tx is None and not cache.has_key(CachingPendingTxs()._get_cache_key()):
+        # nobody refreshes the pool, refresh it here
+        CachingPendingTxs().cached_data
+        tx = cache.get(_tx_key(tx_id))
+    return tx
+
+
+def is_known_missing_tx(tx_id: str) -> bool:
+    return cache.get(_miss_key(tx_id)) is not None
+
+
+def set_missing_tx(tx_id: str) -> None:
+    """Neither confirmed nor pending, answered without the pool for a while"""
+    cache.set(_miss_key(tx_id), True, PENDING_TX_MISS_TIMEOUT)
@@ -0,0 +1,52 @@
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+
+from scan.caching_data.peers_summary import get_peers_summary
+from scan.models import PeerMonitor
+from scan.peer_history import count_peers
+
+
+def create_peer(address: str, state: int, height: int, **kwargs) -> PeerMonitor:
+    return PeerMonitor.objects.create(
+        announced_address=address,
+        state=state,
+        height=height,
+        last_online_at=timezone.now(),
+        **kwargs,
+    )
+
+
+@pytest.mark.django_db
+@override_settings(
+    BRS_BOOTSTRAP_PEERS=["a.example", "b.example", "gone.example"],
+    AUTO_BOOTSTRAP_PEERS=True,
+)
+def test_get_peers_summary():
+    create_peer("a.example", PeerMonitor.State.ONLINE, 1000, version="v3.8.0", country_code="DE")
+    create_peer("b.example", PeerMonitor.State.ONLINE, 1003, version="v3.7.2", country_code="US")
+    create_peer("x.signum.network", PeerMonitor.State.ONLINE, 1001, version="v3.8.0", country_code="DE")
+    create_peer("y.signum.network", PeerMonitor.State.STUCK, 10, version="v3.8.0")
+    create_peer("c.example", PeerMonitor.State.UNREACHABLE, 500)
+
+    summary = get_peers_summary(count_peers(1003))
+
+    assert summary["online_now"] == 3
+    assert summary["versions"] == [
+        {"version": "v3.8.0", "cnt": 2},
+        {"version": "v3.7.2", "cnt": 1},
+    ]
+    assert summary["countries"] == [
+        {"country_code": "DE", "cnt": 2},
+        {"country_code": "US", "cnt": 1},
+    ]
+    assert summary["states"] == [
+        {"state": "online", "cnt": 3},
+        {"state": "unreachable", "cnt": 1},
+        {"state": "stuck", "cnt": 1},
+    ]
+    assert [p.announced_address for p in summary["featured_peers"]] == [
+        "a.example", "b.example", "x.signum.network",
+    ]
+    # auto bootstrap peers are featured but don't vote for consensus
+    assert summary["consensus_height"] == 1002
@@ -0,0 +1,447 @@
+""" Asyncio P2P crawler: one event loop, one global concurrency limit and a
+deduplicated frontier instead of nested thread pools.
+"""
+
+import asyncio
+import itertools
+import logging
+import socket
+import ssl
+from distutils.version import LooseVersion
+from time import monotonic
+from urllib.parse import urlparse
+
+import simplejson as json
+from django.conf import settings
+from django.utils import timezone
+
+from burst.api.brs.p2p import queries
+from burst.api.brs.p2p.api import P2PApi
+from burst.api.brs.v1.api import normalize_node_address
+from burst.api.exceptions import APIException, BurstException
+
+logger = logging.getLogger(__name__)
+
+
+def is_good_version(version: str) -> bool:
+    if not version:
+        return False
+    if version[0] == "v":
+        version = version[1:]
+
+    try:
+        return LooseVersion(version) >= LooseVersion(settings.MIN_PEER_VERSION)
+    except TypeError:
+        return False
+
+
+class AsyncP2PClient:
+    """Minimal HTTP/1.0 JSON client for the P2P API on top of asyncio streams."""
+
+    max_response_size = 4 * 1024 * 1024
+
+    def __init__(self, semaphore: asyncio.Semaphore, timeout: float) -> None:
+        self._semaphore = semaphore
+        self.timeout = timeout
+        self._ssl = ssl.create_default_context()
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+
+    async def _exchange(self, parsed, data: bytes) -> bytes:
+        reader, writer = await asyncio.open_connection(
+            parsed.hostname,
+            parsed.port,
+            ssl=self._ssl if parsed.scheme == "https" else None,
+        )
+        try:
+            writer.write(data)
+            await writer.drain()
+            data = b""
+            while len(data) < self.max_response_size:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                data += chunk
+        finally:
+            writer.close()
+        return data
+
+    async def _post(self, url: str, payload: dict, timeout: float) -> bytes:
+        parsed = urlparse(url)
+        body = json.dumps(payload).encode()
+        head = (
+            f"POST {parsed.path or '/'} HTTP/1.0\r\n"
+            f"Host: {parsed.netloc}\r\n"
+            f"User-Agent: {P2PApi.headers['User-Agent']}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+
+        # time spent waiting for a free slot doesn't count against the peer
+        async with self._semaphore:
+            data = await asyncio.wait_for(self._exchange(parsed, head + body), timeout)
+
+        head, _, body = data.partition(b"\r\n\r\n")
+        status = head.split(b"\r\n", 1)[0].split()
+        if len(status) < 2 or not status[1].startswith(b"2"):
+            raise APIException("network", head[:100])
+        return body
+
+    async def request(self, url: str, query: queries.QueryBase, timeout: float = None):
+        try:
+            body = await self._post(
+                f"{url}/{P2PApi.endpoint}", query.params, timeout or self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise APIException("network", e)
+
+        try:
+            json_response = json.loads(body)
+        except ValueError as e:
+            raise APIException("malformed_json", e)
+
+        query.validate_response(json_response)
+        return json_response
+
+
+class Priority:
+    BOOTSTRAP = 0
+    RECENT = 1
+    # known, found unreachable on the last check
+    UNREACHABLE = 2
+    # never seen
+    OTHER = 3
+
+
+class Frontier:
+    """Work of a scan: every (url, kind) once, by priority then arrival.
+
+    Work is handed out until the request or time budget is spent, or until
+    the last `convergence_window` probes of never seen peers found nobody
+    online: known peers, dead ones too, were probed before and don't count,
+    the rest of the network is not worth the time. Budgets are checked before each item, requests in
+    flight may exceed them a little.
+    """
+
+    def __init__(
+        self,
+        max_requests: int = None,
+        max_seconds: float = None,
+        convergence_window: int = None,
+    ) -> None:
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.convergence_window = convergence_window
+
+        self.requests = 0
+        self.probed = 0
+        self.skipped = set()
+        self.stop_reason = None
+
+        self._queue = asyncio.PriorityQueue()
+        self._visited = set()
+        self._counter = itertools.count()
+        self._quiet = 0
+        self._started = monotonic()
+
+    @property
+    def seconds(self) -> float:
+        return monotonic() - self._started
+
+    def push(
+        self, address: str, url: str, is_node: bool, priority: int, timeout: float = 0
+    ) -> None:
+        """Peers expected to answer fast go first within a priority, slow and
+        dead ones don't hold workers while there is other work"""
+        if (url, is_node) in self._visited:
+            return
+        self._visited.add((url, is_node))
+        self._queue.put_nowait(
+            (priority, timeout, next(self._counter), address, url, is_node)
+        )
+
+    async def get(self) -> tuple:
+        return await self._queue.get()
+
+    def task_done(self) -> None:
+        self._queue.task_done()
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def exhausted(self) -> bool:
+        if self.stop_reason is None:
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                self.stop_reason = "requests"
+            elif self.max_seconds is not None and self.seconds >= self.max_seconds:
+                self.stop_reason = "time"
+        return self.stop_reason is not None
+
+    def record_probe(self, priority: int, answered: bool) -> None:
+        self.probed += 1
+        if priority != Priority.OTHER or not self.convergence_window:
+            return
+        self._quiet = 0 if answered else self._quiet + 1
+        if self._quiet >= self.convergence_window and self.stop_reason is None:
+            self.stop_reason = "converged"
+
+
+class Crawler:
+    """Explores seed nodes and the peers they share.
+
+    Every address is probed at most once per scan, whatever the number of
+    nodes sharing it. Results are keyed by the normalized address, peers
+    skipped because of the frontier budget have no result. `known` peers
+    are probed by the caller on their own schedule, shared by nodes they
+    are not probed again.
+    """
+
+    def __init__(
+        self,
+        local_difficulty: dict,
+        concurrency: int = 100,
+        timeout: float = queries.QueryBase.timeout,
+        peer_timeout: float = 30,
+        geo_lookup=None,
+        max_requests: int = None,
+        max_seconds: float = None,
+        convergence_window: int = None,
+        timeouts: dict = None,
+        known=(),
+    ) -> None:
+        self.local_difficulty = local_difficulty
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.peer_timeout = peer_timeout
+        self.geo_lookup = geo_lookup
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.convergence_window = convergence_window
+
+        self.results = {}
+        self.frontier = None
+        self._priorities = {}
+        self._timeouts = {}
+        for address, peer_timeout in (timeouts or {}).items():
+            url = self._normalize(address)
+            if url:
+                self._timeouts[url] = peer_timeout
+        self._known = {url for url in map(self._normalize, known) if url}
+        self._rtts = {}
+        self._dns = {}
+
+    def _normalize(self, address: str) -> str or None:
+        try:
+            return normalize_node_address(address, settings.DEFAULT_P2P_PORT)
+        except BurstException:
+            logger.debug("Not valid address: %s", address)
+            return None
+
+    async def _resolve(self, url: str) -> str or None:
+        hostname = urlparse(url).hostname
+        if not hostname:
+            return None
+
+        # ipv6
+        if ":" in hostname:
+            return hostname
+
+        if hostname not in self._dns:
+            loop = asyncio.get_running_loop()
+            try:
+                info = await loop.getaddrinfo(
+                    hostname, None, family=socket.AF_INET, type=socket.SOCK_STREAM
+                )
+                self._dns[hostname] = info[0][4][0]
+            except (OSError, IndexError) as e:
+                logger.debug("Can't resolve host: %s - %r", hostname, e)
+                self._dns[hostname] = None
+        return self._dns[hostname]
+
+    async def _country(self, ip: str or None) -> str:
+        if not ip or not self.geo_lookup:
+            return "??"
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.geo_lookup, ip)
+
+    def _schedule(self, address: str, is_node: bool = False) -> None:
+        url = self._normalize(address)
+        if not url:
+            return
+        priority = self._priorities.get(url, Priority.OTHER)
+        self.frontier.push(
+            address, url, is_node, priority, self._timeouts.get(url, self.timeout)
+        )
+
+    async def _request(self, url: str, query: queries.QueryBase) -> dict:
+        self.frontier.requests += 1
+        # as many workers as slots of the client, nobody waits for one: round trip
+        started = monotonic()
+        response = await self.client.request(url, query, self._timeouts.get(url))
+        self._rtts.setdefault(url, []).append(monotonic() - started)
+        return response
+
+    async def _explore(self, address: str, url: str, is_node: bool) -> None:
+        try:
+            await asyncio.wait_for(
+                self._explore_node(address, url) if is_node
+                else self._explore_peer(address, url),
+                self.peer_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.debug("Peer timeout: %s", url)
+            self.results.setdefault(url, None)
+        except Exception:
+            # a bad answer or a failing lookup must not end the worker
+            logger.exception("Peer exploration failed: %s", url)
+            self.results.setdefault(url, None)
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, _, address, url, is_node = await self.frontier.get()
+            try:
+                if self.frontier.exhausted():
+                    self.frontier.skipped.add(url)
+                    continue
+                await self._explore(address, url, is_node)
+                # a node which answers is probed as a peer later
+                if not is_node or url in self.results:
+                    self.frontier.record_probe(priority, self.results.get(url) is not None)
+            finally:
+                self.frontier.task_done()
+
+    async def _explore_node(self, address: str, url: str) -> None:
+        logger.debug("Node: %s", url)
+        try:
+            peers = (await self._request(url, queries.GetPeers()))["peers"]
+        except BurstException:
+            logger.debug("Can't connect to node: %s", url)
+            self.results.setdefault(url, None)
+            return
+
+        for peer in [address] + peers:
+            if self._normalize(peer) not in self._known:
+                self._schedule(peer)
+
+    async def _explore_peer(self, address: str, url: str) -> None:
+        logger.debug("Peer: %s", url)
+        try:
+            peer_info = await self._request(url, queries.GetInfo())
+            if not is_good_version(peer_info["version"]):
+                logger.debug("Old version: %s", peer_info["version"])
+                self.results[url] = None
+                return
+
+            peer_info.update(
+                await self._request(url, queries.GetCumulativeDifficulty())
+            )
+        except BurstException:
+            logger.debug("Can't connect to peer: %s", url)
+            self.results[url] = None
+            return
+
+        try:
+            next_block_ids = (
+                await self._request(
+                    url,
+                    queries.GetNextBlockIds(
+                        {"blockId": self.local_difficulty["previous_block_id"]}
+                    ),
+                )
+            )["nextBlockIds"]
+        except BurstException:
+            logger.debug("Could not get next block ids for %s", url)
+            next_block_ids = []
+
+        announced_address = peer_info.get("announcedAddress") or address
+        default_port = ":" + str(settings.DEFAULT_P2P_PORT)
+        ip = await self._resolve(url)
+
+        self.results[url] = {
+            "announced_address": announced_address.replace(default_port, ""),
+            "real_ip": ip,
+            "country_code": await self._country(ip),
+            "application": peer_info["application"],
+            "platform": peer_info["platform"],
+            "version": peer_info["version"],
+            "height": peer_info["blockchainHeight"],
+            "cumulative_difficulty": peer_info["cumulativeDifficulty"],
+            "last_online_at": timezone.now(),
+            "next_block_ids": next_block_ids,
+            # the slowest answer of this scan, what a timeout has to cover
+            "rtt": max(self._rtts[url]),
+        }
+
+    async def run(self, seeds: list, peers: list = (), priorities: dict = None) -> dict:
+        """Ask seeds for their peers and probe them all, `peers` are probed
+        without asking for their peers. `priorities` maps addresses to
+        Priority, unknown addresses come last."""
+        self.client = AsyncP2PClient(asyncio.Semaphore(self.concurrency), self.timeout)
+        self.frontier = Frontier(
+            self.max_requests, self.max_seconds, self.convergence_window
+        )
+        self._priorities = {}
+        for address, priority in (priorities or {}).items():
+            url = self._normalize(address)
+            if url:
+                self._priorities[url] = priority
+
+        for address in seeds:
+            self._schedule(address, is_node=True)
+        for address in peers:
+            self._schedule(address)
+
+        # workers push new work, wait until the frontier is empty
+        workers = [
+            asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)
+        ]
+        await self.frontier.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        logger.info(
+            "Crawl: %d requests, %d probed, %d skipped in %.1fs, stopped by %s",
+            self.frontier.requests,
+            self.frontier.probed,
+            len(self.frontier.skipped),
+            self.frontier.seconds,
+            self.frontier.stop_reason or "end of work",
+        )
+        return self.results
+
+    def crawl(self, seeds: list, peers: list = (), priorities: dict = None) -> dict:
+        return asyncio.run(self.run(seeds, peers, priorities))
+
+    def unreachable(self, addresses) -> list:
+        """Addresses probed in this scan without an answer, peers skipped
+        by the frontier are not"""
+        unreachable = []
+        for address in addresses:
+            url = self._normalize(address)
+            if url in self.results and self.results[url] is None:
+                unreachable.append(address)
+        return unreachable
+
+    def url(self, address: str) -> str or None:
+        """Key of the address in results"""
+        return self._normalize(address)
+
+
+def merge_results(results: dict) -> list:
+    """One update per announced address, independent of completion order.
+
+    When several urls announce the same address keep the highest height,
+    ties broken by url.
+    """
+    merged = {}
+    for url in sorted(results):
+        update = results[url]
+        if update is None:
+            continue
+        current = merged.get(update["announced_address"])
+        if current is None or update["height"] > current["height"]:
+            merged[update["announced_address"]] = update
+
+    return [merged[address] for address in sorted(merged)]
@@ -0,0 +1,112 @@
+""" Fee statistics: distribution of fees paid in the recent blocks and
+offered in the mempool, and the fee which gets a transaction into the next
+block. Fees are multiples of the fee quant, so distributions are kept as
+counts by fee and updated by block instead of sorting every fee again.
+"""
+
+import math
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from burst.constants import FEE_QUANT, MAX_NUMBER_OF_TRANSACTIONS
+from java_wallet.models import Block, Transaction
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# blocks read again on every update, in case of a reorg
+REORG_DEPTH = 3
+
+
+def percentiles(counts: Counter) -> dict:
+    """Nearest-rank percentiles, min, max and count of a fee histogram"""
+    total = sum(counts.values())
+    if not total:
+        return {"count": 0}
+
+    fees = sorted(counts)
+    result = {"count": total, "min": fees[0], "max": fees[-1]}
+    ranks = [(p, max(math.ceil(p * total / 100), 1)) for p in PERCENTILES]
+    i = seen = 0
+    for fee in fees:
+        seen += counts[fee]
+        while i < len(ranks) and seen >= ranks[i][1]:
+            result[f"p{ranks[i][0]}"] = fee
+            i += 1
+    return result
+
+
+def next_block_fee(pending_fees: list, capacity: int = MAX_NUMBER_OF_TRANSACTIONS) -> int:
+    """Lowest fee still among the `capacity` best paying pending
+    transactions, one quant above the last one which makes it"""
+    if len(pending_fees) < capacity:
+        return FEE_QUANT
+    return sorted(pending_fees, reverse=True)[capacity - 1] + FEE_QUANT
+
+
+class BlockFees:
+    """Rolling window of fee histograms of the last `window` blocks"""
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.height = None
+        self.counts = Counter()
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fetch(start: int, end: int) -> dict:
+        blocks = {height: Counter() for height in range(start, end + 1)}
+        for height, fee in (
+            Transaction.objects.using("java_wallet")
+            .filter(height__gte=start, height__lte=end)
+            .values_list("height", "fee")
+            .iterator()
+        ):
+            blocks[height][fee] += 1
+        return blocks
+
+    def update(self, height: int) -> None:
+        with self._lock:
+            lowest = max(height - self.window + 1, 0)
+            start = lowest
+            # the last blocks again in case of a reorg, the whole window if
+            # popped blocks moved it below the kept blocks
+            if self._blocks and min(self._blocks) <= lowest:
+                start = max(min(self.height, height) - REORG_DEPTH + 1, lowest)
+
+            for h in [h for h in self._blocks if h < lowest or h >= start]:
+                self.counts.subtract(self._blocks.pop(h))
+            for h, counts in self._fetch(start, height).items():
+                self._blocks[h] = counts
+                self.counts.update(counts)
+            self.counts = +self.counts
+            self.height = height
+
+
+def get_last_height() -> int:
+    return (
+        Block.objects.using("java_wallet")
+        .order_by("-height")
+        .values_list("height", flat=True)
+        .first()
+    ) or 0
+
+
+block_fees = BlockFees(settings.FEE_STATS_BLOCKS)
+
+
+def get_fee_stats(pending_txs: list) -> dict:
+    block_fees.update(get_last_height())
+    pending_fees = [t["feeNQT"] for t in pending_txs]
+    return {
+        "height": block_fees.height,
+        "blocks": block_fees.window,
+        "block_fees": percentiles(block_fees.counts),
+        "pending_fees": percentiles(Counter(pending_fees)),
+        "minimum_fee": FEE_QUANT,
+        "next_block_fee": next_block_fee(pending_fees),
+        "updated_at": timezone.now(),
+    }
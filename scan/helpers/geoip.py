@@ -0,0 +1,133 @@
+""" Offline IP to country lookup.
+
+The database is either a MaxMind .mmdb file (needs the optional maxminddb
+package) or a CSV range table, one range per line, in one of the forms:
+
+    1.0.0.0/24,AU
+    1.0.0.0,1.0.0.255,AU
+
+which covers the free db-ip.com "IP to Country Lite" and converted
+GeoLite2 CSV files. Ranges are kept sorted and searched with bisect.
+"""
+
+import csv
+import ipaddress
+import logging
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RangeTable:
+    def __init__(self, typecode: str) -> None:
+        self.typecode = typecode
+        self.starts = array(typecode) if typecode else []
+        self.ends = array(typecode) if typecode else []
+        self.countries = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def build(self, ranges: list) -> None:
+        ranges.sort()
+        for start, end, country in ranges:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.countries.append(country)
+
+    def lookup(self, ip: int) -> str or None:
+        i = bisect_right(self.starts, ip) - 1
+        if i >= 0 and ip <= self.ends[i]:
+            return self.countries[i]
+        return None
+
+
+class CsvGeoIPDatabase:
+    def __init__(self, path: str) -> None:
+        # ipv6 doesn't fit into array items, plain lists for it
+        self.v4 = RangeTable("L")
+        self.v6 = RangeTable(None)
+        self._load(path)
+
+    @staticmethod
+    def _parse_row(row: list) -> tuple or None:
+        if len(row) == 2:
+            network = ipaddress.ip_network(row[0].strip(), strict=False)
+            start, end = network[0], network[-1]
+        else:
+            start = ipaddress.ip_address(row[0].strip())
+            end = ipaddress.ip_address(row[1].strip())
+        country = row[-1].strip().upper()
+        return start, end, country
+
+    def _load(self, path: str) -> None:
+        v4, v6 = [], []
+        countries = {}
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].startswith("#"):
+                    continue
+                try:
+                    start, end, country = self._parse_row(row)
+                except ValueError:
+                    # header or garbage
+                    continue
+                country = countries.setdefault(country, country)
+                ranges = v4 if start.version == 4 else v6
+                ranges.append((int(start), int(end), country))
+
+        self.v4.build(v4)
+        self.v6.build(v6)
+        logger.info("GeoIP database loaded: %d v4, %d v6 ranges", len(v4), len(v6))
+
+    def lookup(self, ip: str) -> str or None:
+        address = ipaddress.ip_address(ip)
+        table = self.v4 if address.version == 4 else self.v6
+        return table.lookup(int(address))
+
+
+class MMDBGeoIPDatabase:
+    def __init__(self, path: str) -> None:
+        import maxminddb
+
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip: str) -> str or None:
+        record = self._reader.get(ip)
+        if not record:
+            return None
+        country = record.get("country") or record.get("registered_country") or {}
+        return country.get("iso_code")
+
+
+def open_database(path: str):
+    if path.endswith(".mmdb"):
+        return MMDBGeoIPDatabase(path)
+    return CsvGeoIPDatabase(path)
+
+
+@lru_cache(maxsize=None)
+def get_database():
+    if not settings.GEOIP_DATABASE:
+        return None
+    try:
+        return open_database(settings.GEOIP_DATABASE)
+    except (OSError, ImportError, ValueError) as e:
+        logger.warning("Can't open GeoIP database: %s - %r", settings.GEOIP_DATABASE, e)
+        return None
+
+
+@lru_cache(maxsize=settings.GEOIP_CACHE_SIZE)
+def lookup_country(ip: str) -> str or None:
+    """Country code by the local database, None if unknown"""
+    database = get_database()
+    if not database:
+        return None
+    try:
+        return database.lookup(ip)
+    except ValueError:
+        return None
@@ -0,0 +1,254 @@
+""" Leases for background commands: whatever the number of hosts, one
+holder runs a job at a time.
+
+The holder renews its lease in a thread, standbys take it over once it
+expires. Every acquisition gets a fencing token greater than all before
+it. Inside a transaction of the explorer database ensure_leader() writes
+the token to the LeaderFence row of the lease, only if no greater token
+wrote there: the row stays locked until the commit, a holder which was
+paused past its lease can't write after its successor did. Outside of a
+transaction, e.g. before a cache update, it only checks that the backend
+still has our token.
+"""
+
+import _thread
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+from django.conf import settings
+from django.db import transaction
+
+from scan.models import LeaderFence
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class RedisLeaseBackend:
+    _renew_script = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("pexpire", KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    _release_script = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("del", KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, client=None) -> None:
+        if client is None:
+            from django_redis import get_redis_connection
+
+            client = get_redis_connection("default")
+        self._client = client
+        self._renew = client.register_script(self._renew_script)
+        self._release = client.register_script(self._release_script)
+
+    def next_token(self, key: str) -> int:
+        return self._client.incr(f"{key}:fence")
+
+    def acquire(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self._client.set(key, value, nx=True, px=int(ttl * 1000)))
+
+    def renew(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self._renew(keys=[key], args=[value, int(ttl * 1000)]))
+
+    def release(self, key: str, value: str) -> None:
+        self._release(keys=[key], args=[value])
+
+    def get(self, key: str) -> str or None:
+        value = self._client.get(key)
+        return value.decode() if value is not None else None
+
+
+class LocalLeaseBackend:
+    """In-process stand-in for Redis, for tests and single host setups"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values = {}
+        self._tokens = {}
+
+    def _alive(self, key: str) -> str or None:
+        value, expires = self._values.get(key, (None, 0))
+        if value is not None and expires <= monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    def next_token(self, key: str) -> int:
+        with self._lock:
+            self._tokens[key] = self._tokens.get(key, 0) + 1
+            return self._tokens[key]
+
+    def acquire(self, key: str, value: str, ttl: float) -> bool:
+        with self._lock:
+            if self._alive(key) is not None:
+                return False
+            self._values[key] = (value, monotonic() + ttl)
+            return True
+
+    def renew(self, key: str, value: str, ttl: float) -> bool:
+        with self._lock:
+            if self._alive(key) != value:
+                return False
+            self._values[key] = (value, monotonic() + ttl)
+            return True
+
+    def release(self, key: str, value: str) -> None:
+        with self._lock:
+            if self._alive(key) == value:
+                del self._values[key]
+
+    def get(self, key: str) -> str or None:
+        with self._lock:
+            return self._alive(key)
+
+
+class Lease:
+    def __init__(self, name: str, backend, ttl: float, on_lost=None) -> None:
+        self.key = f"leader:{name}"
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.on_lost = on_lost
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token = None
+        self.lost = threading.Event()
+
+        self._value = None
+        self._stopped = threading.Event()
+        self._renewal = None
+
+    def try_acquire(self) -> bool:
+        token = self.backend.next_token(self.key)
+        value = f"{token}:{self.holder}"
+        if not self.backend.acquire(self.key, value, self.ttl):
+            return False
+        self.token, self._value = token, value
+        self.lost.clear()
+        return True
+
+    def acquire(self, retry_interval: float = None) -> None:
+        """Wait until the lease is free and take it"""
+        retry_interval = retry_interval or self.ttl / 3
+        logged = False
+        while not self.try_acquire():
+            if not logged:
+                logger.info("Lease %s is held by %s, standing by", self.name, self.backend.get(self.key))
+                logged = True
+            sleep(retry_interval)
+        logger.info("Lease %s acquired, token %d", self.name, self.token)
+        self._start_renewal()
+
+    def _start_renewal(self) -> None:
+        self._stopped.clear()
+        self._renewal = threading.Thread(
+            target=self._renew, name=f"lease-{self.name}", daemon=True
+        )
+        self._renewal.start()
+
+    def _renew(self) -> None:
+        renewed_at = monotonic()
+        while not self._stopped.wait(self.ttl / 3):
+            try:
+                if self.backend.renew(self.key, self._value, self.ttl):
+                    renewed_at = monotonic()
+                    continue
+            except Exception as e:
+                # backend unreachable: the lease is ours until it expires
+                logger.warning("Lease %s renewal error: %r", self.name, e)
+                if monotonic() - renewed_at < self.ttl:
+                    continue
+            self._lose()
+            return
+
+    def _lose(self) -> None:
+        logger.error("Lease %s lost, token %s", self.name, self.token)
+        self.lost.set()
+        if self.on_lost:
+            self.on_lost()
+
+    def ensure(self) -> None:
+        """Raises LeaseLost unless the backend still has our token"""
+        if self.lost.is_set() or self.backend.get(self.key) != self._value:
+            raise LeaseLost(f"{self.name}, token {self.token}")
+
+    def release(self) -> None:
+        self._stopped.set()
+        if self._renewal:
+            self._renewal.join()
+        if self._value and not self.lost.is_set():
+            self.backend.release(self.key, self._value)
+        self._value = None
+
+
+_local_backend = LocalLeaseBackend()
+# lease of this process, checked by the threads of its command too
+_current = None
+
+
+def get_backend():
+    if settings.LEADER_ELECTION == "local":
+        return _local_backend
+    return RedisLeaseBackend()
+
+
+@contextmanager
+def leader_lease(name: str, ttl: float = None):
+    """Runs the block as the only holder of `name`, waiting for the lease
+    first. When the lease is lost the main thread gets KeyboardInterrupt,
+    the command exits and its supervisor restarts it as a standby."""
+    global _current
+
+    if settings.LEADER_ELECTION == "off":
+        yield None
+        return
+
+    lease = Lease(
+        name,
+        get_backend(),
+        ttl or settings.LEADER_LEASE_TTL,
+        on_lost=_thread.interrupt_main,
+    )
+    lease.acquire()
+    _current = lease
+    try:
+        yield lease
+    finally:
+        _current = None
+        lease.release()
+
+
+def _fence(lease: Lease) -> None:
+    fence = LeaderFence.objects.filter(name=lease.name)
+    if fence.filter(token__lte=lease.token).update(token=lease.token):
+        return
+    # first write of the lease, a concurrent one takes the row first
+    LeaderFence.objects.bulk_create(
+        [LeaderFence(name=lease.name, token=lease.token)], ignore_conflicts=True
+    )
+    if not fence.filter(token__lte=lease.token).update(token=lease.token):
+        raise LeaseLost(f"{lease.name}, token {lease.token} fenced off")
+
+
+def ensure_leader() -> None:
+    """Fencing before a write, no-op outside of leader_lease. Writes of a
+    transaction are fenced in the database, see the module docstring."""
+    lease = _current
+    if lease is None:
+        return
+    lease.ensure()
+    if transaction.get_connection().in_atomic_block:
+        _fence(lease)
@@ -5,16 +5,15 @@ import json
 from ctypes import c_ulonglong, c_longlong
 from datetime import datetime
 from MySQLdb import Timestamp
-from django.conf import settings
 
-from django.db.models import F, OuterRef, Q, Sum
+from django.db.models import Count, F, OuterRef, Q, Sum
 
 from cache_memoize import cache_memoize
-from burst.api.brs.v1.api import BrsApi
-from burst.constants import BLOCK_CHAIN_START_AT, TxSubtypeBurstMining, TxSubtypeColoredCoins, TxType
-from java_wallet.fields import get_desc_tx_type
+from burst.constants import TxSubtypeBurstMining, TxSubtypeColoredCoins, TxType
 
 from java_wallet.models import Account, AccountBalance, Alias, Asset, At, AtState, Block, RewardRecipAssign, Trade, Transaction,IndirectIncoming, Subscription
+from scan.block_index import block_index
+from scan.caching_data.pending_txs import CachingPendingTxs
 
 
 @cache_memoize(3600)
@@ -179,6 +178,19 @@ def get_asset_details_owner(asset_id: int) -> (str, int, int, bool, int):
 def get_txs_count_in_block(block_id: int) -> int:
     return Transaction.objects.using("java_wallet").filter(block_id=block_id).count()
 
+def get_txs_count_in_blocks(block_ids: list) -> dict:
+    """Bulk get_txs_count_in_block, one query for a page of blocks"""
+    counts = dict.fromkeys(block_ids, 0)
+    counts.update(
+        Transaction.objects.using("java_wallet")
+        .filter(block_id__in=block_ids)
+        .order_by()
+        .values("block_id")
+        .annotate(cnt=Count("db_id"))
+        .values_list("block_id", "cnt")
+    )
+    return counts
+
 
 def get_pool_id_for_block(block: Block) -> int:
     elapsed = datetime.now() - block.timestamp
@@ -232,6 +244,32 @@ def get_asset_price(asset_id : int) -> float:
 def get_pool_id_for_block_cached(block: Block) -> int:
     return get_pool_id_for_block_db(block)
 
+def get_pool_ids_for_blocks(blocks: list) -> dict:
+    """Bulk get_pool_id_for_block: the reward recipient assignments of all
+    generators of a page of blocks in one query, pool ids by block id"""
+    if not blocks:
+        return {}
+    assignments = {}
+    for sender_id, height, recipient_id in (
+        Transaction.objects.using("java_wallet")
+        .filter(type=TxType.BURST_MINING, subtype=TxSubtypeBurstMining.REWARD_RECIPIENT_ASSIGNMENT,
+            height__lte=max(b.height for b in blocks),
+            sender_id__in={b.generator_id for b in blocks})
+        .values_list("sender_id", "height", "recipient_id")
+        .order_by("height")
+    ):
+        assignments.setdefault(sender_id, []).append((height, recipient_id))
+
+    pool_ids = {}
+    for block in blocks:
+        # the last assignment up to the block
+        pool_ids[block.id] = None
+        for height, recipient_id in assignments.get(block.generator_id, ()):
+            if height > block.height:
+                break
+            pool_ids[block.id] = recipient_id
+    return pool_ids
+
 @cache_memoize(3600)
 def get_pool_id_for_account(address_id: int) -> int:
     return (
@@ -243,45 +281,8 @@ def get_pool_id_for_account(address_id: int) -> int:
     )
 
 
-@cache_memoize(10)
 def get_unconfirmed_transactions():
-    txs_pending = BrsApi(settings.SIGNUM_NODE).get_unconfirmed_transactions()
-
-    for t in txs_pending:
-        t["timestamp"] = datetime.fromtimestamp(
-            t["timestamp"] + BLOCK_CHAIN_START_AT
-        )
-        t["amountNQT"] = int(t["amountNQT"])
-        t["feeNQT"] = int(t["feeNQT"])
-        t["sender_name"] = get_account_name(int(t["sender"]))
-        t["has_message"] = False
-        t["has_encrypted_message"] = False
-
-        if "recipient" in t:
-            t["recipient_exists"] = (
-                Account.objects.using("java_wallet")
-                .filter(id=t["recipient"])
-                .exists()
-            )
-            if t["recipient_exists"]:
-                t["recipient_name"] = get_account_name(int(t["recipient"]))
-
-        t["attachment_bytes"] = None
-        if "attachmentBytes" in t:
-            t["attachment_bytes"] =  bytes.fromhex(t["attachmentBytes"])
-        if "attachment" in t and "recipients" in t["attachment"]:
-            t["multiout"] = len(t["attachment"]["recipients"])
-        if "attachment" in t and "message" in t["attachment"] and "messageIsText" in t["attachment"]:
-            t["message_pend"] = t["attachment"]["message"]
-            t["has_message"] = True
-        if "attachment" in t and "encryptedMessage" in t["attachment"]:
-            t["has_encrypted_message"] = True    
-
-        t["tx_name"] = get_desc_tx_type(t["type"], t["subtype"])
-
-    txs_pending.sort(key=lambda _x: _x["feeNQT"], reverse=True)
-
-    return txs_pending
+    return CachingPendingTxs().cached_data
 
 @cache_memoize(120)
 def get_description_url(pool_id: int) -> str:
@@ -325,8 +326,11 @@ def get_count_of_miners(pool_id: int) -> int:
         .filter(latest=1)
     ).count()
 
-@cache_memoize(120)
 def get_timestamp_of_block(height: int) -> datetime:
+    return block_index.timestamp(height) or get_timestamp_of_block_cached(height)
+
+@cache_memoize(120)
+def get_timestamp_of_block_cached(height: int) -> datetime:
     return (
         Block.objects.using("java_wallet")
         .filter(height=height)
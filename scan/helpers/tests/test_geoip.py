@@ -0,0 +1,33 @@
+import os
+from unittest import TestCase
+
+from scan.helpers.geoip import CsvGeoIPDatabase
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "geoip.csv")
+
+
+class CsvGeoIPDatabaseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = CsvGeoIPDatabase(FIXTURE)
+
+    def test_loaded(self):
+        self.assertEqual(len(self.db.v4), 4)
+        self.assertEqual(len(self.db.v6), 2)
+
+    def test_v4(self):
+        self.assertEqual(self.db.lookup("1.0.0.0"), "AU")
+        self.assertEqual(self.db.lookup("1.0.2.10"), "CN")
+        self.assertEqual(self.db.lookup("1.0.3.255"), "CN")
+        self.assertEqual(self.db.lookup("5.9.12.1"), "DE")
+        self.assertEqual(self.db.lookup("8.8.8.8"), "US")
+
+    def test_v6(self):
+        self.assertEqual(self.db.lookup("2001:db8::1"), "NL")
+        self.assertEqual(self.db.lookup("2a01:4f8:10::1"), "DE")
+
+    def test_unknown(self):
+        self.assertIsNone(self.db.lookup("1.0.4.0"))
+        self.assertIsNone(self.db.lookup("0.0.0.1"))
+        self.assertIsNone(self.db.lookup("9.9.9.9"))
+        self.assertIsNone(self.db.lookup("2001:db9::1"))
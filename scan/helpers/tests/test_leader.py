@@ -0,0 +1,172 @@
+import threading
+import time
+from unittest import TestCase
+
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from scan.helpers import leader
+from scan.helpers.leader import (
+    Lease,
+    LeaseLost,
+    LocalLeaseBackend,
+    ensure_leader,
+    leader_lease,
+)
+from scan.models import LeaderFence
+
+TTL = 0.3
+
+
+class LeaseTest(TestCase):
+    def setUp(self):
+        self.backend = LocalLeaseBackend()
+
+    def lease(self, **kwargs) -> Lease:
+        return Lease("job", self.backend, TTL, **kwargs)
+
+    def test_one_holder(self):
+        first, second = self.lease(), self.lease()
+        self.assertTrue(first.try_acquire())
+        self.assertFalse(second.try_acquire())
+
+        first.ensure()
+        with self.assertRaises(LeaseLost):
+            second.ensure()
+
+    def test_renewal(self):
+        first, second = self.lease(), self.lease()
+        first.acquire()
+        try:
+            time.sleep(TTL * 3)
+            self.assertFalse(second.try_acquire())
+            first.ensure()
+        finally:
+            first.release()
+        self.assertTrue(second.try_acquire())
+
+    def test_takeover(self):
+        first, second = self.lease(), self.lease()
+        self.assertTrue(first.try_acquire())
+        # the holder dies without renewing or releasing
+        threading.Thread(target=second.acquire, args=(0.05,)).start()
+        time.sleep(TTL * 2)
+        second.ensure()
+        second.release()
+
+    def test_fencing_token(self):
+        lost = threading.Event()
+        first, second = self.lease(on_lost=lost.set), self.lease()
+        first.acquire()
+        # the holder pauses past its lease and a standby takes over
+        first._stopped.set()
+        first._renewal.join()
+        time.sleep(TTL * 1.5)
+        self.assertTrue(second.try_acquire())
+        self.assertGreater(second.token, first.token)
+
+        with self.assertRaises(LeaseLost):
+            first.ensure()
+        first._start_renewal()
+        self.assertTrue(lost.wait(TTL * 2))
+
+        # releasing a lost lease doesn't free the successor's
+        first.release()
+        second.ensure()
+
+
+@override_settings(LEADER_ELECTION="local", LEADER_LEASE_TTL=TTL)
+class LeaderLeaseTest(SimpleTestCase):
+    def test_ensure_leader(self):
+        ensure_leader()
+        with leader_lease("job") as lease:
+            ensure_leader()
+            # lost without the renewal thread noticing it
+            lease._stopped.set()
+            lease._renewal.join()
+            lease.backend.release(lease.key, lease._value)
+            with self.assertRaises(LeaseLost):
+                ensure_leader()
+        ensure_leader()
+
+    def test_ensure_leader_in_threads(self):
+        """Pool threads of the command, e.g. the tasks, check the same lease"""
+        errors = []
+
+        def write():
+            try:
+                ensure_leader()
+            except LeaseLost as e:
+                errors.append(e)
+
+        with leader_lease("job") as lease:
+            lease._stopped.set()
+            lease._renewal.join()
+            lease.backend.release(lease.key, lease._value)
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_standby(self):
+        order = []
+
+        def job(name):
+            with leader_lease("job"):
+                order.append(f"{name} start")
+                time.sleep(TTL)
+                order.append(f"{name} end")
+
+        threads = [threading.Thread(target=job, args=(n,)) for n in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([o.split()[1] for o in order], ["start", "end"] * 2)
+        self.assertEqual(order[0][0], order[1][0])
+
+    @override_settings(LEADER_ELECTION="off")
+    def test_off(self):
+        with leader_lease("job") as lease:
+            self.assertIsNone(lease)
+
+
+class FenceTest(TransactionTestCase):
+    def setUp(self):
+        self.backend = LocalLeaseBackend()
+        self.first, self.second = Lease("job", self.backend, TTL), Lease("job", self.backend, TTL)
+        self.assertTrue(self.first.try_acquire())
+
+    def write(self, lease: Lease) -> None:
+        leader._current = lease
+        try:
+            with transaction.atomic():
+                ensure_leader()
+                LeaderFence.objects.get_or_create(name="write", defaults={"token": lease.token})
+        finally:
+            leader._current = None
+
+    def test_former_holder_fenced_off(self):
+        self.write(self.first)
+        self.assertEqual(LeaderFence.objects.get(name="job").token, self.first.token)
+
+        # paused past its lease, the first holder still believes it holds it
+        self.backend.release(self.first.key, self.first._value)
+        self.assertTrue(self.second.try_acquire())
+        self.write(self.second)
+        self.backend._values[self.first.key] = (self.first._value, time.monotonic() + TTL)
+
+        LeaderFence.objects.filter(name="write").delete()
+        with self.assertRaises(LeaseLost):
+            self.write(self.first)
+        # rolled back with the transaction
+        self.assertFalse(LeaderFence.objects.filter(name="write").exists())
+        self.assertEqual(LeaderFence.objects.get(name="job").token, self.second.token)
+
+    def test_outside_of_transaction(self):
+        leader._current = self.first
+        try:
+            ensure_leader()
+        finally:
+            leader._current = None
+        self.assertFalse(LeaderFence.objects.exists())
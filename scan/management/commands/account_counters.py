@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand, CommandError
+
+from scan.account_counters import (
+    CountersOutOfSync,
+    rebuild_account_counters,
+    recount_accounts,
+)
+
+
+class Command(BaseCommand):
+    help = "Build the account counters or count some accounts again"
+
+    def add_arguments(self, parser):
+        parser.add_argument("account_ids", nargs="*", type=int, help="Accounts to count again")
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Count every account from the whole chain",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            accounts = rebuild_account_counters()
+            self.stdout.write(f"Counted {accounts} accounts")
+        elif options["account_ids"]:
+            try:
+                recount_accounts(options["account_ids"])
+            except CountersOutOfSync as e:
+                raise CommandError(e)
+            self.stdout.write(f"Counted {len(options['account_ids'])} accounts")
+        else:
+            raise CommandError("Give account ids or --rebuild")
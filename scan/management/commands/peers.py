@@ -1,10 +1,24 @@
 from django.core.management import BaseCommand
 
-from scan.peers import peer_cmd
+from scan.helpers.leader import leader_lease
+from scan.peer_daemon import peer_daemon
+from scan.peers import peer_cmd, wait_scan_delay
 
 
 class Command(BaseCommand):
     help = "Peers monitor"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running and probe every peer on its own interval",
+        )
+
     def handle(self, *args, **options):
-        peer_cmd()
+        with leader_lease("peers"):
+            wait_scan_delay()
+            if options["daemon"]:
+                peer_daemon()
+            else:
+                peer_cmd()
@@ -1,10 +1,19 @@
 from django.core.management import BaseCommand
 
+from scan.helpers.leader import leader_lease
 from scan.tasks import task_cmd
 
 
 class Command(BaseCommand):
     help = "Tasks"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run every task once and exit instead of keeping the schedule",
+        )
+
     def handle(self, *args, **options):
-        task_cmd()
+        with leader_lease("tasks"):
+            task_cmd(once=options["once"])
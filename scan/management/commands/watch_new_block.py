@@ -1,19 +1,52 @@
+import logging
 from time import sleep
 
 from django.core.management import BaseCommand
 
+from scan.account_counters import CountersOutOfSync, update_account_counters
+from scan.asset_candles import update_asset_candles
+from scan.asset_stats import update_asset_stats
+from scan.caching_data.last_block_id import CachingLastBlockId
 from scan.caching_data.last_height import CachingLastHeight
+from scan.helpers.leader import LeaseLost, leader_lease
+
+logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
     help = "Watch new block"
 
     def handle(self, *args, **options):
-        last_height = 0
-        while True:
-            height = CachingLastHeight().live_data
-            if last_height != height:
-                last_height = height
-                print(f"New block: {height}")
-                CachingLastHeight().update_data(height)
-            sleep(1)
+        with leader_lease("watch_new_block"):
+            last_block = None
+            while True:
+                height = CachingLastHeight().live_data
+                # a reorg may replace the last block at the same height
+                block_id = CachingLastBlockId().live_data
+                if last_block != (height, block_id):
+                    last_block = height, block_id
+                    print(f"New block: {height}")
+                    CachingLastHeight().update_data(height)
+                    CachingLastBlockId().update_data(block_id)
+                    try:
+                        update_account_counters(height)
+                    except CountersOutOfSync as e:
+                        logger.error("Account counters: %s, run account_counters --rebuild", e)
+                    except LeaseLost:
+                        raise
+                    except Exception:
+                        # counted on the next block, the watcher goes on
+                        logger.exception("Account counters update failed")
+                    try:
+                        update_asset_candles()
+                    except LeaseLost:
+                        raise
+                    except Exception:
+                        logger.exception("Asset candles update failed")
+                    try:
+                        update_asset_stats()
+                    except LeaseLost:
+                        raise
+                    except Exception:
+                        logger.exception("Asset stats update failed")
+                sleep(1)
@@ -0,0 +1,144 @@
+""" Pending transactions of the node, kept between fetches. Every refresh
+diffs the node's pool against the known one: gone transactions are
+dropped, only new ones are enriched, with one query for all of them, and
+the sorted views are updated in place.
+"""
+
+import logging
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from burst.api.nodes import get_node_set
+from burst.constants import BLOCK_CHAIN_START_AT
+from java_wallet.fields import get_desc_tx_type
+from java_wallet.models import Account, At
+
+logger = logging.getLogger(__name__)
+
+
+def get_account_names(account_ids: set) -> dict:
+    """Bulk get_account_name: latest account names, AT names otherwise"""
+    names = dict(
+        Account.objects.using("java_wallet")
+        .filter(id__in=account_ids, latest=True)
+        .exclude(name__isnull=True)
+        .exclude(name="")
+        .values_list("id", "name")
+    )
+    missing = account_ids - names.keys()
+    if missing:
+        names.update(
+            At.objects.using("java_wallet")
+            .filter(id__in=missing, latest=True)
+            .values_list("id", "name")
+        )
+    if 0 in account_ids:
+        names[0] = "Burn Address"
+    return names
+
+
+def get_existing_accounts(account_ids: set) -> set:
+    return set(
+        Account.objects.using("java_wallet")
+        .filter(id__in=account_ids)
+        .values_list("id", flat=True)
+        .distinct()
+    )
+
+
+def prepare_tx(t: dict) -> dict:
+    """Conversions of one transaction which don't need the database"""
+    t["timestamp"] = datetime.fromtimestamp(t["timestamp"] + BLOCK_CHAIN_START_AT)
+    t["amountNQT"] = int(t["amountNQT"])
+    t["feeNQT"] = int(t["feeNQT"])
+    t["has_message"] = False
+    t["has_encrypted_message"] = False
+
+    t["attachment_bytes"] = None
+    if "attachmentBytes" in t:
+        t["attachment_bytes"] = bytes.fromhex(t["attachmentBytes"])
+    attachment = t.get("attachment", {})
+    if "recipients" in attachment:
+        t["multiout"] = len(attachment["recipients"])
+    if "message" in attachment and "messageIsText" in attachment:
+        t["message_pend"] = attachment["message"]
+        t["has_message"] = True
+    if "encryptedMessage" in attachment:
+        t["has_encrypted_message"] = True
+
+    t["tx_name"] = get_desc_tx_type(t["type"], t["subtype"])
+    return t
+
+
+def enrich_txs(txs: list) -> None:
+    """Sender and recipient names of new transactions, in bulk"""
+    if not txs:
+        return
+    recipients = {int(t["recipient"]) for t in txs if "recipient" in t}
+    existing = get_existing_accounts(recipients)
+    names = get_account_names({int(t["sender"]) for t in txs} | (recipients & existing))
+
+    for t in txs:
+        t["sender_name"] = names.get(int(t["sender"]))
+        if "recipient" in t:
+            t["recipient_exists"] = int(t["recipient"]) in existing
+            if t["recipient_exists"]:
+                t["recipient_name"] = names.get(int(t["recipient"]))
+
+
+class Mempool:
+    def __init__(self) -> None:
+        self.txs = {}
+        self._by_fee = []
+        self._by_time = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fee_key(t: dict) -> tuple:
+        return -t["feeNQT"], t["timestamp"], t["transaction"]
+
+    @staticmethod
+    def _time_key(t: dict) -> tuple:
+        return -t["timestamp"].timestamp(), t["transaction"]
+
+    @staticmethod
+    def _remove(keys: list, key: tuple) -> None:
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def update(self, pending: list) -> tuple:
+        """Applies the node's pool, returns (added transactions, removed ids)"""
+        with self._lock:
+            ids = {t["transaction"] for t in pending}
+            removed = [tx_id for tx_id in self.txs if tx_id not in ids]
+            added = [prepare_tx(t) for t in pending if t["transaction"] not in self.txs]
+            enrich_txs(added)
+
+            for tx_id in removed:
+                t = self.txs.pop(tx_id)
+                self._remove(self._by_fee, self._fee_key(t))
+                self._remove(self._by_time, self._time_key(t))
+            for t in added:
+                self.txs[t["transaction"]] = t
+                insort(self._by_fee, self._fee_key(t))
+                insort(self._by_time, self._time_key(t))
+
+        if added or removed:
+            logger.debug("Mempool: %d added, %d removed", len(added), len(removed))
+        return added, removed
+
+    def refresh(self) -> tuple:
+        return self.update(get_node_set().call("get_unconfirmed_transactions"))
+
+    def by_fee(self) -> list:
+        with self._lock:
+            return [self.txs[key[-1]] for key in self._by_fee]
+
+    def by_time(self) -> list:
+        with self._lock:
+            return [self.txs[key[-1]] for key in self._by_time]
+
+
+mempool = Mempool()
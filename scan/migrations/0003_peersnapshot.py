@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scan', '0002_delete_multiout_alter_peermonitor_reward_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeerSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveSmallIntegerField(choices=[(0, 'scan'), (1, 'hourly'), (2, 'daily')], default=0)),
+                ('samples', models.PositiveIntegerField(default=1)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('states', models.JSONField(default=dict)),
+                ('versions', models.JSONField(default=dict)),
+                ('platforms', models.JSONField(default=dict)),
+                ('countries', models.JSONField(default=dict)),
+                ('height_lag', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'created_at'], name='scan_peersn_resolut_59e542_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scan', '0003_peersnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='peermonitor',
+            name='rtt_samples',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
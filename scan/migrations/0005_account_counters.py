@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:05
+
+from django.db import migrations, models
+import java_wallet.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scan', '0004_peermonitor_rtt_samples'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountCounters',
+            fields=[
+                ('account_id', java_wallet.fields.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('txs_cnt', models.PositiveIntegerField(default=0)),
+                ('indirects_cnt', models.PositiveIntegerField(default=0)),
+                ('assets_transfers_cnt', models.PositiveIntegerField(default=0)),
+                ('assets_trades_cnt', models.PositiveIntegerField(default=0)),
+                ('mined_blocks_cnt', models.PositiveIntegerField(default=0)),
+                ('cbs_cnt', models.PositiveIntegerField(default=0)),
+                ('cbs_fee', java_wallet.fields.PositiveBigIntegerField(default=0)),
+                ('assets_cnt', models.PositiveIntegerField(default=0)),
+                ('alias_cnt', models.PositiveIntegerField(default=0)),
+                ('ats_cnt', models.PositiveIntegerField(default=0)),
+                ('subscription_cnt', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CountedBlock',
+            fields=[
+                ('height', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('block_id', java_wallet.fields.PositiveBigIntegerField()),
+                ('deltas', models.JSONField(blank=True, null=True)),
+            ],
+        ),
+    ]
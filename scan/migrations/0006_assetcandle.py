@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:13
+
+from django.db import migrations, models
+import java_wallet.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scan', '0005_account_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetCandle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset_id', java_wallet.fields.PositiveBigIntegerField()),
+                ('resolution', models.PositiveSmallIntegerField(choices=[(0, '1h'), (1, '1d'), (2, '1w')])),
+                ('start', models.PositiveIntegerField()),
+                ('open', java_wallet.fields.PositiveBigIntegerField()),
+                ('high', java_wallet.fields.PositiveBigIntegerField()),
+                ('low', java_wallet.fields.PositiveBigIntegerField()),
+                ('close', java_wallet.fields.PositiveBigIntegerField()),
+                ('volume', java_wallet.fields.PositiveBigIntegerField()),
+                ('trades', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField(db_index=True)),
+            ],
+            options={
+                'unique_together': {('asset_id', 'resolution', 'start')},
+            },
+        ),
+    ]
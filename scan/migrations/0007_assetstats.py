@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:18
+
+from django.db import migrations, models
+import java_wallet.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scan', '0006_assetcandle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetStats',
+            fields=[
+                ('asset_id', java_wallet.fields.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('holders', models.PositiveIntegerField(db_index=True, default=0)),
+                ('transfers', models.PositiveIntegerField(default=0)),
+                ('trades', models.PositiveIntegerField(default=0)),
+                ('volume_24h', java_wallet.fields.PositiveBigIntegerField(db_index=True, default=0)),
+                ('volume_7d', java_wallet.fields.PositiveBigIntegerField(db_index=True, default=0)),
+                ('last_price', java_wallet.fields.PositiveBigIntegerField(default=0)),
+                ('circulating', java_wallet.fields.PositiveBigIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+        ),
+    ]
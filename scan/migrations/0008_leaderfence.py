@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:49
+
+from django.db import migrations, models
+import java_wallet.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scan', '0007_assetstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderFence',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('token', java_wallet.fields.PositiveBigIntegerField()),
+            ],
+        ),
+    ]
@@ -3,7 +3,9 @@ from django.db.models import (
     CharField,
     DateTimeField,
     FloatField,
+    Index,
     IntegerField,
+    JSONField,
     Model,
     PositiveIntegerField,
     PositiveSmallIntegerField,
@@ -51,3 +53,134 @@ class PeerMonitor(Model):
 
     reward_state = CharField(max_length=255, blank=True, null=True, default='none')
     reward_time = DateTimeField(blank=True, null=True)
+
+    # slowest answer of the last scans, seconds
+    rtt_samples = JSONField(default=list, blank=True)
+
+
+class PeerSnapshot(Model):
+    """Aggregated peers network state, one row per scan. Old rows are merged
+    into hourly and daily buckets, counts are sums over `samples` scans.
+    """
+
+    class Resolution:
+        SCAN = 0
+        HOURLY = 1
+        DAILY = 2
+
+    RESOLUTION_CHOICES = (
+        (Resolution.SCAN, _("scan")),
+        (Resolution.HOURLY, _("hourly")),
+        (Resolution.DAILY, _("daily")),
+    )
+
+    resolution = PositiveSmallIntegerField(
+        choices=RESOLUTION_CHOICES, default=Resolution.SCAN
+    )
+    samples = PositiveIntegerField(default=1)
+    height = PositiveIntegerField(default=0)
+
+    states = JSONField(default=dict)
+    versions = JSONField(default=dict)
+    platforms = JSONField(default=dict)
+    countries = JSONField(default=dict)
+    height_lag = JSONField(default=dict)
+
+    created_at = DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [Index(fields=["resolution", "created_at"])]
+
+
+class AccountCounters(Model):
+    """Counts of the address page tabs by account, see scan/account_counters.py"""
+
+    account_id = PositiveBigIntegerField(primary_key=True)
+
+    # rows added by blocks, changed by the deltas of every block
+    txs_cnt = PositiveIntegerField(default=0)
+    indirects_cnt = PositiveIntegerField(default=0)
+    assets_transfers_cnt = PositiveIntegerField(default=0)
+    assets_trades_cnt = PositiveIntegerField(default=0)
+    mined_blocks_cnt = PositiveIntegerField(default=0)
+    cbs_cnt = PositiveIntegerField(default=0)
+    cbs_fee = PositiveBigIntegerField(default=0)
+
+    # current state, counted again when a block touches the account
+    assets_cnt = PositiveIntegerField(default=0)
+    alias_cnt = PositiveIntegerField(default=0)
+    ats_cnt = PositiveIntegerField(default=0)
+    subscription_cnt = PositiveIntegerField(default=0)
+
+
+class CountedBlock(Model):
+    """Blocks in the account counters with their deltas, taken back on a
+    reorg. The oldest one without deltas is where the counters were built.
+    """
+
+    height = PositiveIntegerField(primary_key=True)
+    block_id = PositiveBigIntegerField()
+    # {account id: [deltas of the block fields of AccountCounters]}
+    deltas = JSONField(blank=True, null=True)
+
+
+class AssetCandle(Model):
+    """Open, high, low, close and volume of the trades of an asset by
+    period, see scan/asset_candles.py. Prices per QNT in NQT as in trades.
+    """
+
+    class Resolution:
+        HOUR = 0
+        DAY = 1
+        WEEK = 2
+
+    RESOLUTION_CHOICES = (
+        (Resolution.HOUR, _("1h")),
+        (Resolution.DAY, _("1d")),
+        (Resolution.WEEK, _("1w")),
+    )
+
+    asset_id = PositiveBigIntegerField()
+    resolution = PositiveSmallIntegerField(choices=RESOLUTION_CHOICES)
+    # unix time of the period start
+    start = PositiveIntegerField()
+
+    open = PositiveBigIntegerField()
+    high = PositiveBigIntegerField()
+    low = PositiveBigIntegerField()
+    close = PositiveBigIntegerField()
+    volume = PositiveBigIntegerField()
+    trades = PositiveIntegerField()
+    # last trade in the period
+    height = PositiveIntegerField(db_index=True)
+
+    class Meta:
+        unique_together = (("asset_id", "resolution", "start"),)
+
+
+class AssetStats(Model):
+    """Numbers of the asset list and page by asset, see scan/asset_stats.py"""
+
+    asset_id = PositiveBigIntegerField(primary_key=True)
+
+    holders = PositiveIntegerField(default=0, db_index=True)
+    transfers = PositiveIntegerField(default=0)
+    trades = PositiveIntegerField(default=0)
+    # NQT paid in the trades of the 24 hours and 7 days before the last block
+    volume_24h = PositiveBigIntegerField(default=0, db_index=True)
+    volume_7d = PositiveBigIntegerField(default=0, db_index=True)
+    # price per QNT in NQT of the last trade
+    last_price = PositiveBigIntegerField(default=0)
+    # quantity less the balances of the treasury accounts
+    circulating = PositiveBigIntegerField(default=0)
+
+    # last block with a change of the asset
+    height = PositiveIntegerField(default=0, db_index=True)
+
+
+class LeaderFence(Model):
+    """Highest fencing token which wrote in the explorer database by lease
+    name, see scan/helpers/leader.py"""
+
+    name = CharField(max_length=64, primary_key=True)
+    token = PositiveBigIntegerField()
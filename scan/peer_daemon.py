@@ -0,0 +1,187 @@
+""" Resident peers monitor. Every peer is probed on its own interval:
+healthy peers often, unreachable peers with exponential backoff. Results
+are written after every batch instead of one transaction per scan.
+"""
+
+import heapq
+import logging
+import random
+from time import monotonic, sleep
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from scan.crawler import Crawler, merge_results
+from scan.models import PeerMonitor
+from scan.peers import (
+    delete_stale_peers,
+    finish_scan,
+    get_country_by_ip,
+    get_local_difficulty,
+    get_peer_timeouts,
+    save_scan,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PeerScheduler:
+    """Min-heap of (due time, address)"""
+
+    def __init__(self, interval: float, max_interval: float) -> None:
+        self.interval = interval
+        self.max_interval = max_interval
+        self._heap = []
+        self._due = {}
+        self._failures = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._due
+
+    def __iter__(self):
+        return iter(list(self._due))
+
+    def next_interval(self, address: str) -> float:
+        failures = self._failures.get(address, 0)
+        return min(self.interval * 2 ** failures, self.max_interval)
+
+    def add(self, address: str, due: float, failures: int = None) -> None:
+        if failures is None:
+            failures = self._failures.get(address, 0)
+        self._failures[address] = failures
+        self._due[address] = due
+        heapq.heappush(self._heap, (due, address))
+
+    def reschedule(self, address: str, now: float, ok: bool) -> None:
+        failures = 0 if ok else self._failures.get(address, 0) + 1
+        self._failures[address] = failures
+        # a little jitter so peers found together are not probed together forever
+        due = now + self.next_interval(address) * random.uniform(0.9, 1.1)
+        self.add(address, due, failures)
+
+    def retain(self, addresses: set) -> None:
+        """Forget peers not in addresses, heap entries are skipped lazily"""
+        for address in list(self._due):
+            if address not in addresses:
+                del self._due[address]
+                del self._failures[address]
+
+    def pop_due(self, now: float, limit: int) -> list:
+        due = []
+        while self._heap and len(due) < limit and self._heap[0][0] <= now:
+            when, address = heapq.heappop(self._heap)
+            # skip entries superseded by reschedule or dropped by retain
+            if self._due.get(address) != when:
+                continue
+            del self._due[address]
+            due.append(address)
+        return due
+
+
+class PeerDaemon:
+    def __init__(self) -> None:
+        self.interval = settings.PEERS_DAEMON_INTERVAL
+        self.tick = settings.PEERS_DAEMON_TICK
+        self.batch_size = settings.PEERS_DAEMON_BATCH
+        self.scheduler = PeerScheduler(
+            self.interval, settings.PEERS_DAEMON_MAX_INTERVAL
+        )
+        self.next_discovery = 0
+
+    def load(self) -> None:
+        now = monotonic()
+        for address, state in PeerMonitor.objects.values_list(
+            "announced_address", "state"
+        ):
+            if state == PeerMonitor.State.UNREACHABLE:
+                self.scheduler.add(address, now + self.interval, failures=1)
+            else:
+                # spread the first round over one interval
+                self.scheduler.add(address, now + random.uniform(0, self.interval))
+        logger.info("Peers daemon loaded %d peers", len(self.scheduler))
+
+    def discovery_nodes(self) -> list:
+        """Bootstrap and a sample of healthy peers, asked for the peers they
+        know. Peer lists overlap a lot, a sample is enough to find new ones.
+        Only the peers they share we don't know yet are probed with them,
+        known peers keep their own interval and backoff.
+        """
+        addresses = list(
+            PeerMonitor.objects.exclude(state=PeerMonitor.State.UNREACHABLE)
+            .values_list("announced_address", flat=True)
+        )
+        addresses = random.sample(
+            addresses, min(len(addresses), settings.PEERS_DAEMON_DISCOVERY_NODES)
+        )
+        addresses.extend(settings.BRS_BOOTSTRAP_PEERS)
+        return addresses
+
+    def run_once(self) -> None:
+        close_old_connections()
+        now = monotonic()
+
+        nodes = []
+        if now >= self.next_discovery:
+            nodes = self.discovery_nodes()
+            self.next_discovery = now + self.interval
+
+        peers = self.scheduler.pop_due(now, self.batch_size)
+        if not nodes and not peers:
+            return
+
+        local_difficulty = get_local_difficulty()
+        crawler = Crawler(
+            local_difficulty,
+            concurrency=1 if settings.TEST_NET else settings.PEERS_SCAN_CONCURRENCY,
+            geo_lookup=get_country_by_ip,
+            timeouts=get_peer_timeouts(peers + nodes),
+            known=self.scheduler,
+        )
+        results = crawler.crawl(nodes, peers)
+        updates = merge_results(results)
+
+        ok = {a for a in peers if results.get(crawler.url(a)) is not None}
+        failed = [a for a in peers if a not in ok]
+
+        # nobody answers, probably our network problem: try again later
+        if len(peers) >= 10 and not ok:
+            logger.warning("Peers batch was rejected: 0 of %d answered", len(peers))
+            for address in peers:
+                self.scheduler.add(address, now + self.tick)
+            return
+
+        save_scan(local_difficulty, updates, unreachable=failed)
+
+        now = monotonic()
+        for address in peers:
+            self.scheduler.reschedule(address, now, address in ok)
+        for update in updates:
+            if update["announced_address"] not in self.scheduler:
+                self.scheduler.reschedule(update["announced_address"], now, True)
+
+        if nodes:
+            delete_stale_peers()
+            finish_scan(local_difficulty["height"])
+            known = set(PeerMonitor.objects.values_list("announced_address", flat=True))
+            self.scheduler.retain(known)
+            # peers saved by someone else, probed with the next batch
+            for address in known - set(self.scheduler):
+                self.scheduler.add(address, now)
+
+        logger.info(
+            "Peers batch: %d nodes, %d peers, %d updates, %d unreachable, %d scheduled",
+            len(nodes), len(peers), len(updates), len(failed), len(self.scheduler),
+        )
+
+    def run(self) -> None:
+        self.load()
+        while True:
+            self.run_once()
+            sleep(self.tick)
+
+
+def peer_daemon():
+    PeerDaemon().run()
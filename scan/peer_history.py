@@ -0,0 +1,147 @@
+""" Peers network history: one compact snapshot per scan, downsampled into
+hourly and daily buckets as it gets older.
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from scan.helpers.leader import ensure_leader
+from scan.models import PeerMonitor, PeerSnapshot
+
+logger = logging.getLogger(__name__)
+
+COUNT_FIELDS = ("states", "versions", "platforms", "countries", "height_lag")
+
+# upper bounds of height lag buckets, blocks behind the local node
+HEIGHT_LAG_BUCKETS = ((0, "0"), (1, "1"), (10, "2-10"), (100, "11-100"))
+
+
+def height_lag_bucket(lag: int) -> str:
+    for bound, name in HEIGHT_LAG_BUCKETS:
+        if lag <= bound:
+            return name
+    return ">100"
+
+
+def count_peers(height: int) -> PeerSnapshot:
+    """Counts by state of all peers, by version, platform and country of
+    online peers and height lag of reachable peers, in one pass."""
+    states, versions, platforms, countries, height_lag = (Counter() for _ in range(5))
+
+    for state, version, platform, country_code, peer_height, reward_state in (
+        PeerMonitor.objects.values_list(
+            "state", "version", "platform", "country_code", "height", "reward_state"
+        ).iterator()
+    ):
+        states[str(state)] += 1
+        if state != PeerMonitor.State.UNREACHABLE:
+            height_lag[height_lag_bucket(max(height - peer_height, 0))] += 1
+        if state != PeerMonitor.State.ONLINE:
+            continue
+        versions[version] += 1
+        countries[country_code] += 1
+        if reward_state != "Duplicate":
+            platforms[platform] += 1
+
+    return PeerSnapshot(
+        height=height,
+        states=states,
+        versions=versions,
+        platforms=platforms,
+        countries=countries,
+        height_lag=height_lag,
+        created_at=timezone.now(),
+    )
+
+
+def take_snapshot(height: int) -> PeerSnapshot:
+    snapshot = count_peers(height)
+    with transaction.atomic():
+        ensure_leader()
+        snapshot.save()
+    return snapshot
+
+
+def merge_counts(target: dict, counts: dict) -> None:
+    for key, value in counts.items():
+        target[key] = target.get(key, 0) + value
+
+
+def truncate(dt, resolution: int):
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    if resolution == PeerSnapshot.Resolution.DAILY:
+        dt = dt.replace(hour=0)
+    return dt
+
+
+def downsample(source: int, target: int, older_than) -> int:
+    """Merge `source` snapshots of complete `target` buckets before
+    `older_than` into one snapshot per bucket"""
+    cutoff = truncate(older_than, target)
+    snapshots = list(
+        PeerSnapshot.objects.filter(resolution=source, created_at__lt=cutoff)
+        .order_by("created_at")
+    )
+    if not snapshots:
+        return 0
+
+    buckets = {}
+    for snapshot in snapshots:
+        created_at = truncate(snapshot.created_at, target)
+        bucket = buckets.get(created_at)
+        if bucket is None:
+            bucket = buckets[created_at] = PeerSnapshot(
+                resolution=target, samples=0, created_at=created_at
+            )
+        bucket.samples += snapshot.samples
+        bucket.height = max(bucket.height, snapshot.height)
+        for field in COUNT_FIELDS:
+            merge_counts(getattr(bucket, field), getattr(snapshot, field))
+
+    with transaction.atomic():
+        ensure_leader()
+        PeerSnapshot.objects.filter(pk__in=[s.pk for s in snapshots]).delete()
+        PeerSnapshot.objects.bulk_create(buckets.values())
+
+    return len(snapshots)
+
+
+def downsample_history(now=None) -> None:
+    now = now or timezone.now()
+    merged = downsample(
+        PeerSnapshot.Resolution.SCAN,
+        PeerSnapshot.Resolution.HOURLY,
+        now - timedelta(days=settings.PEERS_HISTORY_SCAN_DAYS),
+    )
+    merged += downsample(
+        PeerSnapshot.Resolution.HOURLY,
+        PeerSnapshot.Resolution.DAILY,
+        now - timedelta(days=settings.PEERS_HISTORY_HOURLY_DAYS),
+    )
+    if merged:
+        logger.info("Peers history: %d snapshots downsampled", merged)
+
+
+def record_scan(height: int) -> PeerSnapshot:
+    snapshot = take_snapshot(height)
+    downsample_history()
+    return snapshot
+
+
+def get_trend(days: int, field: str = "states") -> list:
+    """Points (time, average counts) since `days` ago, buckets of different
+    resolutions don't overlap so they are read together"""
+    since = timezone.now() - timedelta(days=days)
+    return [
+        (created_at, {key: value / samples for key, value in counts.items()})
+        for created_at, samples, counts in PeerSnapshot.objects.filter(
+            created_at__gte=since
+        )
+        .order_by("created_at")
+        .values_list("created_at", "samples", field)
+    ]
@@ -1,58 +1,48 @@
 import logging
-import random
-import socket
-from concurrent.futures import ThreadPoolExecutor
+import math
+from copy import copy
 from datetime import timedelta
-from distutils.version import LooseVersion
-from functools import lru_cache
-from urllib.parse import urlparse
 from time import sleep
 
 import requests
 from cache_memoize import cache_memoize
 from django import forms
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import DurationField, ExpressionWrapper, F
 from django.db.models.functions import Now
 from django.utils import timezone
 from requests.exceptions import RequestException
 
-from burst.api.brs.p2p import P2PApi
-from burst.api.exceptions import BurstException
 from config.settings import PEERS_SCAN_DELAY
 from java_wallet.models import Block
-from scan.helpers.decorators import lock_decorator
+from scan.caching_data.peers_summary import CachingPeersSummary, get_peers_summary
+from scan.crawler import Crawler, Priority, merge_results
+from scan.helpers.geoip import lookup_country
+from scan.helpers.leader import ensure_leader
 from scan.models import PeerMonitor
+from scan.peer_history import record_scan
 
 logger = logging.getLogger(__name__)
 
-if PEERS_SCAN_DELAY > 0:
-    logger.info(f"Peers sleeping for {PEERS_SCAN_DELAY} seconds...")
-sleep(PEERS_SCAN_DELAY)
 
-def get_ip_by_domain(peer: str) -> str or None:
-    # truncating port if exists
-    if not peer.startswith("http"):
-        peer = f"http://{peer}"
-    hostname = urlparse(peer).hostname
+def wait_scan_delay():
+    if PEERS_SCAN_DELAY > 0:
+        logger.info(f"Peers sleeping for {PEERS_SCAN_DELAY} seconds...")
+    sleep(PEERS_SCAN_DELAY)
 
-    if not hostname:
-        return None
 
-    # ipv6
-    if ":" in hostname:
-        return hostname
-
-    try:
-        return socket.gethostbyname(hostname)
-    except socket.gaierror as e:
-        logger.debug("Can't resolve host: %s - %r", peer, e)
-        return None
+def get_country_by_ip(ip: str) -> str:
+    country = lookup_country(ip)
+    if country:
+        return country
+    if settings.GEOIP_HTTP_FALLBACK:
+        return get_country_by_ip_http(ip)
+    return "??"
 
 
 @cache_memoize(60 * 60 * 24 * 7)
-def get_country_by_ip(ip: str) -> str:
+def get_country_by_ip_http(ip: str) -> str:
     try:
         response = requests.get(f"https://ipwho.is/{ip}")
         response.raise_for_status()
@@ -70,17 +60,9 @@ class PeerMonitorForm(forms.ModelForm):
         model = PeerMonitor
         fields = ['announced_address', 'real_ip', 'platform', 'application', 'version', 'height', 'cumulative_difficulty', 'country_code', 'state', 'downtime', 'lifetime', 'availability', 'last_online_at']
 
-
-def is_good_version(version: str) -> bool:
-    if not version:
-        return False
-    if version[0] == "v":
-        version = version[1:]
-
-    try:
-        return LooseVersion(version) >= LooseVersion(settings.MIN_PEER_VERSION)
-    except TypeError:
-        return False
+    def validate_unique(self):
+        # no query per peer, saved with upsert
+        pass
 
 
 def get_local_difficulty() -> dict:
@@ -99,114 +81,118 @@ def get_local_difficulty() -> dict:
     return result
 
 
-@lru_cache(maxsize=None)
-def get_block_cumulative_difficulty(height: int) -> str:
-    cumulative_difficulty = (
-        Block.objects.using("java_wallet")
-        .filter(height=height)
-        .values_list("cumulative_difficulty", flat=True)
-        .first()
-    )
-    return str(int(cumulative_difficulty.hex(), 16))
-
-
-def explore_peer(local_difficulty: dict, address: str, updates: dict):
-    logger.debug("Peer: %s", address)
-
-    if address in updates:
-        return
-
-    try:
-        p2p_api = P2PApi(address)
-        peer_info = p2p_api.get_info()
-        if not is_good_version(peer_info["version"]):
-            logger.debug("Old version: %s", peer_info["version"])
-            updates[address] = None
-            return
-        if not "announcedAddress" in peer_info:
-            peer_info["announcedAddress"] = address
-
-        default_port = ":" + str(settings.DEFAULT_P2P_PORT)
-        peer_info["announcedAddress"] = peer_info["announcedAddress"].replace(default_port,"")
-        peer_info.update(p2p_api.get_cumulative_difficulty())
-        peer_info["next_block_ids"] = []
-        try:
-            peer_info["next_block_ids"] = p2p_api.get_next_block_ids(local_difficulty["previous_block_id"])
-        except:
-            logger.debug("Could not get next block ids for " + p2p_api.node_url)
-    except BurstException as ex:
-        logger.debug("Can't connect to peer: %s", p2p_api.node_url)
-        updates[address] = None
-        return
-
-    ip = get_ip_by_domain(address)
-
-    updates[address] = {
-        "announced_address": peer_info["announcedAddress"],
-        "real_ip": ip,
-        "country_code": get_country_by_ip(ip) if ip else "??",
-        "application": peer_info["application"],
-        "platform": peer_info["platform"],
-        "version": peer_info["version"],
-        "height": peer_info["blockchainHeight"],
-        "cumulative_difficulty": peer_info["cumulativeDifficulty"],
-        "last_online_at": timezone.now(),
-        "next_block_ids": peer_info["next_block_ids"],
+class CumulativeDifficultyCache:
+    """Cumulative difficulties of the last `window` blocks.
+
+    Peers report a handful of distinct heights near the top, all of them
+    are loaded with one query per scan. Heights closer than `unstable` to
+    the top may still be reorganized and are not kept.
+    """
+
+    def __init__(self, window: int, unstable: int = 10) -> None:
+        self.window = window
+        self.unstable = unstable
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def _fetch(heights: list) -> dict:
+        return {
+            height: str(int(cumulative_difficulty.hex(), 16))
+            for height, cumulative_difficulty in Block.objects.using("java_wallet")
+            .filter(height__in=heights)
+            .values_list("height", "cumulative_difficulty")
+        }
+
+    def get_many(self, heights, top: int) -> dict:
+        lowest = top - self.window
+        for height in [h for h in self._cache if h < lowest]:
+            del self._cache[height]
+
+        result = {h: self._cache[h] for h in heights if h in self._cache}
+        missing = [h for h in heights if h not in result]
+        if missing:
+            fetched = self._fetch(sorted(missing))
+            result.update(fetched)
+            self._cache.update(
+                (h, value)
+                for h, value in fetched.items()
+                if lowest <= h <= top - self.unstable
+            )
+        return result
+
+
+cumulative_difficulty_cache = CumulativeDifficultyCache(
+    settings.PEERS_DIFFICULTY_CACHE_WINDOW
+)
+
+
+def get_blocks_cumulative_difficulty(local_difficulty: dict, updates: list) -> dict:
+    """Our cumulative difficulty at every height at or below ours reported in
+    updates"""
+    heights = {
+        update["height"]
+        for update in updates
+        if update["height"] <= local_difficulty["height"]
     }
-
-
-def explore_node(local_difficulty: dict, address: str, updates: dict):
-    logger.debug("Node: %s", address)
-
-    try:
-        peers = P2PApi(address).get_peers()
-        explore_peer(local_difficulty, address, updates)
-    except BurstException:
-        logger.debug("Can't connect to node: %s", address)
-        return
-
-    if settings.DEBUG:
-        for peer in peers:
-            explore_peer(local_difficulty, peer, updates)
-    else:
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            executor.map(lambda p: explore_peer(local_difficulty, p, updates), peers)
-
-
-def get_nodes_list() -> list:
-    # first check UNREACHABLE because more chance they are still offline
-    # and timeout connection in worker
-    addresses_offline = (
-        list(
-            PeerMonitor.objects.values_list("announced_address", flat=True)
-            .filter(state=PeerMonitor.State.UNREACHABLE)
-            .distinct()
-        )
-        or []
-    )
-
-    # get other addresses exclude UNREACHABLE
-    addresses_other = (
-        list(
-            PeerMonitor.objects.values_list("announced_address", flat=True)
-            .exclude(state=PeerMonitor.State.UNREACHABLE)
-            .distinct()
-        )
-        or []
-    )
+    if not heights:
+        return {}
+    return cumulative_difficulty_cache.get_many(heights, local_difficulty["height"])
+
+
+def get_nodes_priorities() -> dict:
+    """Every known address with its scan priority: bootstrap peers, then
+    peers which were reachable on the last check, then the others. Never
+    seen addresses come last"""
+    priorities = {}
+    for address, state in PeerMonitor.objects.values_list("announced_address", "state"):
+        if state == PeerMonitor.State.UNREACHABLE:
+            priorities[address] = Priority.UNREACHABLE
+        else:
+            priorities[address] = Priority.RECENT
 
     # add well-known peers
-    addresses_other.extend(settings.BRS_BOOTSTRAP_PEERS)
-
-    # mix it
-    random.shuffle(addresses_offline)
-    random.shuffle(addresses_other)
-
-    # first UNREACHABLE
-    return addresses_offline + addresses_other
+    for address in settings.BRS_BOOTSTRAP_PEERS:
+        priorities[address] = Priority.BOOTSTRAP
+
+    return priorities
+
+
+def get_peer_timeout(state: int, rtt_samples: list) -> float:
+    """Timeout of P2P requests to a peer: a percentile of its past answer
+    times with a margin, within the floor and the ceiling. Peers found
+    unreachable without any answer on record get the floor."""
+    if not rtt_samples:
+        if state == PeerMonitor.State.UNREACHABLE:
+            return settings.PEERS_TIMEOUT_FLOOR
+        return settings.PEERS_TIMEOUT_CEILING
+
+    samples = sorted(rtt_samples)
+    rank = max(math.ceil(len(samples) * settings.PEERS_TIMEOUT_PERCENTILE / 100), 1)
+    timeout = samples[rank - 1] * settings.PEERS_TIMEOUT_FACTOR
+    return min(max(timeout, settings.PEERS_TIMEOUT_FLOOR), settings.PEERS_TIMEOUT_CEILING)
+
+
+def get_peer_timeouts(addresses: list = None) -> dict:
+    queryset = PeerMonitor.objects.all()
+    if addresses is not None:
+        queryset = queryset.filter(announced_address__in=addresses)
+    return {
+        address: get_peer_timeout(state, rtt_samples)
+        for address, state, rtt_samples in queryset.values_list(
+            "announced_address", "state", "rtt_samples"
+        )
+    }
 
 
-def check_state(local_difficulty: dict, update: dict, peer_obj: PeerMonitor or None) -> int:
+def check_state(
+    local_difficulty: dict,
+    update: dict,
+    peer_obj: PeerMonitor or None,
+    difficulties: dict,
+) -> int:
     check_id = str(local_difficulty["id"])
 
     if update["height"] > local_difficulty["height"]:
@@ -218,7 +204,7 @@ def check_state(local_difficulty: dict, update: dict, peer_obj: PeerMonitor or N
         if peer_obj and peer_obj.height == update["height"]:
             state = PeerMonitor.State.STUCK
         else:
-            _cumulative_difficulty = get_block_cumulative_difficulty(update["height"])
+            _cumulative_difficulty = difficulties.get(update["height"])
             if update["cumulative_difficulty"] == _cumulative_difficulty:
                 state = PeerMonitor.State.SYNC
             else:
@@ -227,74 +213,137 @@ def check_state(local_difficulty: dict, update: dict, peer_obj: PeerMonitor or N
     return state
 
 
-def get_count_nodes_online() -> int:
-    return PeerMonitor.objects.filter(state=PeerMonitor.State.ONLINE).count()
+DOWN_STATES = (
+    PeerMonitor.State.UNREACHABLE,
+    PeerMonitor.State.STUCK,
+    PeerMonitor.State.FORKED,
+)
 
+SAVE_FIELDS = [
+    f.name
+    for f in PeerMonitor._meta.concrete_fields
+    if f.name not in {"announced_address", "created_at", "reward_state", "reward_time"}
+]
 
-# @lock_decorator(key="peer_monitor", auto_renewal=True) #locking up peers for some reason
-@transaction.atomic
-def peer_cmd():
-    logger.info("Start the scan")
 
-    local_difficulty = get_local_difficulty()
-    logger.info(f"Checking for height: {local_difficulty['height']}, id: {local_difficulty['id']}, prev id: {local_difficulty['previous_block_id']}")
+def save_scan(local_difficulty: dict, updates: list, unreachable: list = None):
+    """Calculate state, validate and write a scan result in one bulk upsert.
 
-    addresses = get_nodes_list()
-    #logger.info("The list of peers:") #enable to troubleshoot peers list
-    #logger.info(addresses)            #enable to troubleshoot peers list
-    # explore every peer and collect updates
-    updates = {}
-    if settings.TEST_NET:
-        for address in addresses:
-            explore_node(local_difficulty, address, updates)
+    Peers with an update get new data, `unreachable` peers (all other known
+    peers if None) become unreachable. Every written peer counts one more
+    check for downtime, lifetime and availability.
+    """
+    addresses = {update["announced_address"] for update in updates}
+    if unreachable is None:
+        peers = {obj.pk: obj for obj in PeerMonitor.objects.all()}
     else:
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            executor.map(lambda address: explore_node(local_difficulty, address, updates), addresses)
-    updates_with_data = tuple(filter(lambda x: x is not None, updates.values()))
-    # if more than __% peers were gone offline in __min, probably network problem
-    if len(updates_with_data) < get_count_nodes_online() * 0.8:
-        logger.warning(
-            "Peers update was rejected: %d - %d", len(updates_with_data), len(addresses)
-        )
-        return
+        peers = PeerMonitor.objects.in_bulk(list(addresses | set(unreachable)))
 
-    # set all peers unreachable, if will no update - peer will be unreachable
-    PeerMonitor.objects.update(state=PeerMonitor.State.UNREACHABLE)
+    difficulties = get_blocks_cumulative_difficulty(local_difficulty, updates)
 
-    # calculate state and apply updates
-    for update in updates_with_data:
+    objs = []
+    for update in updates:
         logger.debug("Update: %r", update)
 
-        peer_obj = PeerMonitor.objects.filter(
-            announced_address=update["announced_address"]
-        ).first()
+        peer_obj = peers.get(update["announced_address"])
         if not peer_obj:
             logger.info("Found new peer: %s", update["announced_address"])
 
-        update["state"] = check_state(local_difficulty, update, peer_obj)
+        update["state"] = check_state(
+            local_difficulty, update, peer_obj, difficulties
+        )
 
-        form = PeerMonitorForm(update, instance=peer_obj)
+        form = PeerMonitorForm(update, instance=copy(peer_obj) if peer_obj else None)
 
         if form.is_valid():
-            form.save()
+            obj = form.save(commit=False)
+            if "rtt" in update:
+                obj.rtt_samples = (obj.rtt_samples + [round(update["rtt"], 3)])[
+                    -settings.PEERS_RTT_SAMPLES:
+                ]
+            objs.append(obj)
+            peers.pop(update["announced_address"], None)
         else:
             logger.info("Not valid data: %r - %r", form.errors, update)
 
-    PeerMonitor.objects.update(lifetime=F("lifetime") + 1)
+    for obj in peers.values():
+        obj.state = PeerMonitor.State.UNREACHABLE
+        objs.append(obj)
+
+    for obj in objs:
+        obj.lifetime += 1
+        if obj.state in DOWN_STATES:
+            obj.downtime += 1
+        obj.availability = 100 - (obj.downtime / obj.lifetime * 100)
+
+    # mysql upserts on any unique key and can't take the target
+    unique_fields = None
+    if connection.features.supports_update_conflicts_with_target:
+        unique_fields = ["announced_address"]
+
+    with transaction.atomic():
+        ensure_leader()
+        PeerMonitor.objects.bulk_create(
+            objs,
+            batch_size=500,
+            update_conflicts=True,
+            update_fields=SAVE_FIELDS,
+            unique_fields=unique_fields,
+        )
+
+
+def delete_stale_peers():
+    with transaction.atomic():
+        ensure_leader()
+        PeerMonitor.objects.annotate(
+            duration=ExpressionWrapper(
+                Now() - F("last_online_at"), output_field=DurationField()
+            )
+        ).filter(duration__gte=timedelta(days=5)).delete()
+
+
+def finish_scan(height: int):
+    """Record the network history and refresh the peers dashboard"""
+    snapshot = record_scan(height)
+    CachingPeersSummary().update_data(get_peers_summary(snapshot))
 
-    PeerMonitor.objects.filter(
-        state__in=[PeerMonitor.State.UNREACHABLE, PeerMonitor.State.STUCK, PeerMonitor.State.FORKED]
-    ).update(downtime=F("downtime") + 1)
 
-    PeerMonitor.objects.annotate(
-        duration=ExpressionWrapper(
-            Now() - F("last_online_at"), output_field=DurationField()
+def get_count_nodes_online() -> int:
+    return PeerMonitor.objects.filter(state=PeerMonitor.State.ONLINE).count()
+
+
+def peer_cmd():
+    logger.info("Start the scan")
+
+    local_difficulty = get_local_difficulty()
+    logger.info(f"Checking for height: {local_difficulty['height']}, id: {local_difficulty['id']}, prev id: {local_difficulty['previous_block_id']}")
+
+    priorities = get_nodes_priorities()
+    addresses = list(priorities)
+    # explore every peer and collect updates
+    crawler = Crawler(
+        local_difficulty,
+        concurrency=1 if settings.TEST_NET else settings.PEERS_SCAN_CONCURRENCY,
+        geo_lookup=get_country_by_ip,
+        max_requests=settings.PEERS_SCAN_MAX_REQUESTS,
+        max_seconds=settings.PEERS_SCAN_MAX_SECONDS,
+        convergence_window=settings.PEERS_SCAN_CONVERGENCE_WINDOW,
+        timeouts=get_peer_timeouts(),
+    )
+    updates = crawler.crawl(addresses, priorities=priorities)
+    updates_with_data = merge_results(updates)
+    # if more than __% peers were gone offline in __min, probably network problem
+    if len(updates_with_data) < get_count_nodes_online() * 0.8:
+        logger.warning(
+            "Peers update was rejected: %d - %d", len(updates_with_data), len(addresses)
         )
-    ).filter(duration__gte=timedelta(days=5)).delete()
+        return
 
-    PeerMonitor.objects.update(
-        availability=100 - (F("downtime") / F("lifetime") * 100),
-        modified_at=timezone.now(),
+    # peers skipped by the scan budget keep their state
+    save_scan(
+        local_difficulty, updates_with_data, unreachable=crawler.unreachable(addresses)
     )
+    delete_stale_peers()
+    finish_scan(local_difficulty["height"])
 
     logger.info("Done")
@@ -1,56 +1,262 @@
+""" Periodic tasks warming the cache, so users don't get a slow initial
+page load. Every task runs on its own interval, in parallel with others:
+a slow CoinGecko or SNR master call doesn't delay the database tasks.
+"""
+
+import heapq
+import json
 import logging
-import os
-import requests, json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Event
+from time import monotonic
 
-from time import sleep
+import requests
 from django.conf import settings
-from config.settings import TASKS_SCAN_DELAY, SNR_MASTER_EXPLORER
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
 
-from scan.models import PeerMonitor
 from scan.caching_data.exchange import CachingExchangeData
-from scan.caching_data.total_txs_count import CachingTotalTxsCount
+from scan.caching_data.fee_stats import CachingFeeStats
+from scan.caching_data.pending_txs import CachingPendingTxs
 from scan.caching_data.total_circulating import CachingTotalCirculating
-#from scan.caching_data.total_accounts_count import CachingTotalAccountsCount
+from scan.caching_data.total_txs_count import CachingTotalTxsCount
+from scan.helpers.leader import ensure_leader
+from scan.models import PeerMonitor
 
 logger = logging.getLogger(__name__)
 
-######################################
-# These tasks run on a regular       #
-# interval, currently 60 sec         #
-# via a remote script or supervisord #
-# By loading cache via a task it     #
-# saves the user from a slow initial #
-# page load.                         #
-######################################
-
-def task_cmd():
-    if TASKS_SCAN_DELAY > 0:  # Delay in env used when supervisord is used.
-        logger.info(f"Tasks Sleeping for {TASKS_SCAN_DELAY} seconds...")
-        
-############# Update Exchange ############## (change to 60 sec update)
-    sleep(TASKS_SCAN_DELAY)
-    logger.info("TASK - Update Cache Exchange data")
+BLOCK_TIME = 240
+
+
+def update_exchange():
     CachingExchangeData().update_live_data()
-    
-############## Update Total TX ############# (match block time, heavy db request)
-    logger.info("TASK - Update Total TX's count data")
+
+
+def update_pending_txs():
+    CachingPendingTxs().update_live_data()
+    CachingFeeStats().update_live_data()
+
+
+def update_total_txs_count():
     CachingTotalTxsCount().update_live_data()
 
-######### Update Total Circulating ######### (match block time, heavy db request)
-    logger.info("TASK - Update Total Circulating data")
+
+def update_total_circulating():
     CachingTotalCirculating().update_live_data()
-    
-######### Update Peers SNR Status ########## (change to 6 hours update)
-    if SNR_MASTER_EXPLORER :
-        logger.info("TASK - Update Peer SNR data")
-        snr_master = list(requests.get(url=SNR_MASTER_EXPLORER + "/json/SNRinfo").json())
-        for node in snr_master:
-            PeerMonitor.objects.filter(announced_address=node[0]).update(reward_state=node[2], reward_time=node[3])
-        if snr_master :
-            logger.info("SNR Master Data Received")
 
 
+class SnrMaster:
+    """SNR status list of the master explorer, fetched with a conditional
+    request: unchanged lists aren't transferred again"""
+
+    def __init__(self, url: str) -> None:
+        self.url = url + "/json/SNRinfo"
+        self.session = requests.Session()
+        self.nodes = None
+        self._validators = {}
+
+    def fetch(self) -> list:
+        response = self.session.get(self.url, headers=self._validators, timeout=30)
+        if response.status_code == 304 and self.nodes is not None:
+            return self.nodes
+        response.raise_for_status()
+
+        self.nodes = list(response.json())
+        self._validators = {}
+        if "ETag" in response.headers:
+            self._validators["If-None-Match"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            self._validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        return self.nodes
+
+
+def sync_snr_status(nodes: list) -> int:
+    """Writes reward state and time of nodes which changed since the last
+    sync in one bulk update, returns the number of changed peers"""
+    reward_time = PeerMonitor._meta.get_field("reward_time")
+    status = {node[0]: (node[2], reward_time.to_python(node[3])) for node in nodes}
+
+    changed = []
+    for obj in PeerMonitor.objects.filter(announced_address__in=status).only(
+        "announced_address", "reward_state", "reward_time"
+    ):
+        new = status[obj.announced_address]
+        if (obj.reward_state, obj.reward_time) != new:
+            obj.reward_state, obj.reward_time = new
+            changed.append(obj)
+
+    PeerMonitor.objects.bulk_update(changed, ["reward_state", "reward_time"], batch_size=500)
+    return len(changed)
+
+
+@lru_cache(maxsize=None)
+def get_snr_master(url: str) -> SnrMaster:
+    return SnrMaster(url)
+
+
+def update_snr_status():
+    # an unchanged list is synced again, peers found since have no status yet
+    nodes = get_snr_master(settings.SNR_MASTER_EXPLORER).fetch()
+    if nodes:
+        logger.info("SNR Master Data Received, %d peers changed", sync_snr_status(nodes))
+
+
+@dataclass
+class PeriodicTask:
+    name: str
+    func: callable
+    interval: float
+    jitter: float = 0
+    timeout: float = None
+
+
+def get_tasks() -> list:
+    """Default schedule, TASKS_SCHEDULE overrides interval, jitter or
+    timeout by task name"""
+    tasks = [
+        PeriodicTask("exchange", update_exchange, interval=60, jitter=5, timeout=30),
+        PeriodicTask("pending_txs", update_pending_txs, interval=10, timeout=10),
+        PeriodicTask(
+            "total_txs_count", update_total_txs_count, BLOCK_TIME, jitter=10, timeout=BLOCK_TIME
+        ),
+        PeriodicTask(
+            "total_circulating", update_total_circulating, BLOCK_TIME, jitter=10, timeout=BLOCK_TIME
+        ),
+    ]
+    if settings.SNR_MASTER_EXPLORER:
+        tasks.append(
+            PeriodicTask("snr_status", update_snr_status, 6 * 3600, jitter=300, timeout=120)
+        )
+
+    for task in tasks:
+        for key, value in settings.TASKS_SCHEDULE.get(task.name, {}).items():
+            setattr(task, key, value)
+    return tasks
+
+
+class TaskScheduler:
+    """Runs every task on its own interval in a thread pool. A task never
+    overlaps with itself: the next run is due an interval after the last
+    one ended.
+
+    Threads can't be killed, a run over its timeout is recorded as such
+    and the task isn't started again until that run returns.
+    """
+
+    def __init__(self, tasks: list, delay: float = 0, store: bool = True) -> None:
+        self.tasks = {task.name: task for task in tasks}
+        self.store = store
+        self.runs = {}
+
+        self._heap = []
+        self._running = {}
+        self._over = set()
+        self._stopped = Event()
+        self._wakeup = Event()
+        self._executor = ThreadPoolExecutor(max_workers=len(tasks) or 1)
+
+        now = monotonic()
+        for task in tasks:
+            self._schedule(task, now + delay)
+
+    def _schedule(self, task: PeriodicTask, due: float) -> None:
+        heapq.heappush(self._heap, (due + random.uniform(0, task.jitter), task.name))
+
+    def _run(self, task: PeriodicTask) -> dict:
+        started = monotonic()
+        outcome, error = "ok", None
+        try:
+            # a former leader doesn't refresh the caches, best effort: caches
+            # are not fenced like the database
+            ensure_leader()
+            task.func()
+        except Exception as e:
+            logger.exception("TASK %s failed", task.name)
+            outcome, error = "error", repr(e)
+        duration = monotonic() - started
+        if task.timeout and duration > task.timeout:
+            outcome = "timeout"
+        return {"outcome": outcome, "error": error, "duration": duration}
+
+    def _run_in_thread(self, task: PeriodicTask) -> dict:
+        # pool threads live long, their connections time out between runs
+        close_old_connections()
+        try:
+            return self._run(task)
+        finally:
+            close_old_connections()
+
+    def _record(self, name: str, run: dict) -> None:
+        run["finished_at"] = timezone.now()
+        self.runs[name] = run
+        log = logger.info if run["outcome"] == "ok" else logger.warning
+        log("TASK %s: %s in %.1fs", name, run["outcome"], run["duration"])
+        if self.store:
+            cache.set("task_runs", self.runs, None)
+
+    def _reap(self, now: float) -> None:
+        for name, (future, started) in list(self._running.items()):
+            task = self.tasks[name]
+            if future.done():
+                del self._running[name]
+                self._record(name, future.result())
+                self._schedule(task, now + task.interval)
+            elif task.timeout and now - started > task.timeout and name not in self._over:
+                self._over.add(name)
+                logger.warning("TASK %s: running over its %ss timeout", name, task.timeout)
+
+    def run_pending(self, now: float = None) -> None:
+        now = now or monotonic()
+        self._reap(now)
+        while self._heap and self._heap[0][0] <= now:
+            _, name = heapq.heappop(self._heap)
+            self._over.discard(name)
+            logger.info("TASK %s: start", name)
+            future = self._executor.submit(self._run_in_thread, self.tasks[name])
+            future.add_done_callback(lambda _: self._wakeup.set())
+            self._running[name] = (future, now)
+
+    def next_wakeup(self, now: float) -> float:
+        """Seconds until the next due task or timeout, finished runs wake the
+        loop up earlier"""
+        due = [self._heap[0][0]] if self._heap else []
+        for name, (_, started) in self._running.items():
+            if self.tasks[name].timeout and name not in self._over:
+                due.append(started + self.tasks[name].timeout)
+        return max(min(due, default=now + 60) - now, 0)
+
+    def run_once(self) -> None:
+        """Every task one after another, for cron setups"""
+        for task in self.tasks.values():
+            self._record(task.name, self._run(task))
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            self.run_pending()
+            self._wakeup.wait(self.next_wakeup(monotonic()))
+
+    def stop(self, wait: bool = True) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        self._executor.shutdown(wait=wait)
+
+
+def task_cmd(once: bool = False):
+    tasks = get_tasks()
+    if once:
+        TaskScheduler(tasks).run_once()
+        return
 
-#    def update_cache_total_accounts_count():
-#        logger.info("TASK - Update Total Accounts data")
-#        CachingTotalAccountsCount().update_live_data()
+    if settings.TASKS_SCAN_DELAY > 0:
+        logger.info(f"Tasks start in {settings.TASKS_SCAN_DELAY} seconds...")
+    logger.info("Tasks: %s", json.dumps({t.name: t.interval for t in tasks}))
+    scheduler = TaskScheduler(tasks, delay=settings.TASKS_SCAN_DELAY)
+    try:
+        scheduler.run()
+    finally:
+        scheduler.stop(wait=False)
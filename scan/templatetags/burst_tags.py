@@ -10,10 +10,11 @@ from burst.libs.functions import calc_block_reward
 from burst.libs.multiout import MultiOutPack
 from burst.libs.reed_solomon import ReedSolomon
 from burst.libs.transactions import get_message, get_message_sub, get_message_token
-from burst.api.brs.v1.api import BrsApi
+from burst.api.nodes import get_node_set
 from config.settings import ADDRESS_PREFIX, BLOCKED_ASSETS, PHISHING_ASSETS
 from java_wallet.fields import get_desc_tx_type
 from java_wallet.models import Block, IndirectIncoming, IndirectRecipient, Trade, Transaction
+from scan.block_index import block_index
 from scan.caching_data.exchange import CachingExchangeData
 from scan.caching_data.total_circulating import CachingTotalCirculating
 import struct
@@ -69,17 +70,17 @@ def subscription_attachment(sub_id):
 @cache_memoize(240)
 @register.filter
 def asset_circulating(asset_id: int) -> int:
-    asset_details = BrsApi(settings.SIGNUM_NODE).get_asset(asset_id)
+    asset_details = get_node_set().call("get_asset", asset_id)
     return int(asset_details["quantityCirculatingQNT"])
 
 @register.filter
 def asset_owner(asset_id: int) -> int:
-    asset_details = BrsApi(settings.SIGNUM_NODE).get_asset(asset_id)
+    asset_details = get_node_set().call("get_asset", asset_id)
     return int(asset_details["account"])
 
 @register.filter
 def asset_issuer(asset_id: int) -> int:
-    asset_details = BrsApi(settings.SIGNUM_NODE).get_asset(asset_id)
+    asset_details = get_node_set().call("get_asset", asset_id)
     return int(asset_details["issuer"])
 
 @register.filter
@@ -520,11 +521,13 @@ def subNextsend(value):
 
 @register.simple_tag()
 def block_generation_time(block: Block) -> timedelta:
-    if block.previous_block:
-        return block.timestamp - block.previous_block.timestamp
-    else:
+    if not block.previous_block_id:
         # first block
         return timedelta(0)
+    previous_timestamp = block_index.timestamp(block.height - 1)
+    if previous_timestamp is None:
+        previous_timestamp = block.previous_block.timestamp
+    return block.timestamp - previous_timestamp
 
 @register.filter
 def to_int(value):
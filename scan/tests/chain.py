@@ -0,0 +1,75 @@
+""" Rows of the node database for tests. The node writes its tables, the
+explorer only reads them: timestamps are stored as the node does, seconds
+since the chain start, which the ORM can not write.
+"""
+
+from django.db import connections
+from django.db.models import AutoField, BinaryField, CharField, TextField
+
+from java_wallet.fields import TimestampField
+from java_wallet.models import Block, Transaction
+
+
+def _default(field):
+    if field.null:
+        return None
+    if field.has_default():
+        return field.get_default()
+    if isinstance(field, BinaryField):
+        return b""
+    if isinstance(field, (CharField, TextField)):
+        return ""
+    return 0
+
+
+def insert(model, **values) -> None:
+    """One row with the given values, the other columns empty"""
+    connection = connections["java_wallet"]
+    columns, params = [], []
+    for field in model._meta.concrete_fields:
+        if isinstance(field, AutoField):
+            continue
+        value = values.get(field.attname, _default(field))
+        if value is not None and not isinstance(field, TimestampField):
+            value = field.get_db_prep_save(value, connection)
+        columns.append(connection.ops.quote_name(field.column))
+        params.append(value)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {} ({}) VALUES ({})".format(
+                connection.ops.quote_name(model._meta.db_table),
+                ", ".join(columns),
+                ", ".join(["%s"] * len(columns)),
+            ),
+            params,
+        )
+
+
+def create_block(height: int, block_id: int = None, generator_id: int = 1) -> int:
+    block_id = block_id or 1000000 + height
+    insert(
+        Block,
+        id=block_id,
+        height=height,
+        timestamp=height * 240,
+        generator_id=generator_id,
+        cumulative_difficulty=str(height),
+    )
+    return block_id
+
+
+def create_tx(tx_id: int, height: int, sender_id: int, recipient_id: int = None, **values) -> None:
+    fields = {
+        "id": tx_id,
+        "height": height,
+        "block_id": 1000000 + height,
+        "timestamp": height * 240,
+        "block_timestamp": height * 240,
+        "sender_id": sender_id,
+        "recipient_id": recipient_id,
+        "fee": 735000,
+        "full_hash": str(tx_id),
+    }
+    fields.update(values)
+    insert(Transaction, **fields)
@@ -0,0 +1,384 @@
+""" Simulated P2P network on localhost for crawler tests and benchmarks.
+
+Every fake peer listens on its own port and answers getInfo, getPeers,
+getCumulativeDifficulty and getNextBlockIds with a configurable latency.
+Peers play a role which decides their expected state:
+
+    online   at the top of the local chain
+    forked   ahead of the local chain on another branch
+    sync     behind the local chain
+    stuck    behind the local chain and not moving
+    old      version below MIN_PEER_VERSION
+    timeout  accepts connections and never answers
+    dead     nothing listens on the port
+"""
+
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import threading
+import time
+from collections import Counter
+
+from scan.crawler import Crawler, merge_results
+from scan.models import PeerMonitor
+from scan.peers import check_state
+
+ROLES = ("online", "forked", "sync", "stuck", "old", "timeout", "dead")
+
+DEFAULT_MIX = {
+    "online": 0.5,
+    "forked": 0.05,
+    "sync": 0.15,
+    "stuck": 0.05,
+    "old": 0.05,
+    "timeout": 0.1,
+    "dead": 0.1,
+}
+
+
+class FakePeer:
+    def __init__(self, role: str, latency: float, lag: int) -> None:
+        self.role = role
+        self.latency = latency
+        self.lag = lag
+        self.port = None
+        self.stuck_height = None
+        self.known_peers = []
+        self.requests = Counter()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    @property
+    def answers(self) -> bool:
+        return self.role not in ("old", "timeout", "dead")
+
+
+class SimulatedNetwork:
+    """Fake peers sharing one chain, served by one event loop in a child
+    process, so the crawler doesn't share the GIL with its peers.
+
+    The local node is at `height`, as in get_local_difficulty the scan
+    checks against the block below the top.
+    """
+
+    def __init__(
+        self,
+        size: int = 100,
+        mix: dict = None,
+        latency: tuple = (0, 0.02),
+        fanout: int = 20,
+        height: int = 10000,
+        seed: int = 0,
+    ) -> None:
+        self.height = height
+        self.fanout = fanout
+        self._random = random.Random(seed)
+
+        mix = mix or DEFAULT_MIX
+        roles = [role for role in ROLES for _ in range(round(size * mix.get(role, 0)))]
+        roles += ["online"] * (size - len(roles))
+        self.peers = [
+            FakePeer(role, self._random.uniform(*latency), self._random.randint(1, 50))
+            for role in roles[:size]
+        ]
+        for peer in self.peers:
+            if peer.role == "stuck":
+                peer.stuck_height = height - peer.lag - 1
+
+        # served by the child process
+        self.connections = 0
+        self.open_connections = 0
+        self.peak_connections = 0
+        self._servers = []
+        self._handlers = set()
+
+        self._process = None
+        self._conn = None
+
+    # chain
+
+    @staticmethod
+    def block_id(height: int) -> str:
+        return str(1000000 + height)
+
+    @staticmethod
+    def cumulative_difficulty(height: int) -> str:
+        return str(height * 1000)
+
+    @property
+    def local_difficulty(self) -> dict:
+        return {
+            "height": self.height - 1,
+            "cumulative_difficulty": self.cumulative_difficulty(self.height - 1),
+            "id": int(self.block_id(self.height - 1)),
+            "previous_block_id": int(self.block_id(self.height - 2)),
+        }
+
+    def difficulties(self, heights) -> dict:
+        """What CumulativeDifficultyCache reads from the node database"""
+        return {h: self.cumulative_difficulty(h) for h in heights if h <= self.height}
+
+    def advance(self, blocks: int = 1) -> None:
+        self.height += blocks
+        self._conn.send(("height", self.height))
+
+    def peer_height(self, peer: FakePeer) -> int:
+        if peer.role == "stuck":
+            return peer.stuck_height
+        if peer.role == "sync":
+            return self.height - peer.lag - 1
+        if peer.role == "forked":
+            return self.height + 1
+        return self.height
+
+    def expected_state(self, peer: FakePeer, previous_height: int = None) -> int:
+        if not peer.answers:
+            return PeerMonitor.State.UNREACHABLE
+        if peer.role == "online":
+            return PeerMonitor.State.ONLINE
+        if peer.role == "forked":
+            return PeerMonitor.State.FORKED
+        if previous_height == self.peer_height(peer):
+            return PeerMonitor.State.STUCK
+        return PeerMonitor.State.SYNC
+
+    # p2p api
+
+    def _response(self, peer: FakePeer, request: dict) -> dict:
+        request_type = request["requestType"]
+        peer.requests[request_type] += 1
+
+        if request_type == "getInfo":
+            return {
+                "announcedAddress": peer.address,
+                "application": "BRS",
+                "version": "v2.0.0" if peer.role == "old" else "v3.8.0",
+                "platform": f"S-{peer.port}",
+                "shareAddress": True,
+            }
+        if request_type == "getPeers":
+            return {"peers": peer.known_peers}
+        if request_type == "getCumulativeDifficulty":
+            height = self.peer_height(peer)
+            return {
+                "cumulativeDifficulty": self.cumulative_difficulty(height),
+                "blockchainHeight": height,
+            }
+        if request_type == "getNextBlockIds":
+            start = int(request["blockId"]) - 1000000 + 1
+            end = min(self.peer_height(peer), start + 100)
+            if peer.role == "forked":
+                return {"nextBlockIds": [str(2000000 + h) for h in range(start, end)]}
+            return {"nextBlockIds": [self.block_id(h) for h in range(start, end)]}
+        return {"error": "Unsupported request type!"}
+
+    async def _handle(self, peer: FakePeer, reader, writer) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        self.connections += 1
+        self.open_connections += 1
+        self.peak_connections = max(self.peak_connections, self.open_connections)
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            body = await reader.readexactly(length)
+
+            if peer.role == "timeout":
+                # until the client gives up
+                await reader.read()
+                return
+            await asyncio.sleep(peer.latency)
+
+            data = json.dumps(self._response(peer, json.loads(body))).encode()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n" % len(data) + data
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.open_connections -= 1
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _start(self) -> None:
+        for peer in self.peers:
+            if peer.role == "dead":
+                # a free port nobody listens on
+                with socket.socket() as sock:
+                    sock.bind(("127.0.0.1", 0))
+                    peer.port = sock.getsockname()[1]
+                continue
+            server = await asyncio.start_server(
+                lambda r, w, peer=peer: self._handle(peer, r, w), "127.0.0.1", 0
+            )
+            peer.port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+
+        addresses = [peer.address for peer in self.peers]
+        for peer in self.peers:
+            peer.known_peers = self._random.sample(
+                addresses, min(self.fanout, len(addresses))
+            )
+
+    async def _stop(self) -> None:
+        for server in self._servers:
+            server.close()
+        for task in list(self._handlers):
+            task.cancel()
+        for server in self._servers:
+            await server.wait_closed()
+
+    def _stats(self) -> dict:
+        stats = {
+            "connections": self.connections,
+            "peak_connections": self.peak_connections,
+            "requests": [peer.requests for peer in self.peers],
+        }
+        self.peak_connections = self.open_connections
+        return stats
+
+    def _serve(self, conn) -> None:
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(self._start())
+        conn.send([peer.port for peer in self.peers])
+
+        stopped = loop.create_future()
+
+        def command():
+            name, *args = conn.recv()
+            if name == "height":
+                self.height = args[0]
+            elif name == "stats":
+                conn.send(self._stats())
+            elif name == "stop":
+                stopped.set_result(None)
+
+        loop.add_reader(conn.fileno(), command)
+        loop.run_until_complete(stopped)
+        loop.run_until_complete(self._stop())
+        loop.close()
+
+    def start(self) -> "SimulatedNetwork":
+        context = multiprocessing.get_context("fork")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=self._serve, args=(child_conn,), daemon=True)
+        self._process.start()
+        for peer, port in zip(self.peers, self._conn.recv()):
+            peer.port = port
+        return self
+
+    def stop(self) -> None:
+        self._conn.send(("stop",))
+        self._process.join()
+        self._conn.close()
+
+    def stats(self) -> dict:
+        """Connections so far, peak open connections since the last call.
+        Requests counters of peers are updated."""
+        self._conn.send(("stats",))
+        stats = self._conn.recv()
+        for peer, requests in zip(self.peers, stats.pop("requests")):
+            peer.requests = requests
+        return stats
+
+    def __enter__(self) -> "SimulatedNetwork":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def addresses(self) -> list:
+        return [peer.address for peer in self.peers]
+
+
+class ThreadSampler(threading.Thread):
+    """Peak number of threads of the process"""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def stop(self) -> int:
+        self._stopped.set()
+        self.join()
+        return self.peak
+
+
+def scan(
+    network: SimulatedNetwork, previous: dict, priorities: dict = None, **crawler_kwargs
+) -> dict:
+    """Crawl the network like peer_cmd, every known address is a seed, and
+    classify peers like save_scan does without a database.
+
+    Returns {address: state}, unreachable peers included.
+    """
+    local_difficulty = network.local_difficulty
+    crawler = Crawler(local_difficulty, **crawler_kwargs)
+    updates = merge_results(crawler.crawl(network.addresses, priorities=priorities))
+
+    difficulties = network.difficulties({update["height"] for update in updates})
+    states = {peer.address: PeerMonitor.State.UNREACHABLE for peer in network.peers}
+    for update in updates:
+        height = previous.get(update["announced_address"])
+        peer_obj = PeerMonitor(height=height) if height is not None else None
+        states[update["announced_address"]] = check_state(
+            local_difficulty, update, peer_obj, difficulties
+        )
+        previous[update["announced_address"]] = update["height"]
+    return states
+
+
+def benchmark(network: SimulatedNetwork, scans: int = 2, **crawler_kwargs) -> list:
+    """Scans the network `scans` times, the chain moves between scans.
+
+    Per scan: wall time, connections, peak open connections, peak threads
+    and the share of peers classified as expected.
+    """
+    previous = {}
+    results = []
+    for _ in range(scans):
+        expected = {
+            peer.address: network.expected_state(peer, previous.get(peer.address))
+            for peer in network.peers
+        }
+        before = network.stats()
+        sampler = ThreadSampler()
+        sampler.start()
+
+        started = time.monotonic()
+        states = scan(network, previous, **crawler_kwargs)
+        elapsed = time.monotonic() - started
+        after = network.stats()
+
+        wrong = {a: (states[a], s) for a, s in expected.items() if states[a] != s}
+        results.append(
+            {
+                "peers": len(network.peers),
+                "seconds": elapsed,
+                "connections": after["connections"] - before["connections"],
+                "peak_connections": after["peak_connections"],
+                "peak_threads": sampler.stop(),
+                "accuracy": 1 - len(wrong) / len(expected),
+                "wrong": wrong,
+            }
+        )
+        network.advance(3)
+    return results
@@ -0,0 +1,139 @@
+from unittest.mock import patch
+
+import pytest
+from django.test import override_settings
+
+from java_wallet.models import Alias, Block, Transaction
+from scan.account_counters import (
+    CountersOutOfSync,
+    get_account_counters,
+    rebuild_account_counters,
+    recount_accounts,
+    update_account_counters,
+)
+from scan.models import AccountCounters, CountedBlock
+from scan.tests.chain import create_block, create_tx, insert
+
+pytestmark = pytest.mark.django_db(databases=["default", "java_wallet"])
+
+
+def counters() -> dict:
+    return {row["account_id"]: row for row in AccountCounters.objects.values()}
+
+
+def create_chain():
+    create_block(1, generator_id=1)
+    create_tx(11, 1, 1, 2)
+    create_tx(12, 1, 2, 2, cash_back_id=1, fee=2000000)
+    create_block(2, generator_id=2)
+    create_tx(21, 2, 3, 1)
+
+
+def test_rebuild_and_update():
+    create_chain()
+    assert rebuild_account_counters() == 3
+    assert get_account_counters(2) == {
+        "txs_cnt": 2,
+        "indirects_cnt": 0,
+        "assets_transfers_cnt": 0,
+        "assets_trades_cnt": 0,
+        "mined_blocks_cnt": 1,
+        "cbs_cnt": 0,
+        "cbs_fee": 0,
+        "assets_cnt": 0,
+        "alias_cnt": 0,
+        "ats_cnt": 0,
+        "subscription_cnt": 0,
+    }
+    assert get_account_counters(1)["cbs_fee"] == 2000000
+
+    create_block(3, generator_id=1)
+    create_tx(31, 3, 4, 1, cash_back_id=1)
+    insert(Alias, id=5, account_id=4, height=3, latest=True, timestamp=720)
+    update_account_counters(3)
+
+    rows = counters()
+    assert (rows[1]["txs_cnt"], rows[1]["mined_blocks_cnt"], rows[1]["cbs_cnt"]) == (3, 2, 2)
+    assert (rows[4]["txs_cnt"], rows[4]["alias_cnt"]) == (1, 1)
+    assert CountedBlock.objects.get(height=3).deltas["4"] == [1, 0, 0, 0, 0, 0, 0]
+
+    # the same as counting everything again
+    rebuild_account_counters()
+    assert counters() == rows
+
+
+def test_reorg():
+    create_chain()
+    rebuild_account_counters()
+    create_block(3)
+    create_tx(31, 3, 4, 5)
+    create_block(4)
+    update_account_counters(4)
+
+    # block 3 and 4 replaced by another branch
+    Transaction.objects.using("java_wallet").filter(height__gte=3).delete()
+    Block.objects.using("java_wallet").filter(height__gte=3).delete()
+    create_block(3, block_id=3003, generator_id=5)
+    create_tx(32, 3, 6, 1, block_id=3003)
+    update_account_counters(3)
+
+    rows = counters()
+    assert 4 not in rows or rows[4]["txs_cnt"] == 0
+    assert rows[5] == dict(rows[5], txs_cnt=0, mined_blocks_cnt=1)
+    assert rows[1]["txs_cnt"] == 3
+    assert list(CountedBlock.objects.values_list("height", "block_id")) == [
+        (2, 1000002),
+        (3, 3003),
+    ]
+
+    rebuild_account_counters()
+    assert {k: v for k, v in counters().items() if k != 4} == {
+        k: v for k, v in rows.items() if k != 4
+    }
+
+    # below the block the counters were built at
+    Transaction.objects.using("java_wallet").filter(height__gte=2).delete()
+    Block.objects.using("java_wallet").filter(height__gte=2).delete()
+    create_block(2, block_id=2002)
+    with pytest.raises(CountersOutOfSync):
+        update_account_counters(2)
+
+
+def test_recount():
+    create_chain()
+    rebuild_account_counters()
+    AccountCounters.objects.filter(account_id=2).update(txs_cnt=100, alias_cnt=3)
+
+    recount_accounts([2, 7])
+    assert get_account_counters(2)["txs_cnt"] == 2
+    assert get_account_counters(2)["alias_cnt"] == 0
+    assert get_account_counters(7)["txs_cnt"] == 0
+
+
+def test_not_built():
+    create_chain()
+    update_account_counters(2)
+    assert not AccountCounters.objects.exists()
+    with pytest.raises(CountersOutOfSync):
+        recount_accounts([1])
+
+
+@override_settings(ACCOUNT_COUNTERS_KEEP_BLOCKS=5)
+def test_catch_up():
+    """Counters far behind the chain count the blocks in steps, pruning
+    never takes the last counted block"""
+    create_chain()
+    rebuild_account_counters()
+    for height in range(3, 21):
+        create_block(height, generator_id=1)
+
+    with patch("scan.account_counters.MAX_BLOCKS_PER_UPDATE", 3):
+        for _ in range(6):
+            update_account_counters(20)
+
+    assert get_account_counters(1)["mined_blocks_cnt"] == 19
+    assert CountedBlock.objects.order_by("-height").first().height == 20
+
+    CountedBlock.objects.all().delete()
+    with pytest.raises(CountersOutOfSync):
+        update_account_counters(20)
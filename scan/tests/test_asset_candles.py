@@ -0,0 +1,85 @@
+import pytest
+
+from burst.constants import BLOCK_CHAIN_START_AT
+from java_wallet.models import Trade
+from scan.asset_candles import HOUR, get_candles, period_start, update_asset_candles
+from scan.models import AssetCandle
+from scan.tests.chain import create_block, insert
+
+pytestmark = pytest.mark.django_db(databases=["default", "java_wallet"])
+
+Resolution = AssetCandle.Resolution
+
+# blocks every 10 minutes, 6 an hour
+BLOCK_SECONDS = 600
+
+
+def create_trade(trade_id: int, asset_id: int, height: int, price: int, quantity: int = 1):
+    insert(
+        Trade,
+        asset_id=asset_id,
+        ask_order_id=trade_id,
+        bid_order_id=trade_id,
+        height=height,
+        timestamp=height * BLOCK_SECONDS,
+        price=price,
+        quantity=quantity,
+    )
+
+
+def unix_time(height: int) -> int:
+    return height * BLOCK_SECONDS + BLOCK_CHAIN_START_AT
+
+
+def candles(resolution: int = Resolution.HOUR) -> list:
+    return list(
+        AssetCandle.objects.filter(resolution=resolution)
+        .order_by("asset_id", "start")
+        .values_list("asset_id", "start", "open", "high", "low", "close", "volume", "trades")
+    )
+
+
+def test_period_start():
+    # monday 2024-01-01 00:00 UTC
+    monday = 1704067200
+    assert period_start(monday + 3 * 86400 + 5000, Resolution.WEEK) == monday
+    assert period_start(monday + 5000, Resolution.DAY) == monday
+    assert period_start(monday + 5000, Resolution.HOUR) == monday + 3600
+
+
+def test_update():
+    for height in range(1, 40):
+        create_block(height)
+    create_trade(1, 10, 1, price=10)
+    create_trade(2, 10, 2, price=30, quantity=2)
+    create_trade(3, 10, 7, price=20)
+    create_trade(4, 20, 3, price=5)
+
+    update_asset_candles()
+    hour = period_start(unix_time(1), Resolution.HOUR)
+    assert candles() == [
+        (10, hour, 10, 30, 10, 30, 3, 2),
+        (10, hour + HOUR, 20, 20, 20, 20, 1, 1),
+        (20, hour, 5, 5, 5, 5, 1, 1),
+    ]
+    day = period_start(unix_time(1), Resolution.DAY)
+    assert candles(Resolution.DAY) == [(10, day, 10, 30, 10, 20, 4, 3), (20, day, 5, 5, 5, 5, 1, 1)]
+
+    # new trades, one of the last ones replaced by a reorg
+    Trade.objects.using("java_wallet").filter(ask_order_id=3).delete()
+    create_trade(5, 10, 8, price=40)
+    create_trade(6, 20, 30, price=6)
+    update_asset_candles()
+    assert candles()[1] == (10, hour + HOUR, 40, 40, 40, 40, 1, 1)
+    assert candles(Resolution.WEEK)[0][2:] == (10, 40, 10, 40, 4, 3)
+    assert len(candles()) == 4
+
+    # the same as counting everything again
+    incremental = [candles(r) for r in (Resolution.HOUR, Resolution.DAY, Resolution.WEEK)]
+    AssetCandle.objects.all().delete()
+    update_asset_candles()
+    assert [candles(r) for r in (Resolution.HOUR, Resolution.DAY, Resolution.WEEK)] == incremental
+
+    assert [c[0] for c in get_candles(10, Resolution.HOUR)] == [hour, hour + HOUR]
+    assert [c[0] for c in get_candles(10, Resolution.HOUR, start=hour + 10)] == [hour, hour + HOUR]
+    assert get_candles(10, Resolution.HOUR, end=hour - 1) == []
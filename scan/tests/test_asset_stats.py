@@ -0,0 +1,105 @@
+import pytest
+
+from burst.constants import TxSubtypeColoredCoins, TxType
+from java_wallet.models import AccountAsset, Asset, AssetTransfer, Block, Trade
+from scan.asset_stats import get_asset_stats, update_asset_stats
+from scan.models import AssetStats
+from scan.tests.chain import create_block, create_tx, insert
+
+pytestmark = pytest.mark.django_db(databases=["default", "java_wallet"])
+
+FIELDS = ("holders", "transfers", "trades", "volume_24h", "volume_7d", "last_price", "circulating", "height")
+
+
+def stats() -> dict:
+    return {row[0]: row[1:] for row in AssetStats.objects.values_list("asset_id", *FIELDS)}
+
+
+def create_blocks(start: int, end: int):
+    # 360 blocks a day
+    for height in range(start, end + 1):
+        create_block(height)
+
+
+def create_trade(trade_id: int, asset_id: int, height: int, price: int, quantity: int):
+    insert(
+        Trade,
+        asset_id=asset_id,
+        ask_order_id=trade_id,
+        bid_order_id=trade_id,
+        height=height,
+        price=price,
+        quantity=quantity,
+    )
+
+
+def create_chain():
+    create_blocks(0, 400)
+    insert(Asset, id=10, account_id=1, name="TEN", quantity=1000, height=1)
+    insert(Asset, id=20, account_id=1, name="TWENTY", quantity=50, height=2)
+    create_tx(10, 1, 1)
+    # account 5 holds the treasury of asset 10
+    create_tx(
+        30, 3, 1, 5,
+        type=TxType.COLORED_COINS,
+        subtype=TxSubtypeColoredCoins.ADD_TREASURY_ACCOUNT,
+        referenced_transaction_fullhash="10",
+    )
+    for account_id, asset_id, quantity, height, latest in (
+        (6, 10, 50, 2, False),
+        (1, 10, 600, 2, True),
+        (5, 10, 300, 2, True),
+        (6, 10, 100, 4, True),
+        (1, 20, 50, 2, True),
+    ):
+        insert(
+            AccountAsset,
+            account_id=account_id,
+            asset_id=asset_id,
+            quantity=quantity,
+            height=height,
+            latest=latest,
+        )
+    insert(AssetTransfer, id=1, asset_id=10, sender_id=1, recipient_id=6, quantity=50, height=2)
+    insert(AssetTransfer, id=2, asset_id=10, sender_id=1, recipient_id=5, quantity=300, height=4)
+    create_trade(1, 10, 5, price=3, quantity=10)
+    create_trade(2, 10, 300, price=4, quantity=5)
+
+
+def test_update():
+    create_chain()
+    assert update_asset_stats() == 2
+    assert stats() == {
+        10: (3, 2, 2, 20, 50, 4, 700, 300),
+        20: (1, 0, 0, 0, 0, 0, 50, 2),
+    }
+
+    create_blocks(401, 402)
+    create_trade(3, 20, 401, price=2, quantity=1)
+    insert(AssetTransfer, id=3, asset_id=20, sender_id=1, recipient_id=7, quantity=1, height=402)
+    update_asset_stats()
+    assert stats()[20] == (1, 1, 1, 2, 2, 2, 50, 402)
+
+    # the transfer taken back by a reorg
+    AssetTransfer.objects.using("java_wallet").filter(id=3).delete()
+    Block.objects.using("java_wallet").filter(height=402).delete()
+    update_asset_stats()
+    assert stats()[20] == (1, 0, 1, 2, 2, 2, 50, 401)
+
+    # the same as counting everything again
+    rows = stats()
+    AssetStats.objects.all().delete()
+    update_asset_stats()
+    assert stats() == rows
+
+
+def test_volume_window():
+    create_chain()
+    update_asset_stats()
+
+    # a day after the last trade without new rows of the asset
+    create_blocks(401, 700)
+    update_asset_stats()
+    assert get_asset_stats(10).volume_24h == 0
+    assert get_asset_stats(10).volume_7d == 50
+    assert get_asset_stats(30) is None
@@ -0,0 +1,105 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from django.test import override_settings
+
+from burst.constants import BLOCK_CHAIN_START_AT
+from scan.block_index import BlockIndex
+from scan.caching_data.last_block_id import CachingLastBlockId
+from scan.caching_data.last_height import CachingLastHeight
+from scan.tests.chain import create_block, create_tx
+
+
+class FakeChainIndex(BlockIndex):
+    """Blocks by height in memory instead of the node database"""
+
+    def __init__(self, chain: dict) -> None:
+        super().__init__()
+        self.chain = chain
+        self.read = []
+
+    def _block_id(self, height: int) -> int or None:
+        return self.chain.get(height)
+
+    def _read(self, start: int, end: int) -> list:
+        self.read.append((start, end))
+        return [
+            (h, h * 240, self.chain[h], 0, 0, 0)
+            for h in range(start, end + 1)
+            if h in self.chain
+        ]
+
+
+@pytest.mark.django_db(databases=["default", "java_wallet"])
+def test_read_blocks():
+    generator_id = 2 ** 64 - 5
+    for height in range(3):
+        create_block(height, generator_id=generator_id)
+    create_tx(1, 1, 1)
+    create_tx(2, 1, 1)
+    create_tx(3, 2, 1)
+
+    index = BlockIndex()
+    index.update(2)
+    assert index.height == 2
+    assert list(index.columns["tx_count"]) == [0, 2, 1]
+    assert list(index.columns["generator_id"]) == [generator_id] * 3
+
+    with patch.object(index, "_refresh"):
+        assert index.timestamp(1) == datetime.fromtimestamp(240 + BLOCK_CHAIN_START_AT)
+        assert index.get("tx_count", 3) is None
+        with override_settings(BLOCK_INDEX=False):
+            assert index.get("tx_count", 1) is None
+
+
+def test_update():
+    chain = {h: h for h in range(100)}
+    index = FakeChainIndex(chain)
+
+    index.update(49)
+    assert index.read == [(0, 49)]
+    assert index.height == 49
+
+    # the last blocks again in case of a reorg
+    chain[45] = 1000
+    index.update(60)
+    assert index.read[-1] == (40, 60)
+    assert index.columns["generator_id"][45] == 1000
+    assert index.height == 60
+
+    # popped blocks
+    index.update(55)
+    assert index.height == 55
+    assert all(len(column) == 56 for column in index.columns.values())
+
+    # a hole stops the index before it
+    del chain[58]
+    index.update(70)
+    assert index.height == 57
+
+
+def test_refresh_same_height_reorg():
+    chain = {h: h for h in range(50)}
+    index = FakeChainIndex(chain)
+
+    def refresh(height: int, block_id: int):
+        index._checked_at = 0
+        with patch.object(CachingLastHeight, "cached_data", height), \
+                patch.object(CachingLastBlockId, "cached_data", block_id):
+            index._refresh()
+        if index._thread:
+            index._thread.join()
+
+    refresh(49, 49)
+    assert index.read == [(0, 49)]
+    assert index.head_id == 49
+    refresh(49, 49)
+    assert len(index.read) == 1
+
+    # the last block replaced at the same height
+    chain[48], chain[49] = 1048, 1049
+    refresh(49, 1049)
+    assert index.read[-1] == (40, 49)
+    assert index.columns["generator_id"][48] == 1048
+    assert index.head_id == 1049
@@ -0,0 +1,63 @@
+import pytest
+from django.test import override_settings
+
+from burst.constants import TxSubtypeBurstMining, TxType
+from java_wallet.models import Account, Block
+from scan.helpers.queries import (
+    get_pool_id_for_block_db,
+    get_pool_ids_for_blocks,
+    get_txs_count_in_blocks,
+)
+from scan.tests.chain import create_block, create_tx, insert
+from scan.views.blocks import fill_data_blocks
+
+pytestmark = pytest.mark.django_db(databases=["default", "java_wallet"])
+
+# generator of each height, 9 never joined a pool
+GENERATORS = {1: 9, 2: 7, 3: 8, 4: 7, 5: 8, 6: 7}
+
+
+def assign_pool(tx_id: int, height: int, account_id: int, pool_id: int):
+    create_tx(
+        tx_id, height, account_id, pool_id,
+        type=TxType.BURST_MINING,
+        subtype=TxSubtypeBurstMining.REWARD_RECIPIENT_ASSIGNMENT,
+    )
+
+
+def create_chain() -> list:
+    for height, generator_id in GENERATORS.items():
+        create_block(height, generator_id=generator_id)
+    # 7 changes pool at the height of one of its blocks
+    assign_pool(1, 1, 7, 100)
+    assign_pool(2, 4, 7, 200)
+    assign_pool(3, 5, 8, 300)
+    create_tx(4, 2, 1, 2)
+    create_tx(5, 2, 2, 1)
+    insert(Account, id=200, name="pool", latest=True)
+    return list(Block.objects.using("java_wallet").order_by("height"))
+
+
+def test_pool_ids():
+    blocks = create_chain()
+    pool_ids = get_pool_ids_for_blocks(blocks)
+    assert [pool_ids[b.id] for b in blocks] == [None, 100, None, 200, 300, 200]
+    assert pool_ids == {b.id: get_pool_id_for_block_db(b) for b in blocks}
+    assert get_pool_ids_for_blocks([]) == {}
+
+
+def test_txs_counts():
+    blocks = create_chain()
+    counts = get_txs_count_in_blocks([b.id for b in blocks])
+    assert [counts[b.id] for b in blocks] == [1, 2, 0, 1, 1, 0]
+
+
+@override_settings(BLOCK_INDEX=False)
+def test_fill_data_blocks():
+    blocks = create_chain()
+    fill_data_blocks(blocks)
+
+    assert [b.txs_cnt for b in blocks] == [1, 2, 0, 1, 1, 0]
+    assert [getattr(b, "pool_id", None) for b in blocks] == [None, 100, None, 200, 300, 200]
+    assert blocks[3].pool_name == "pool"
+    assert blocks[1].pool_name is None
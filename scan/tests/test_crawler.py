@@ -0,0 +1,150 @@
+import logging
+from unittest import TestCase
+
+from scan.crawler import Crawler, Priority
+from scan.tests.p2p_network import SimulatedNetwork, benchmark
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlerTest(TestCase):
+    def test_classification(self):
+        with SimulatedNetwork(size=60, seed=1) as network:
+            first, second = benchmark(network, scans=2, timeout=0.5)
+
+        self.assertEqual(first["wrong"], {})
+        self.assertEqual(second["wrong"], {})
+
+    def test_one_probe_per_peer(self):
+        with SimulatedNetwork(size=40, fanout=40, seed=2) as network:
+            benchmark(network, scans=1, timeout=0.5)
+            network.stats()
+
+        for peer in network.peers:
+            if peer.role in ("dead", "timeout"):
+                continue
+            self.assertEqual(peer.requests["getPeers"], 1)
+            self.assertEqual(peer.requests["getInfo"], 1)
+            if peer.answers:
+                self.assertEqual(peer.requests["getCumulativeDifficulty"], 1)
+
+    def test_known_peers_not_probed(self):
+        """Known peers shared by a node are left to the caller"""
+        with SimulatedNetwork(size=20, mix={"online": 1}, fanout=20, seed=4) as network:
+            known = network.addresses[10:]
+            crawler = Crawler(network.local_difficulty, timeout=0.5, known=known)
+            crawler.crawl(network.addresses[:1])
+            network.stats()
+
+        for peer in network.peers[:10]:
+            self.assertEqual(peer.requests["getInfo"], 1)
+        for peer in network.peers[10:]:
+            self.assertEqual(peer.requests["getInfo"], 0)
+
+    def test_stuck(self):
+        mix = {"online": 0.5, "stuck": 0.5}
+        with SimulatedNetwork(size=10, mix=mix) as network:
+            first, second = benchmark(network, scans=2, timeout=0.5)
+            stuck = {p.address for p in network.peers if p.role == "stuck"}
+
+        self.assertEqual(len(stuck), 5)
+        self.assertEqual(second["accuracy"], 1)
+
+    def test_failing_lookup(self):
+        """An unexpected error marks the peer unreachable, the scan goes on"""
+
+        def geo_lookup(ip: str) -> str:
+            raise ConnectionError("redis")
+
+        with SimulatedNetwork(size=10, mix={"online": 1}, fanout=0) as network:
+            crawler = Crawler(
+                network.local_difficulty, concurrency=2, timeout=0.5, geo_lookup=geo_lookup
+            )
+            with self.assertLogs("scan.crawler", "ERROR"):
+                crawler.crawl(network.addresses)
+
+        self.assertEqual(len(crawler.unreachable(network.addresses)), 10)
+
+    def test_benchmark(self):
+        """Wall time is bound by the slowest peer, not the number of peers"""
+        with SimulatedNetwork(size=500, latency=(0.01, 0.1), seed=3) as network:
+            results = benchmark(network, scans=2, concurrency=100, timeout=1)
+
+        for result in results:
+            logger.info(
+                "scan of {peers} peers: {seconds:.2f}s, {connections} connections, "
+                "{peak_connections} at once, {peak_threads} threads, "
+                "accuracy {accuracy:.3f}".format(**result)
+            )
+            self.assertEqual(result["accuracy"], 1)
+            self.assertLessEqual(result["peak_connections"], 100)
+            self.assertLess(result["seconds"], 10)
+
+
+class FrontierTest(TestCase):
+    def crawl(self, network, priorities, **kwargs):
+        crawler = Crawler(network.local_difficulty, timeout=0.5, **kwargs)
+        crawler.crawl(network.addresses, priorities=priorities)
+        return crawler
+
+    def test_convergence(self):
+        mix = {"online": 0.2, "dead": 0.8}
+        with SimulatedNetwork(size=200, mix=mix, fanout=0) as network:
+            online = [p.address for p in network.peers if p.role == "online"]
+            priorities = {address: Priority.OTHER for address in network.addresses}
+            priorities.update({address: Priority.RECENT for address in online})
+            crawler = self.crawl(network, priorities, concurrency=5, convergence_window=10)
+
+        self.assertEqual(crawler.frontier.stop_reason, "converged")
+        self.assertGreater(len(crawler.frontier.skipped), 100)
+        for address in online:
+            self.assertIsNotNone(crawler.results[crawler.url(address)])
+        # skipped peers are not unreachable
+        self.assertLess(len(crawler.unreachable(network.addresses)), 40)
+
+    def test_convergence_after_known_peers(self):
+        """Known dead peers, more than the window and first with their floor
+        timeout, don't stop the scan before new peers are probed"""
+        mix = {"online": 0.2, "dead": 0.8}
+        with SimulatedNetwork(size=50, mix=mix, fanout=0) as network:
+            dead = [p.address for p in network.peers if p.role == "dead"]
+            online = [p.address for p in network.peers if p.role == "online"]
+            priorities = {address: Priority.UNREACHABLE for address in dead}
+            crawler = Crawler(
+                network.local_difficulty,
+                concurrency=1,
+                timeout=0.5,
+                convergence_window=10,
+                timeouts={address: 0.1 for address in dead},
+            )
+            crawler.crawl(network.addresses, priorities=priorities)
+
+        self.assertIsNone(crawler.frontier.stop_reason)
+        for address in online:
+            self.assertIsNotNone(crawler.results[crawler.url(address)])
+
+    def test_request_budget(self):
+        with SimulatedNetwork(size=50, mix={"online": 1}, fanout=0) as network:
+            bootstrap = network.addresses[-1]
+            crawler = self.crawl(
+                network, {bootstrap: Priority.BOOTSTRAP}, concurrency=1, max_requests=10
+            )
+
+        self.assertEqual(crawler.frontier.stop_reason, "requests")
+        self.assertLessEqual(crawler.frontier.requests, 10 + 3)
+        self.assertIsNotNone(crawler.results[crawler.url(bootstrap)])
+        self.assertEqual(crawler.unreachable(network.addresses), [])
+
+    def test_adaptive_timeouts(self):
+        mix = {"online": 0.5, "timeout": 0.5}
+        with SimulatedNetwork(size=20, mix=mix, fanout=0) as network:
+            hanging = {p.address: 0.2 for p in network.peers if p.role == "timeout"}
+            crawler = Crawler(network.local_difficulty, timeout=3, timeouts=hanging)
+            crawler.crawl(network.addresses)
+
+        self.assertLess(crawler.frontier.seconds, 2)
+        self.assertEqual(len(crawler.unreachable(network.addresses)), 10)
+        for peer in network.peers:
+            result = crawler.results[crawler.url(peer.address)]
+            if peer.role == "online":
+                self.assertLess(result["rtt"], 1)
@@ -0,0 +1,69 @@
+from collections import Counter
+
+from burst.constants import FEE_QUANT
+from scan.fee_stats import BlockFees, next_block_fee, percentiles
+
+
+class FakeChainFees(BlockFees):
+    """Fees by height in memory instead of the transaction table"""
+
+    def __init__(self, window: int, chain: dict) -> None:
+        super().__init__(window)
+        self.chain = chain
+        self.fetched = []
+
+    def _fetch(self, start: int, end: int) -> dict:
+        self.fetched.append((start, end))
+        return {h: Counter(self.chain.get(h, [])) for h in range(start, end + 1)}
+
+
+def test_percentiles():
+    assert percentiles(Counter()) == {"count": 0}
+
+    fees = Counter({FEE_QUANT: 90, 2 * FEE_QUANT: 9, 10 * FEE_QUANT: 1})
+    assert percentiles(fees) == {
+        "count": 100,
+        "min": FEE_QUANT,
+        "max": 10 * FEE_QUANT,
+        "p10": FEE_QUANT,
+        "p25": FEE_QUANT,
+        "p50": FEE_QUANT,
+        "p75": FEE_QUANT,
+        "p90": FEE_QUANT,
+    }
+    assert percentiles(Counter({5: 1}))["p10"] == 5
+    assert percentiles(Counter({1: 1, 2: 1, 3: 1, 4: 1}))["p50"] == 2
+
+
+def test_next_block_fee():
+    assert next_block_fee([], capacity=3) == FEE_QUANT
+    assert next_block_fee([FEE_QUANT * 5] * 2, capacity=3) == FEE_QUANT
+    fees = [FEE_QUANT * f for f in (1, 4, 2, 8, 1)]
+    assert next_block_fee(fees, capacity=3) == 3 * FEE_QUANT
+
+
+def test_block_fees_window():
+    chain = {h: [h * FEE_QUANT] for h in range(1, 101)}
+    fees = FakeChainFees(10, chain)
+
+    fees.update(50)
+    assert fees.fetched == [(41, 50)]
+    assert fees.counts == Counter({h * FEE_QUANT: 1 for h in range(41, 51)})
+
+    # new blocks and the last ones again, old ones leave the window
+    fees.update(53)
+    assert fees.fetched[-1] == (48, 53)
+    assert fees.counts == Counter({h * FEE_QUANT: 1 for h in range(44, 54)})
+
+    # reorg: 52 and 53 replaced by another branch
+    chain[52] = chain[53] = [FEE_QUANT, FEE_QUANT]
+    del chain[51]
+    fees.update(53)
+    assert fees.counts[FEE_QUANT] == 4
+    assert 51 * FEE_QUANT not in fees.counts
+    assert sum(fees.counts.values()) == 7 + 4
+
+    # popped blocks
+    fees.update(49)
+    assert fees.fetched[-1] == (40, 49)
+    assert fees.counts == Counter({h * FEE_QUANT: 1 for h in range(40, 50)})
@@ -0,0 +1,120 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from java_wallet.models import Account
+from scan.caching_data.pending_txs import (
+    CachingPendingTxs,
+    get_pending_tx,
+    is_known_missing_tx,
+    set_missing_tx,
+)
+from scan.mempool import Mempool
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def pending_tx(tx_id: int, fee: int, timestamp: int, sender: int, recipient: int = None) -> dict:
+    tx = {
+        "transaction": str(tx_id),
+        "type": 0,
+        "subtype": 0,
+        "timestamp": timestamp,
+        "amountNQT": "100000000",
+        "feeNQT": str(fee),
+        "sender": str(sender),
+    }
+    if recipient is not None:
+        tx["recipient"] = str(recipient)
+    return tx
+
+
+def update(mempool: Mempool, *txs) -> tuple:
+    # the node sends new dicts every time
+    added, removed = mempool.update([pending_tx(*tx) for tx in txs])
+    return len(added), len(removed)
+
+
+def create_account(account_id: int, name: str = None) -> None:
+    Account.objects.using("java_wallet").create(
+        id=account_id, creation_height=0, name=name, height=0, latest=True
+    )
+
+
+@pytest.mark.django_db(databases=["default", "java_wallet"])
+def test_update():
+    create_account(1, "alice")
+    create_account(2)
+
+    mempool = Mempool()
+    assert update(mempool, (10, 1000, 5, 1, 2), (11, 3000, 6, 2, 9), (12, 2000, 7, 1)) == (3, 0)
+    assert [t["transaction"] for t in mempool.by_fee()] == ["11", "12", "10"]
+    assert [t["transaction"] for t in mempool.by_time()] == ["12", "11", "10"]
+
+    tx = mempool.txs["10"]
+    assert (tx["feeNQT"], tx["sender_name"], tx["recipient_exists"]) == (1000, "alice", True)
+    assert mempool.txs["11"]["recipient_exists"] is False
+
+    # 10 confirmed, 13 broadcast, only 13 is enriched
+    with CaptureQueriesContext(connections["java_wallet"]) as queries:
+        assert update(mempool, (11, 3000, 6, 2, 9), (12, 2000, 7, 1), (13, 5000, 8, 1, 1)) == (1, 1)
+    assert len(queries) == 2
+    assert [t["transaction"] for t in mempool.by_fee()] == ["13", "11", "12"]
+    assert mempool.txs["13"]["recipient_name"] == "alice"
+
+    with CaptureQueriesContext(connections["java_wallet"]) as queries:
+        assert update(mempool, (12, 2000, 7, 1), (13, 5000, 8, 1, 1), (11, 3000, 6, 2, 9)) == (0, 0)
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db(databases=["default", "java_wallet"])
+def test_update_bulk():
+    for i in range(50):
+        create_account(i + 1, f"account {i + 1}")
+    txs = [(100 + i, 1000 * (i % 7), i, i + 1, 50 - i) for i in range(500)]
+
+    mempool = Mempool()
+    with CaptureQueriesContext(connections["java_wallet"]) as queries:
+        update(mempool, *txs)
+    assert len(queries) <= 3
+
+    fees = [t["feeNQT"] for t in mempool.by_fee()]
+    assert fees == sorted(fees, reverse=True)
+    mempool.update([])
+    assert mempool.by_fee() == mempool.by_time() == []
+
+
+@pytest.mark.django_db(databases=["default", "java_wallet"])
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_pending_tx_lookup():
+    node_pool = [pending_tx(10, 1000, 5, 1)]
+    node_set = MagicMock()
+    node_set.call.side_effect = lambda _: [dict(t) for t in node_pool]
+
+    with patch("scan.mempool.get_node_set", return_value=node_set), patch(
+        "scan.caching_data.pending_txs.mempool", Mempool()
+    ):
+        # cold cache, the lookup refreshes the pool
+        assert get_pending_tx("10")["feeNQT"] == 1000
+        assert get_pending_tx("11") is None
+        assert node_set.call.call_count == 1
+
+        set_missing_tx("11")
+        assert is_known_missing_tx("11")
+
+        node_pool.append(pending_tx(11, 2000, 6, 1))
+        del node_pool[0]
+        CachingPendingTxs().update_live_data()
+        assert get_pending_tx("10") is None
+        assert get_pending_tx("11")["feeNQT"] == 2000
+        assert not is_known_missing_tx("11")
+
+        # pending for longer than the entry timeout
+        cache.delete("pending_tx:11")
+        CachingPendingTxs().update_live_data()
+        assert get_pending_tx("11")["feeNQT"] == 2000
+        assert [t["transaction"] for t in CachingPendingTxs().cached_data] == ["11"]
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.utils import timezone
+
+from scan.models import PeerMonitor, PeerSnapshot
+from scan.peer_history import downsample_history, get_trend, take_snapshot
+
+
+def create_peer(address: str, state: int, height: int, **kwargs) -> PeerMonitor:
+    return PeerMonitor.objects.create(
+        announced_address=address,
+        state=state,
+        height=height,
+        last_online_at=timezone.now(),
+        **kwargs,
+    )
+
+
+def create_snapshot(created_at: datetime, online: int) -> PeerSnapshot:
+    return PeerSnapshot.objects.create(
+        states={"1": online, "2": 1}, height_lag={"0": online}, created_at=created_at
+    )
+
+
+@pytest.mark.django_db
+def test_take_snapshot():
+    create_peer("a", PeerMonitor.State.ONLINE, 1000, version="v3.8.0", country_code="DE")
+    create_peer("b", PeerMonitor.State.ONLINE, 1000, version="v3.8.0", country_code="US")
+    create_peer("c", PeerMonitor.State.SYNC, 950, version="v3.7.2")
+    create_peer("d", PeerMonitor.State.UNREACHABLE, 10)
+
+    snapshot = PeerSnapshot.objects.get(pk=take_snapshot(1000).pk)
+    assert snapshot.states == {"1": 2, "2": 1, "3": 1}
+    assert snapshot.versions == {"v3.8.0": 2}
+    assert snapshot.countries == {"DE": 1, "US": 1}
+    assert snapshot.height_lag == {"0": 2, "11-100": 1}
+
+
+@pytest.mark.django_db
+def test_downsample_history():
+    now = datetime(2024, 3, 10, 12, 30)
+    # two hours of scans 3 days ago, a scan today
+    for minutes in range(0, 120, 5):
+        create_snapshot(datetime(2024, 3, 7, 10) + timedelta(minutes=minutes), minutes // 60 + 1)
+    create_snapshot(now, 5)
+    # hourly buckets 70 days ago
+    for hour in range(3):
+        PeerSnapshot.objects.create(
+            resolution=PeerSnapshot.Resolution.HOURLY,
+            samples=12,
+            states={"1": 12 * 10},
+            created_at=datetime(2024, 1, 1, hour),
+        )
+
+    downsample_history(now)
+
+    assert list(
+        PeerSnapshot.objects.order_by("created_at").values_list(
+            "resolution", "samples", "created_at", "states"
+        )
+    ) == [
+        (PeerSnapshot.Resolution.DAILY, 36, datetime(2024, 1, 1), {"1": 360}),
+        (PeerSnapshot.Resolution.HOURLY, 12, datetime(2024, 3, 7, 10), {"1": 12, "2": 12}),
+        (PeerSnapshot.Resolution.HOURLY, 12, datetime(2024, 3, 7, 11), {"1": 24, "2": 12}),
+        (PeerSnapshot.Resolution.SCAN, 1, now, {"1": 5, "2": 1}),
+    ]
+
+    # idempotent
+    downsample_history(now)
+    assert PeerSnapshot.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_get_trend():
+    now = timezone.now()
+    create_snapshot(now - timedelta(days=40), 1)
+    create_snapshot(now - timedelta(hours=2), 2)
+    PeerSnapshot.objects.create(
+        resolution=PeerSnapshot.Resolution.HOURLY,
+        samples=4,
+        states={"1": 10},
+        created_at=now - timedelta(days=3),
+    )
+
+    assert [counts for _, counts in get_trend(30)] == [{"1": 2.5}, {"1": 2, "2": 1}]
@@ -0,0 +1,147 @@
+import random
+import time
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from scan.models import PeerMonitor
+from scan.peers import (
+    CumulativeDifficultyCache,
+    check_state,
+    get_peer_timeout,
+    get_peer_timeouts,
+    save_scan,
+)
+
+LOCAL_DIFFICULTY = {"id": 100, "height": 1000, "previous_block_id": 99}
+
+
+def generate_updates(count: int, offset: int = 0) -> list:
+    rnd = random.Random(count)
+    return [
+        {
+            "announced_address": f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            "real_ip": f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            "country_code": rnd.choice(["DE", "US", "??"]),
+            "application": "BRS",
+            "platform": rnd.choice(["", "S-XXXX-XXXX-XXXX-XXXXX"]),
+            "version": rnd.choice(["v3.7.2", "v3.8.0"]),
+            "height": 1001,
+            "cumulative_difficulty": "12345",
+            "last_online_at": timezone.now(),
+            "next_block_ids": ["100"] if i % 10 else [],
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+@pytest.mark.django_db
+def test_save_scan():
+    save_scan(LOCAL_DIFFICULTY, generate_updates(20))
+    assert PeerMonitor.objects.count() == 20
+    assert PeerMonitor.objects.filter(state=PeerMonitor.State.FORKED).count() == 2
+
+    # half of them gone
+    save_scan(LOCAL_DIFFICULTY, generate_updates(10))
+    peer = PeerMonitor.objects.get(announced_address="10.0.0.15")
+    assert peer.state == PeerMonitor.State.UNREACHABLE
+    assert (peer.lifetime, peer.downtime, peer.availability) == (2, 1, 50)
+
+    peer = PeerMonitor.objects.get(announced_address="10.0.0.1")
+    assert (peer.lifetime, peer.downtime, peer.availability) == (2, 0, 100)
+
+
+@pytest.mark.django_db
+def test_save_scan_unreachable_subset():
+    save_scan(LOCAL_DIFFICULTY, generate_updates(5))
+    save_scan(LOCAL_DIFFICULTY, [], unreachable=["10.0.0.1"])
+
+    assert PeerMonitor.objects.get(announced_address="10.0.0.1").lifetime == 2
+    assert PeerMonitor.objects.get(announced_address="10.0.0.2").lifetime == 1
+
+
+@pytest.mark.django_db
+def test_save_scan_benchmark():
+    """One read and only batched upserts, whatever the number of peers"""
+    save_scan(LOCAL_DIFFICULTY, generate_updates(3000))
+
+    started = time.monotonic()
+    with CaptureQueriesContext(connection) as context:
+        save_scan(LOCAL_DIFFICULTY, generate_updates(3000, offset=1500))
+    seconds = time.monotonic() - started
+
+    statements = [q["sql"].split()[0] for q in context.captured_queries]
+    assert statements.count("SELECT") == 1
+    assert set(statements) <= {"SELECT", "INSERT", "SAVEPOINT", "RELEASE"}
+
+    assert PeerMonitor.objects.count() == 4500
+    assert seconds < 10
+    assert PeerMonitor.objects.filter(state=PeerMonitor.State.UNREACHABLE).count() == 1500
+
+
+class CountingCache(CumulativeDifficultyCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetched = []
+
+    def _fetch(self, heights):
+        self.fetched.append(heights)
+        return {h: str(h * 10) for h in heights}
+
+
+def test_cumulative_difficulty_cache():
+    cache = CountingCache(window=100, unstable=10)
+
+    assert cache.get_many({950, 995, 999}, top=1000) == {
+        950: "9500", 995: "9950", 999: "9990",
+    }
+    assert cache.fetched == [[950, 995, 999]]
+    # near the top may be reorganized, not kept
+    assert len(cache) == 1
+
+    assert cache.get_many({950, 999}, top=1000) == {950: "9500", 999: "9990"}
+    assert cache.fetched[-1] == [999]
+
+    # out of the window
+    cache.get_many({1050}, top=1100)
+    assert len(cache) == 1 and 950 not in cache._cache
+
+
+def test_check_state_batched():
+    difficulties = {990: "12345"}
+    behind = dict(generate_updates(1)[0], height=990)
+    assert check_state(LOCAL_DIFFICULTY, behind, None, difficulties) == PeerMonitor.State.SYNC
+    behind["cumulative_difficulty"] = "1"
+    assert check_state(LOCAL_DIFFICULTY, behind, None, difficulties) == PeerMonitor.State.FORKED
+
+
+@override_settings(
+    PEERS_TIMEOUT_PERCENTILE=90,
+    PEERS_TIMEOUT_FACTOR=3,
+    PEERS_TIMEOUT_FLOOR=2,
+    PEERS_TIMEOUT_CEILING=10,
+)
+def test_get_peer_timeout():
+    assert get_peer_timeout(PeerMonitor.State.ONLINE, []) == 10
+    assert get_peer_timeout(PeerMonitor.State.UNREACHABLE, []) == 2
+    # p90 of 10 samples is the 9th
+    samples = [0.1] * 8 + [1.5, 30]
+    assert get_peer_timeout(PeerMonitor.State.ONLINE, samples) == 4.5
+    assert get_peer_timeout(PeerMonitor.State.ONLINE, [0.05]) == 2
+    assert get_peer_timeout(PeerMonitor.State.ONLINE, [5, 6]) == 10
+
+
+@pytest.mark.django_db
+@override_settings(PEERS_RTT_SAMPLES=3)
+def test_save_scan_rtt_samples():
+    for rtt in (0.1, 0.2, 0.3, 0.4):
+        updates = generate_updates(1)
+        updates[0]["rtt"] = rtt
+        save_scan(LOCAL_DIFFICULTY, updates)
+
+    peer = PeerMonitor.objects.get(announced_address="10.0.0.0")
+    assert peer.rtt_samples == [0.2, 0.3, 0.4]
+    assert get_peer_timeouts(["10.0.0.0"]) == {"10.0.0.0": 2}
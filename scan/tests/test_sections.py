@@ -0,0 +1,81 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from scan.views.base import SectionsMixin, load_sections
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def slow(seconds: float, **context):
+    def loader():
+        time.sleep(seconds)
+        return context
+
+    return loader
+
+
+class PageView(SectionsMixin):
+    section_timeout = 0.3
+
+    def __init__(self, release: threading.Event) -> None:
+        self.release = release
+        self.calls = 0
+
+    def stuck(self) -> dict:
+        self.calls += 1
+        self.release.wait(5)
+        return {"stuck": "done"}
+
+    def get_sections(self, obj) -> dict:
+        return {"fast": slow(0, fast=obj.id), "stuck": self.stuck}
+
+
+class LoadSectionsTest(SimpleTestCase):
+    def test_concurrent(self):
+        start = time.monotonic()
+        context, late = load_sections(
+            {"a": slow(0.2, a=1), "b": slow(0.2, b=2), "c": slow(0.2, c=3)},
+            {"a": 1, "b": 1, "c": 1},
+        )
+        assert time.monotonic() - start < 0.5
+        assert context == {"a": 1, "b": 2, "c": 3}
+        assert late == {}
+
+    def test_deadline(self):
+        start = time.monotonic()
+        context, late = load_sections(
+            {"fast": slow(0, fast=1), "slow": slow(1, slow=1)},
+            {"fast": 1, "slow": 0.1},
+        )
+        assert time.monotonic() - start < 0.5
+        assert context == {"fast": 1}
+        assert list(late) == ["slow"]
+        assert late["slow"].result() == {"slow": 1}
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    @patch("scan.views.base.CachingLastHeight")
+    def test_late_section_cached(self, last_height):
+        last_height.return_value.cached_data = 100
+        release = threading.Event()
+        view = PageView(release)
+        obj = SimpleNamespace(id=7)
+
+        assert view.load_sections(obj) == {"fast": 7, "loading_sections": ["stuck"]}
+
+        release.set()
+        time.sleep(0.2)
+        assert view.load_sections(obj) == {
+            "fast": 7,
+            "stuck": "done",
+            "loading_sections": [],
+        }
+        assert view.calls == 1
+
+        # next block
+        last_height.return_value.cached_data = 101
+        view.load_sections(obj)
+        assert view.calls == 2
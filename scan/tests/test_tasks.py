@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from scan.models import PeerMonitor
+from scan.tasks import (
+    PeriodicTask,
+    SnrMaster,
+    TaskScheduler,
+    get_tasks,
+    sync_snr_status,
+)
+
+
+class TaskSchedulerTest(SimpleTestCase):
+    def run_scheduler(self, tasks: list, seconds: float) -> TaskScheduler:
+        scheduler = TaskScheduler(tasks, store=False)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        time.sleep(seconds)
+        scheduler.stop()
+        thread.join()
+        return scheduler
+
+    def test_intervals(self):
+        calls = {"fast": 0, "slow": 0}
+
+        def task(name):
+            def func():
+                calls[name] += 1
+
+            return func
+
+        self.run_scheduler(
+            [
+                PeriodicTask("fast", task("fast"), interval=0.1),
+                PeriodicTask("slow", task("slow"), interval=10),
+            ],
+            1,
+        )
+        self.assertGreaterEqual(calls["fast"], 4)
+        self.assertEqual(calls["slow"], 1)
+
+    def test_independent(self):
+        calls = []
+
+        scheduler = self.run_scheduler(
+            [
+                PeriodicTask("blocked", lambda: time.sleep(1.5), interval=0.1),
+                PeriodicTask("quick", lambda: calls.append(1), interval=0.1),
+            ],
+            1,
+        )
+        self.assertGreaterEqual(len(calls), 4)
+        self.assertNotIn("blocked", scheduler.runs)
+
+    def test_outcomes(self):
+        def fail():
+            raise ValueError("boom")
+
+        scheduler = TaskScheduler(
+            [
+                PeriodicTask("ok", lambda: None, interval=60),
+                PeriodicTask("error", fail, interval=60),
+                PeriodicTask("timeout", lambda: time.sleep(0.2), interval=60, timeout=0.1),
+            ],
+            store=False,
+        )
+        scheduler.run_once()
+        scheduler.stop()
+
+        runs = scheduler.runs
+        self.assertEqual(runs["ok"]["outcome"], "ok")
+        self.assertEqual(runs["error"]["outcome"], "error")
+        self.assertIn("boom", runs["error"]["error"])
+        self.assertEqual(runs["timeout"]["outcome"], "timeout")
+        self.assertGreaterEqual(runs["timeout"]["duration"], 0.2)
+
+    @override_settings(SNR_MASTER_EXPLORER=None, TASKS_SCHEDULE={"exchange": {"interval": 120}})
+    def test_schedule_overrides(self):
+        tasks = {task.name: task for task in get_tasks()}
+        self.assertNotIn("snr_status", tasks)
+        self.assertEqual(tasks["exchange"].interval, 120)
+        self.assertEqual(tasks["exchange"].timeout, 30)
+
+
+class SnrMasterHandler(BaseHTTPRequestHandler):
+    body = json.dumps([["1.1.1.1", "x", "OK", "2024-01-01 00:00:00"]]).encode()
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_snr_master_etag():
+    server = HTTPServer(("127.0.0.1", 0), SnrMasterHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        master = SnrMaster(f"http://127.0.0.1:{server.server_port}")
+        first, second = master.fetch(), master.fetch()
+    finally:
+        server.shutdown()
+    assert first == second == [["1.1.1.1", "x", "OK", "2024-01-01 00:00:00"]]
+    assert SnrMasterHandler.requests == [None, '"v1"']
+
+
+@pytest.mark.django_db
+def test_sync_snr_status():
+    for i in range(3):
+        PeerMonitor.objects.create(
+            announced_address=f"10.0.0.{i}",
+            height=1000,
+            state=PeerMonitor.State.ONLINE,
+            last_online_at=datetime(2024, 1, 1),
+        )
+    nodes = [
+        [f"10.0.0.{i}", f"10.0.0.{i}", "OK", f"2024-01-01 00:00:0{i}"] for i in range(3)
+    ]
+    nodes.append(["10.0.0.9", "10.0.0.9", "OK", "2024-01-01 00:00:00"])
+
+    assert sync_snr_status(nodes) == 3
+    with CaptureQueriesContext(connection) as queries:
+        assert sync_snr_status(nodes) == 0
+    assert len(queries) == 1
+
+    nodes[1][2] = "Duplicate"
+    assert sync_snr_status(nodes) == 1
+    peer = PeerMonitor.objects.get(announced_address="10.0.0.1")
+    assert peer.reward_state == "Duplicate"
+    assert peer.reward_time == datetime(2024, 1, 1, 0, 0, 1)
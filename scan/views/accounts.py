@@ -1,6 +1,12 @@
-from django.db.models import Q
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery, Sum
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
 from django.views.generic import ListView
 from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.core.cache import cache
 
@@ -17,18 +23,20 @@ from java_wallet.models import (
     Trade,
     Transaction,
 )
+from scan.account_counters import get_account_counters
+from scan.caching_data.last_height import CachingLastHeight
 from scan.caching_paginator import CachingPaginator
 from scan.helpers.queries import (
     get_account_name,
     get_asset_details_owner,
     get_pool_id_for_account,
-    get_pool_id_for_block,
     get_total_accounts_count,
     get_total_circulating,
     check_is_contract,
 )
 from scan.views.assets import fill_data_asset_trade, fill_data_asset_transfer
-from scan.views.base import IntSlugDetailView
+from scan.views.base import IntSlugDetailView, SectionsMixin
+from scan.views.blocks import fill_data_blocks
 from scan.views.transactions import fill_data_transaction
 from scan.templatetags.burst_tags import cashback_amount
 
@@ -54,7 +62,190 @@ class AccountsListView(ListView):
         return context
 
 
-class AddressDetailView(IntSlugDetailView):
+def count_of(queryset) -> Subquery:
+    """Scalar subquery counting the rows of queryset, for one query with
+    several counts"""
+    return Subquery(
+        queryset.order_by().annotate(cnt=Func(F("db_id"), function="COUNT")).values("cnt"),
+        output_field=IntegerField(),
+    )
+
+
+def address_summary(account_id: int) -> dict:
+    """Annotations of the account with the counts of every tab"""
+    return {
+        "txs_cnt": count_of(
+            Transaction.objects.filter(Q(sender_id=account_id) | Q(recipient_id=account_id))
+        ),
+        "indirects_cnt": count_of(IndirectIncoming.objects.filter(account_id=account_id)),
+        "assets_cnt": count_of(AccountAsset.objects.filter(account_id=account_id, latest=True)),
+        "assets_trades_cnt": count_of(
+            Trade.objects.filter(Q(buyer_id=account_id) | Q(seller_id=account_id))
+        ),
+        "assets_transfers_cnt": count_of(
+            AssetTransfer.objects.filter(Q(sender_id=account_id) | Q(recipient_id=account_id))
+        ),
+        "mined_blocks_cnt": count_of(Block.objects.filter(generator_id=account_id)),
+        "alias_cnt": count_of(Alias.objects.filter(account_id=account_id, latest=True)),
+        "ats_cnt": count_of(At.objects.filter(creator_id=account_id)),
+        "subscription_cnt": count_of(
+            Subscription.objects.filter(sender_id=account_id, latest=True)
+        ),
+    }
+
+
+def get_address_summary(account_id: int) -> dict:
+    """Counts of every tab of the account in one query, cached until the
+    next block. Empty for an unknown account."""
+    height = CachingLastHeight().cached_data
+    key = f"address_summary:{account_id}:{height}"
+    summary = cache.get(key)
+    if summary is None:
+        annotations = address_summary(account_id)
+        summary = (
+            Account.objects.using("java_wallet")
+            .filter(id=account_id, latest=True)
+            .annotate(**annotations)
+            .values(*annotations)
+            .first()
+        )
+        if summary is None:
+            return {}
+        cache.set(key, summary, 3600)
+    return summary
+
+
+def address_transactions(account_id: int, txs_cnt: int) -> dict:
+    indirects_query = (
+        IndirectIncoming.objects.using("java_wallet")
+        .values_list("transaction_id", flat=True)
+        .filter(account_id=account_id)
+    )
+    txs_query = (
+        Transaction.objects.using("java_wallet")
+        .filter(Q(sender_id=account_id) | Q(recipient_id=account_id))
+    )
+    if indirects_query.exists():
+        txs_indirects = (
+            Transaction.objects.using("java_wallet")
+            .filter(id__in=indirects_query)
+        )
+        txs_query = txs_query.union(txs_indirects)
+
+    txs = txs_query.order_by("-height")[:min(txs_cnt, 15)]
+    for t in txs:
+        fill_data_transaction(t, list_page=True)
+
+    return {"txs": txs}
+
+
+def address_cashbacks(account_id: int) -> dict:
+    if account_id == 0:
+        # most transactions have no cashback
+        return {"cbs": [], "cbs_cnt": 0, "total_cashback": 0}
+    txs = Transaction.objects.using("java_wallet").filter(cash_back_id=account_id)
+    totals = txs.aggregate(cnt=Count("db_id"), fee=Sum("fee"))
+    cbs = list(txs.order_by("-height")[:15])
+    return {
+        "cbs": cbs,
+        "cbs_cnt": totals["cnt"],
+        "total_cashback": cashback_amount(totals["fee"] or 0),
+    }
+
+
+def address_aliases(account_id: int) -> dict:
+    aliases = list(
+        Alias.objects.using("java_wallet")
+        .filter(account_id=account_id, latest=True)
+        .order_by("alias_name")[:25]
+    )
+    return {"aliases": aliases}
+
+
+def address_subscriptions(account_id: int) -> dict:
+    subscriptions = list(
+        Subscription.objects.using("java_wallet")
+        .filter(sender_id=account_id, latest=True)
+        .order_by("-height")[:25]
+    )
+    return {"subscriptions": subscriptions}
+
+
+def address_assets(account_id: int) -> dict:
+    assets = list(
+        AccountAsset.objects.using("java_wallet")
+        .filter(account_id=account_id, latest=True)
+        .order_by("-db_id")
+    )
+    for asset in assets:
+        asset.name, asset.decimals, asset.total_quantity, asset.mintable, asset.owner_id = get_asset_details_owner(asset.asset_id)
+    return {"assets": assets}
+
+
+def address_assets_transfers(account_id: int) -> dict:
+    assets_transfers = list(
+        AssetTransfer.objects.using("java_wallet")
+        .filter(Q(sender_id=account_id) | Q(recipient_id=account_id))
+        .order_by("-height")[:15]
+    )
+    for transfer in assets_transfers:
+        fill_data_asset_transfer(transfer)
+    return {"assets_transfers": assets_transfers}
+
+
+def address_assets_trades(account_id: int) -> dict:
+    assets_trades = list(
+        Trade.objects.using("java_wallet")
+        .filter(Q(buyer_id=account_id) | Q(seller_id=account_id))
+        .order_by("-height")[:15]
+    )
+    for trade in assets_trades:
+        fill_data_asset_trade(trade)
+    return {"assets_trades": assets_trades}
+
+
+def address_ats(account_id: int) -> dict:
+    ats = list(
+        At.objects.using("java_wallet")
+        .filter(creator_id=account_id)
+        .order_by("-height")[:15]
+    )
+    for at in ats:
+        at.creator_name = get_account_name(account_id)
+    return {"ats": ats}
+
+
+def address_mined_blocks(account_id: int) -> dict:
+    mined_blocks = list(
+        Block.objects.using("java_wallet")
+        .filter(generator_id=account_id)
+        .order_by("-height")[:15]
+    )
+    fill_data_blocks(mined_blocks)
+    return {"mined_blocks": mined_blocks}
+
+
+# tabs loaded on demand, rendered with accounts/sections/<name>.html
+ADDRESS_SECTIONS = {
+    "asset-hold": address_assets,
+    "asset-trades": address_assets_trades,
+    "asset-transfer": address_assets_transfers,
+    "blocks": address_mined_blocks,
+    "alias": address_aliases,
+    "ats": address_ats,
+    "cashback": address_cashbacks,
+    "subscription": address_subscriptions,
+}
+
+
+def address_pool(account_id: int) -> dict:
+    pool_id = get_pool_id_for_account(account_id)
+    if not pool_id:
+        return {}
+    return {"pool_id": pool_id, "pool_name": get_account_name(pool_id)}
+
+
+class AddressDetailView(SectionsMixin, IntSlugDetailView):
     model = Account
     queryset = Account.objects.using("java_wallet").filter(latest=True).all()
     template_name = "accounts/detail.html"
@@ -62,10 +253,27 @@ class AddressDetailView(IntSlugDetailView):
     slug_field = "id"
     slug_url_kwarg = "id"
 
+    def get_queryset(self):
+        account_id = int(self.kwargs[self.slug_url_kwarg])
+        self.counters = None
+        if settings.ACCOUNT_COUNTERS:
+            self.counters = get_account_counters(account_id)
+        if self.counters is None:
+            self.counters = get_address_summary(account_id)
+        return super().get_queryset()
+
+    def get_sections(self, obj) -> dict:
+        sections = {"pool": partial(address_pool, obj.id)}
+        txs_cnt = obj.txs_cnt + obj.indirects_cnt
+        if txs_cnt:
+            sections["transactions"] = partial(address_transactions, obj.id, txs_cnt)
+        return sections
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         obj = context[self.context_object_name]
+        for name, value in self.counters.items():
+            setattr(obj, name, value)
 
         # To also show contract names when checking as an account
         if not obj.name:
@@ -73,183 +281,43 @@ class AddressDetailView(IntSlugDetailView):
 
         obj.is_contract = check_is_contract(obj.id)
 
-        # transactions
-        indirects_query = (
-            IndirectIncoming.objects.using("java_wallet")
-            .values_list('transaction_id', flat=True)
-            .filter(account_id=obj.id)
-        )
-        indirects_count = indirects_query.count()
-
-        txs_query = (
-            Transaction.objects.using("java_wallet")
-            .filter(Q(sender_id=obj.id) | Q(recipient_id=obj.id))
-        )
-        txs_cnt = txs_query.count() + indirects_count
-
-        if indirects_count > 0:
-            txs_indirects = (
-                Transaction.objects.using("java_wallet")
-                .filter(id__in=indirects_query)
-            )
-            txs_query = txs_query.union(txs_indirects)
-
-        txs = txs_query.order_by("-height")[:min(txs_cnt, 15)]
-
-        for t in txs:
-            fill_data_transaction(t, list_page=True)
-
-        context["txs"] = txs
+        txs_cnt = obj.txs_cnt + obj.indirects_cnt
         context["txs_cnt"] = txs_cnt
-        
-        # cashback
-        if obj.id == 0:
-            cbs =0
-            cbs_cnt = 0
-            total_cashback = 0 
-        else:
-            cash_query = (
-                Transaction.objects.using("java_wallet")
-                .filter(Q(cash_back_id=obj.id)))
-            
-            cbs_cnt = cash_query.count()
-            cbs = cash_query.order_by("-height")[:min(cbs_cnt, 15)]
-            total_cashback = 0 
-            for cb in cash_query:
-                total_cashback += cashback_amount(cb.fee)
-        
-        context["total_cashback"]=total_cashback
-        context["cbs"] = cbs
-        context["cbs_cnt"] = cbs_cnt
-
-        # aliases
-
-        alias_query = (
-            Alias.objects.using("java_wallet")
-            .filter(account_id=obj.id, latest=True)
-            .order_by("alias_name")
-        )
-            
-        alias_cnt = alias_query.count()
-        aliases = alias_query
-        
-        context["aliases"] = aliases[:25]
-        context["alias_cnt"] = alias_cnt
-
-        # subscriptions
-
-        subscription_query = (
-            Subscription.objects.using("java_wallet")
-            .filter(sender_id=obj.id, latest=True)
-            .order_by("-height")
-        )
-            
-        subscription_cnt = subscription_query.count()
-        subscriptions = subscription_query
-        
-        context["subscriptions"] = subscriptions[:25]
-        context["subscription_cnt"] = subscription_cnt
-
-        # assets
-
-        assets_cnt = (
-            AccountAsset.objects.using("java_wallet")
-            .filter(account_id=obj.id, latest=True)
-            .count()
-        )
-        assets = (
-            AccountAsset.objects.using("java_wallet")
-            .filter(account_id=obj.id, latest=True)
-            .order_by("-db_id")[:assets_cnt]
-        )
-
-        for asset in assets:
-            asset.name, asset.decimals, asset.total_quantity, asset.mintable, asset.owner_id = get_asset_details_owner(asset.asset_id)
-        context["assets"] = assets
-        context["assets_cnt"] = assets_cnt
-
-        # assets transfer
-
-        assets_transfers_cnt = (
-            AssetTransfer.objects.using("java_wallet")
-            .filter(Q(sender_id=obj.id) | Q(recipient_id=obj.id))
-            .count()
-        )
-        assets_transfers = (
-            AssetTransfer.objects.using("java_wallet")
-            .using("java_wallet")
-            .filter(Q(sender_id=obj.id) | Q(recipient_id=obj.id))
-            .order_by("-height")[:min(assets_transfers_cnt, 15)]
-        )
-
-        for transfer in assets_transfers:
-            fill_data_asset_transfer(transfer)
 
-        context["assets_transfers"] = assets_transfers
-        context["assets_transfers_cnt"] = assets_transfers_cnt
+        for name in (
+            "assets_cnt",
+            "assets_trades_cnt",
+            "assets_transfers_cnt",
+            "mined_blocks_cnt",
+            "alias_cnt",
+            "ats_cnt",
+            "subscription_cnt",
+        ):
+            context[name] = getattr(obj, name)
+        # counted by the cashback tab unless the account counters have it
+        context["cbs_cnt"] = getattr(obj, "cbs_cnt", None)
+        context["sections"] = ADDRESS_SECTIONS
+
+        context.update(self.load_sections(obj))
+        if context.get("pool_id"):
+            obj.pool_id = context["pool_id"]
+            obj.pool_name = context["pool_name"]
 
-        # assets trades
-
-        assets_trades_cnt = (
-            Trade.objects.using("java_wallet")
-            .filter(Q(buyer_id=obj.id) | Q(seller_id=obj.id))
-            .count()
-        )
-        assets_trades = (
-            Trade.objects.using("java_wallet")
-            .using("java_wallet")
-            .filter(Q(buyer_id=obj.id) | Q(seller_id=obj.id))
-            .order_by("-height")[:min(assets_trades_cnt, 15)]
-        )
-
-        for trade in assets_trades:
-            fill_data_asset_trade(trade)
-
-        context["assets_trades"] = assets_trades
-        context["assets_trades_cnt"] = assets_trades_cnt
-
-        # pool info
-
-        pool_id = get_pool_id_for_account(obj.id)
-        if pool_id:
-            obj.pool_id = pool_id
-            obj.pool_name = get_account_name(pool_id)
-
-
-        # ats
-
-        ats = (
-            At.objects.using("java_wallet")
-            .filter(creator_id=obj.id)
-            .order_by("-height")[:15]
-        )
-
-        for at in ats:
-            at.creator_name = get_account_name(obj.id)
-
-        context["ats"] = ats
-        context["ats_cnt"] = (
-            At.objects.using("java_wallet").filter(creator_id=obj.id).count()
-        )
-
-
-        # blocks
-
-        mined_blocks = (
-            Block.objects.using("java_wallet")
-            .filter(generator_id=obj.id)
-            .order_by("-height")[:15]
-        )
+        return context
 
-        for block in mined_blocks:
-            pool_id = get_pool_id_for_block(block)
-            if pool_id:
-                block.pool_id = pool_id
-                block.pool_name = get_account_name(pool_id)
 
-        context["mined_blocks"] = mined_blocks
-        context["mined_blocks_cnt"] = (
-            Block.objects.using("java_wallet").filter(generator_id=obj.id).count()
-        )
-
-        return context
+@require_http_methods(["GET"])
+def address_section_view(request, id, section):
+    """One tab of the address page, cached until the next block"""
+    if not id.isdigit() or section not in ADDRESS_SECTIONS:
+        raise Http404
+
+    height = CachingLastHeight().cached_data
+    key = f"address_section:{id}:{section}:{height}"
+    html = cache.get(key)
+    if html is None:
+        context = ADDRESS_SECTIONS[section](int(id))
+        context["address"] = {"id": int(id)}
+        html = render_to_string(f"accounts/sections/{section}.html", context, request)
+        cache.set(key, html, 3600)
+    return HttpResponse(html)
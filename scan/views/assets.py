@@ -1,17 +1,18 @@
-from datetime import datetime
 import os
 import simplejson as json
 import sys
+from functools import partial
 from django.db.models import Q
 from django.http import Http404
 from django.views.generic import ListView
 from config.settings import BLOCKED_ASSETS, PHISHING_ASSETS, FEATURED_ASSETS
 
 from java_wallet.models import AccountAsset, Asset, AssetTransfer, Trade,Transaction
+from scan.asset_stats import LEADERBOARDS, get_asset_stats
 from scan.caching_paginator import CachingPaginator
+from scan.models import AssetStats
 from scan.helpers.queries import get_account_name, get_asset_details, get_asset_details_owner
-from scan.templatetags.burst_tags import burst_amount, mul_decimals
-from scan.views.base import IntSlugDetailView
+from scan.views.base import IntSlugDetailView, SectionsMixin
 from scan.views.filters.assets import AssetTransferFilter, TradeFilter
 
   
@@ -44,12 +45,30 @@ class AssetListView(ListView):
     paginate_by = 25
     ordering = "-height"
 
+    def get_queryset(self):
+        self.sort = self.request.GET.get("sort")
+        if self.sort in LEADERBOARDS:
+            return AssetStats.objects.order_by(*LEADERBOARDS[self.sort])
+        return super().get_queryset()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         obj = context[self.context_object_name]
 
         context["BLOCKED_ASSETS"] = BLOCKED_ASSETS
         context["PHISHING_ASSETS"] = PHISHING_ASSETS
+        context["sort"] = self.sort if self.sort in LEADERBOARDS else None
+
+        if context["sort"]:
+            # a page of the leaderboard, the assets of its rows in order
+            stats = {s.asset_id: s for s in obj}
+            assets = Asset.objects.using("java_wallet").in_bulk(list(stats), field_name="id")
+            obj = [assets[asset_id] for asset_id in stats if asset_id in assets]
+        else:
+            stats = AssetStats.objects.in_bulk([t.id for t in obj])
+        for t in obj:
+            t.stats = stats.get(t.id)
+        context[self.context_object_name] = obj
 
         for t in obj:
             t.account_name = get_account_name(t.account_id)
@@ -163,7 +182,94 @@ class AssetHoldersListView(ListView):
 
         return context
 
-class AssetDetailView(IntSlugDetailView):
+def asset_transfers(asset_id: int, count: int = None) -> dict:
+    assets_transfers = list(
+        AssetTransfer.objects.using("java_wallet")
+        .filter(asset_id=asset_id)
+        .order_by("-height")[:15]
+    )
+
+    for transfer in assets_transfers:
+        fill_data_asset_transfer(transfer)
+
+    return {
+        "assets_transfers": assets_transfers,
+        "assets_transfers_cnt": count if count is not None else (
+            AssetTransfer.objects.using("java_wallet").filter(asset_id=asset_id).count()
+        ),
+    }
+
+
+def asset_trades(asset_id: int, count: int = None) -> dict:
+    assets_trades = list(
+        Trade.objects.using("java_wallet")
+        .filter(asset_id=asset_id)
+        .order_by("-height")[:15]
+    )
+
+    for trade in assets_trades:
+        fill_data_asset_trade(trade)
+
+    return {
+        "assets_trades": assets_trades,
+        "assets_trades_cnt": count if count is not None else (
+            Trade.objects.using("java_wallet").filter(asset_id=asset_id).count()
+        ),
+    }
+
+
+def _asset_txs(asset_id: int, subtype: int) -> list:
+    # the asset id is the start of the attachment, not a column
+    txs = (
+        Transaction.objects.using("java_wallet")
+        .filter(type=2, subtype=subtype)
+        .order_by("-height")
+    )
+    return [
+        tx for tx in txs
+        if int.from_bytes(tx.attachment_bytes[1:9], byteorder=sys.byteorder) == asset_id
+    ]
+
+
+def asset_mintings(asset_id: int) -> dict:
+    asset_minting_tx = _asset_txs(asset_id, 6)
+    return {
+        "assets_minting_cnt": len(asset_minting_tx),
+        "assets_minting_tx": asset_minting_tx[:15],
+    }
+
+
+def asset_distributions(asset_id: int) -> dict:
+    assets_distribution_tx = _asset_txs(asset_id, 8)
+    return {
+        "assets_distribution_cnt": len(assets_distribution_tx),
+        "assets_distribution_tx": assets_distribution_tx[:15],
+    }
+
+
+def asset_holders(asset_id: int, count: int = None) -> dict:
+    assets_holders_cnt = count if count is not None else (
+        AccountAsset.objects.using("java_wallet")
+        .filter(asset_id=asset_id, latest=True)
+        .count()
+    )
+    assets_holders = list(
+        AccountAsset.objects.using("java_wallet")
+        .filter(asset_id=asset_id, latest=True)
+        .order_by("-quantity")[:15]
+    )
+
+    for asset in assets_holders:
+        asset.name, asset.decimals, asset.total_quantity, asset.mintable, asset.owner_id = get_asset_details_owner(asset.asset_id)
+        asset.account_name = get_account_name(asset.account_id)
+
+    return {
+        "assets_holders": assets_holders,
+        "assets_holders_cnt": assets_holders_cnt,
+    }
+
+
+class AssetDetailView(SectionsMixin, IntSlugDetailView):
     model = Asset
     queryset = Asset.objects.using("java_wallet").all()
     template_name = "assets/detail.html"
@@ -171,126 +277,30 @@ class AssetDetailView(IntSlugDetailView):
     slug_field = "id"
     slug_url_kwarg = "id"
 
+    def get_sections(self, obj) -> dict:
+        # counts of the stats table, live counts until it has the asset
+        stats = self.stats
+        return {
+            "transfers": partial(asset_transfers, obj.id, stats and stats.transfers),
+            "trades": partial(asset_trades, obj.id, stats and stats.trades),
+            "mintings": partial(asset_mintings, obj.id),
+            "distributions": partial(asset_distributions, obj.id),
+            "holders": partial(asset_holders, obj.id, stats and stats.holders),
+        }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         obj = context[self.context_object_name]
         obj.account_name = get_account_name(obj.account_id)
-        name, decimals, total_quantity, mintable = get_asset_details(obj.id)
-
-        # assets transfer
-
-        assets_transfers = (
-            AssetTransfer.objects.using("java_wallet")
-            .using("java_wallet")
-            .filter(asset_id=obj.id)
-            .order_by("-height")[:15]
-        )
-
-        for transfer in assets_transfers:
-            fill_data_asset_transfer(transfer)
-
-        context["assets_transfers"] = assets_transfers
-        context["assets_transfers_cnt"] = (
-            AssetTransfer.objects.using("java_wallet").filter(asset_id=obj.id).count()
-        )
-
-        # assets trades
-
-        assets_trades = (
-            Trade.objects.using("java_wallet")
-            .using("java_wallet")
-            .filter(asset_id=obj.id)
-            .order_by("-height")[:15]
-        )
-
-        for trade in assets_trades:
-            fill_data_asset_trade(trade)
-
-        context["assets_trades"] = assets_trades
-        context["assets_trades_cnt"] = (
-            Trade.objects.using("java_wallet").filter(asset_id=obj.id).count()
-        )
-
-        # asset minting
-        mint_tx  = (
-            Transaction.objects.using("java_wallet")
-            .filter(type=2,subtype =6).order_by("-height")
-        )        
-        assets_minting_cnt = 0
-        asset_minting_tx =[]
-        for mints in mint_tx:
-            asset_id = int.from_bytes(mints.attachment_bytes[1:9], byteorder=sys.byteorder)
-            if asset_id == obj.id:
-                assets_minting_cnt += 1
-                asset_minting_tx.append(mints)
-        context["assets_minting_cnt"] = assets_minting_cnt
-        context["assets_minting_tx"] = asset_minting_tx[:15]
-
-        # asset distributions
-        assets_distribution_cnt = 0
-        assets_distribution_tx =[]
-        distribution_tx_qs = Transaction.objects.using("java_wallet").filter(type=2,subtype =8).order_by("-height")           
-            
-        for distrib_tx in distribution_tx_qs:
-            asset_id = int.from_bytes(distrib_tx.attachment_bytes[1:9], byteorder=sys.byteorder)
-            if asset_id == obj.id:
-                assets_distribution_cnt += 1
-                assets_distribution_tx.append(distrib_tx)
-
-        context["assets_distribution_cnt"] = assets_distribution_cnt
-        context["assets_distribution_tx"] = assets_distribution_tx[:15]
-
-        # asset holders
-        assets_holders_cnt = (
-            AccountAsset.objects.using("java_wallet")
-            .filter(asset_id=obj.id, latest=True)
-            .count()
-        )
-        assets_holders = (
-            AccountAsset.objects.using("java_wallet")
-            .filter(asset_id=obj.id, latest=True)
-            .order_by("-quantity")[:15]
-        )
-
-        for asset in assets_holders:
-            asset.name, asset.decimals, asset.total_quantity, asset.mintable, asset.owner_id = get_asset_details_owner(asset.asset_id)
-            asset.account_name = get_account_name(asset.account_id)
-
-
-
-        context["assets_holders"] = assets_holders
-        context["assets_holders_cnt"] = assets_holders_cnt
-
-
-        # price history
-
-        price_query = (
-            Trade.objects.using("java_wallet")
-            .using("java_wallet")
-            .filter(asset_id=obj.id)
-            .order_by("-height")[:2000]
-        )
 
-        price_history = "["
-        old_time = None
-        last_price = None
-        now = datetime.now().strftime("%s")
-        for trade in reversed(price_query):
-            price = burst_amount(mul_decimals(trade.price, decimals))
-            time = trade.timestamp.strftime("%s")
-            last_price = price
-            if time != old_time and time != now:
-                # one per day
-                price_history += "[" + time + "000," + str(price) + "],"
-                old_time = time
-        
-        # add now as latest price
-        if last_price:
-            price_history += "[" + now + "000," + str(price) + "],"
-
-        price_history += "]"
-
-        context["price_history"] = price_history
+        self.stats = get_asset_stats(obj.id)
+        context["asset_stats"] = self.stats
+        context.update(self.load_sections(obj))
+        if self.stats:
+            # also while their sections are loading
+            context["assets_transfers_cnt"] = self.stats.transfers
+            context["assets_trades_cnt"] = self.stats.trades
+            context["assets_holders_cnt"] = self.stats.holders
 
         return context
 
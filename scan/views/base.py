@@ -1,7 +1,25 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
 from django.http import Http404
 from django.utils.translation import gettext as _
 from django.views.generic import DetailView
 
+from scan.caching_data.last_height import CachingLastHeight
+
+logger = logging.getLogger(__name__)
+
+# shared by all requests, so slow sections queue up instead of piling up
+# connections to the node database
+_section_pool = ThreadPoolExecutor(
+    max_workers=settings.SECTION_LOADER_THREADS, thread_name_prefix="section"
+)
+
 
 class IntSlugDetailView(DetailView):
     def get_object(self, queryset=None):
@@ -13,3 +31,84 @@ class IntSlugDetailView(DetailView):
             )
 
         return super().get_object(queryset)
+
+
+def _run_section(loader) -> dict:
+    # pool threads keep their own connections like request threads do,
+    # dropped when broken or older than CONN_MAX_AGE
+    close_old_connections()
+    try:
+        return loader()
+    finally:
+        close_old_connections()
+
+
+def load_sections(loaders: dict, timeouts: dict) -> tuple:
+    """Runs independent section loaders concurrently. Returns the merged
+    context of the sections done within their timeout and the futures of
+    the others by name."""
+    start = time.monotonic()
+    futures = {
+        name: _section_pool.submit(_run_section, loader)
+        for name, loader in loaders.items()
+    }
+    context, late = {}, {}
+    for name, future in futures.items():
+        remaining = start + timeouts[name] - time.monotonic()
+        try:
+            context.update(future.result(timeout=max(remaining, 0)))
+        except TimeoutError:
+            late[name] = future
+    return context, late
+
+
+def _cache_late_section(key: str, future) -> None:
+    if future.exception() is not None:
+        logger.warning("Section %s failed: %r", key, future.exception())
+        return
+    cache.set(key, future.result(), 3600)
+
+
+class SectionsMixin:
+    """Detail view made of independent sections loaded concurrently.
+
+    A section past its deadline is rendered as loading, its name is in
+    `loading_sections`. It still runs and the next request of the page
+    takes its result from the cache until the next block.
+    """
+
+    section_timeout = settings.SECTION_TIMEOUT
+    # per section overrides of section_timeout
+    section_timeouts = {}
+
+    def get_sections(self, obj) -> dict:
+        """Section names to loaders returning their part of the context"""
+        raise NotImplementedError
+
+    def _section_key(self, obj, name: str, height: int) -> str:
+        return f"section:{type(self).__name__}:{obj.id}:{name}:{height}"
+
+    def load_sections(self, obj) -> dict:
+        height = CachingLastHeight().cached_data
+        loaders = self.get_sections(obj)
+        keys = {name: self._section_key(obj, name, height) for name in loaders}
+
+        context = {}
+        cached = cache.get_many(list(keys.values()))
+        for name, key in keys.items():
+            if key in cached:
+                context.update(cached[key])
+                del loaders[name]
+
+        loaded, late = load_sections(
+            loaders,
+            {name: self.section_timeouts.get(name, self.section_timeout) for name in loaders},
+        )
+        context.update(loaded)
+        for name, future in late.items():
+            # not started yet, the next request starts it again
+            if not future.cancel():
+                future.add_done_callback(partial(_cache_late_section, keys[name]))
+
+        context["loading_sections"] = list(late)
+        return context
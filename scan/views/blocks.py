@@ -1,24 +1,38 @@
 from django.views.generic import ListView
 
 from java_wallet.models import Block
+from scan.block_index import block_index
 from scan.caching_data.last_height import CachingLastHeight
 from scan.caching_paginator import CachingPaginator
-from scan.helpers.queries import (
-    get_account_name,
-    get_pool_id_for_block,
-    get_txs_count_in_block,
-)
+from scan.helpers.queries import get_pool_ids_for_blocks, get_txs_count_in_blocks
+from scan.mempool import get_account_names
 from scan.views.base import IntSlugDetailView
 from scan.views.filters.blocks import BlockFilter
 
 
+def fill_data_blocks(blocks: list) -> None:
+    """fill_data_block of a page of blocks with a few queries for all"""
+    txs_counts = {b.id: block_index.get("tx_count", b.height) for b in blocks}
+    missing = [block_id for block_id, cnt in txs_counts.items() if cnt is None]
+    if missing:
+        txs_counts.update(get_txs_count_in_blocks(missing))
+
+    pool_ids = get_pool_ids_for_blocks(blocks)
+    names = get_account_names(
+        {b.generator_id for b in blocks} | {p for p in pool_ids.values() if p}
+    )
+
+    for b in blocks:
+        b.txs_cnt = txs_counts[b.id]
+        b.generator_name = names.get(b.generator_id)
+        pool_id = pool_ids[b.id]
+        if pool_id:
+            b.pool_id = pool_id
+            b.pool_name = names.get(pool_id)
+
+
 def fill_data_block(obj):
-    obj.txs_cnt = get_txs_count_in_block(obj.id)
-    obj.generator_name = get_account_name(obj.generator_id)
-    pool_id = get_pool_id_for_block(obj)
-    if pool_id:
-        obj.pool_id = pool_id
-        obj.pool_name = get_account_name(pool_id)
+    fill_data_blocks([obj])
 
 
 class BlockListView(ListView):
@@ -36,9 +50,7 @@ class BlockListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["last_height"] = CachingLastHeight().cached_data
-        obj = context[self.context_object_name]
-        for b in obj:
-            fill_data_block(b)
+        fill_data_blocks(list(context[self.context_object_name]))
 
         return context
 
@@ -3,7 +3,7 @@ from django.views.decorators.cache import cache_page
 
 from java_wallet.models import Block, Transaction
 from scan.helpers.queries import get_unconfirmed_transactions
-from scan.views.blocks import fill_data_block
+from scan.views.blocks import fill_data_blocks
 from scan.views.transactions import fill_data_transaction
 
 
@@ -30,8 +30,7 @@ def index(request):
 
     blocks = Block.objects.using("java_wallet").order_by("-height")[:5]
 
-    for b in blocks:
-        fill_data_block(b)
+    fill_data_blocks(list(blocks))
 
     context = {
         "txs": txs,
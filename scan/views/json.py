@@ -3,9 +3,13 @@ from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
 from django.views.generic import DetailView, ListView
 from config.settings import BRS_BOOTSTRAP_PEERS
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.http import JsonResponse
+from scan.asset_candles import RESOLUTIONS, get_candles
+from scan.caching_data.fee_stats import CachingFeeStats
+from scan.helpers.queries import get_asset_details
 from scan.models import PeerMonitor
+from scan.templatetags.burst_tags import burst_amount, div_decimals, mul_decimals
 from cache_memoize import cache_memoize
 
 from java_wallet.models import (
@@ -51,3 +55,37 @@ def getallNodejson(request):
 def getSNRjson(request):
     snrraw = list(PeerMonitor.objects.all().values_list('announced_address', 'real_ip', 'reward_state', 'reward_time'))
     return JsonResponse(snrraw, safe=False)
+
+@require_http_methods(["GET"])
+def getFeesjson(request):
+    # precomputed with the pending transactions, fees in NQT
+    return JsonResponse(CachingFeeStats().cached_data)
+
+@require_http_methods(["GET"])
+def getAssetCandlesjson(request, asset_id):
+    # ?resolution=1h|1d|1w&from=&to= in unix time, prices in coins per token
+    resolution = request.GET.get("resolution", "1d")
+    try:
+        start, end = (
+            int(request.GET[name]) if name in request.GET else None
+            for name in ("from", "to")
+        )
+    except ValueError:
+        return JsonResponse({"error": "from and to are unix times"}, status=400)
+    if resolution not in RESOLUTIONS:
+        return JsonResponse({"error": f"resolution is one of {', '.join(RESOLUTIONS)}"}, status=400)
+
+    details = get_asset_details(asset_id)
+    if not details:
+        raise Http404
+    decimals = details[1]
+
+    candles = [
+        [period * 1000]
+        + [burst_amount(mul_decimals(price, decimals)) for price in prices]
+        + [div_decimals(volume, decimals), trades]
+        for period, *prices, volume, trades in get_candles(
+            asset_id, RESOLUTIONS[resolution], start, end
+        )
+    ]
+    return JsonResponse({"asset": str(asset_id), "resolution": resolution, "candles": candles})
@@ -1,7 +1,11 @@
 from django.shortcuts import render
 
+from scan.caching_data.fee_stats import CachingFeeStats
 from scan.helpers.queries import get_unconfirmed_transactions
 
 def pending_transactions(request):
-    context = {"txs_pending": get_unconfirmed_transactions()}
+    context = {
+        "txs_pending": get_unconfirmed_transactions(),
+        "fees": CachingFeeStats().cached_data,
+    }
     return render(request, "txs_pending/list.html", context)
@@ -1,3 +1,5 @@
+from functools import partial
+
 from django.db.models import F, OuterRef, Q
 from django.views.generic import ListView
 
@@ -17,8 +19,8 @@ from scan.helpers.queries import (
     get_forged_blocks_of_pool,
     get_timestamp_of_block,
 )
-from scan.views.base import IntSlugDetailView
-from scan.views.transactions import fill_data_transaction
+from scan.views.accounts import address_transactions
+from scan.views.base import IntSlugDetailView, SectionsMixin
 
 def fill_data_pool(pool):
     pool["url"] = get_description_url(pool["pool_id"])
@@ -107,7 +109,45 @@ class PoolListView(ListView):
 
         return context
 
-class PoolDetailView(IntSlugDetailView):
+def pool_transactions(account_id: int) -> dict:
+    txs_cnt = (
+        Transaction.objects.using("java_wallet")
+        .filter(Q(sender_id=account_id) | Q(recipient_id=account_id))
+        .count()
+    ) + IndirectIncoming.objects.using("java_wallet").filter(account_id=account_id).count()
+
+    context = {"txs_cnt": txs_cnt}
+    if txs_cnt:
+        context.update(address_transactions(account_id, txs_cnt))
+    return context
+
+
+def pool_miners(pool_id: int) -> dict:
+    miners = list(
+        RewardRecipAssign.objects.using("java_wallet")
+        .filter(~Q(recip_id=F('account_id')))
+        .filter(recip_id=pool_id)
+        .filter(latest=1)
+        .values("recip_id", "account_id", "height")
+        .order_by('-height')[:25]
+    )
+    for miner in miners:
+        miner["block_timestamp"] = get_timestamp_of_block(miner["height"])
+
+    return {"miners": miners, "miners_cnt": get_count_of_miners(pool_id)}
+
+
+def pool_forged_blocks(pool_id: int) -> dict:
+    forged_blocks = get_forged_blocks_of_pool(pool_id)
+    forged_blocks_cnt = forged_blocks.count()
+    forged_blocks = list(forged_blocks[:25])
+    for forged_block in forged_blocks:
+        forged_block["block_timestamp"] = get_timestamp_of_block(forged_block["block"])
+
+    return {"forged_blocks": forged_blocks, "forged_blocks_cnt": forged_blocks_cnt}
+
+
+class PoolDetailView(SectionsMixin, IntSlugDetailView):
     model = Account
     queryset = Account.objects.using("java_wallet").filter(latest=True).all()
     template_name = "pools/detail.html"
@@ -115,6 +155,13 @@ class PoolDetailView(IntSlugDetailView):
     slug_field = "id"
     slug_url_kwarg = "id"
 
+    def get_sections(self, obj) -> dict:
+        return {
+            "transactions": partial(pool_transactions, obj.id),
+            "miners": partial(pool_miners, obj.id),
+            "forged_blocks": partial(pool_forged_blocks, obj.id),
+        }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         obj = context[self.context_object_name]
@@ -123,63 +170,6 @@ class PoolDetailView(IntSlugDetailView):
         if not obj.name:
             obj.name = get_account_name(obj.id)
 
-        # transactions
-        indirects_query = (
-            IndirectIncoming.objects.using("java_wallet")
-            .values_list('transaction_id', flat=True)
-            .filter(account_id=obj.id)
-        )
-        indirects_count = indirects_query.count()
-
-        txs_query = (
-            Transaction.objects.using("java_wallet")
-            .filter(Q(sender_id=obj.id) | Q(recipient_id=obj.id))
-        )
-        txs_cnt = txs_query.count() + indirects_count
-
-        if indirects_count > 0:
-            txs_indirects = (
-                Transaction.objects.using("java_wallet")
-                .filter(id__in=indirects_query)
-            )
-            txs_query = txs_query.union(txs_indirects)
-
-        txs = txs_query.order_by("-height")[:min(txs_cnt, 15)]
-
-        for t in txs:
-            fill_data_transaction(t, list_page=True)
-
-        context["txs"] = txs
-        context["txs_cnt"] = txs_cnt
-
-        # Miners
-
-        miners_query = (
-            RewardRecipAssign.objects.using("java_wallet")
-            .filter(~Q(recip_id=F('account_id')))
-            .filter(recip_id=obj.id)
-            .filter(latest=1)
-            .values("recip_id", "account_id", "height")
-        )
-
-        miners = miners_query.order_by('-height')
-
-        miners = miners[:25]
-        for miner in miners:
-            miner["block_timestamp"] = get_timestamp_of_block(miner["height"])
-
-        context["miners"] = miners
-        context["miners_cnt"] = get_count_of_miners(obj.id)
-
-        # Forged blocks
-
-        forged_blocks = get_forged_blocks_of_pool(obj.id)
-        forged_blocks_cnt = forged_blocks.count()
-        forged_blocks = forged_blocks[:25]
-        for forged_block in forged_blocks:
-            forged_block["block_timestamp"] = get_timestamp_of_block(forged_block["block"])
-
-        context["forged_blocks"] = forged_blocks
-        context["forged_blocks_cnt"] = forged_blocks_cnt
+        context.update(self.load_sections(obj))
 
         return context
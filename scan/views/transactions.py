@@ -10,9 +10,10 @@ from scan.templatetags.burst_tags import burst_amount, num2rs, tx_load_recipient
 from burst.libs.multiout import MultiOutPack
 from java_wallet.models import IndirectIncoming, Transaction
 from scan.caching_data.last_height import CachingLastHeight
+from scan.caching_data.pending_txs import get_pending_tx, is_known_missing_tx, set_missing_tx
 from scan.caching_data.total_txs_count import CachingTotalTxsCount
 from scan.caching_paginator import CachingPaginator
-from scan.helpers.queries import get_account_name, get_unconfirmed_transactions
+from scan.helpers.queries import get_account_name
 from scan.views.base import IntSlugDetailView
 from scan.views.filters.transactions import TxFilter
 
@@ -114,20 +115,19 @@ class TxDetailView(IntSlugDetailView):
     slug_url_kwarg = "id"
 
     def get_object(self, queryset=None):
+        tx_id = self.kwargs.get(self.slug_url_kwarg)
+
         try:
             obj = super().get_object(queryset)
         except Http404 as e:
-            txs_pending = list(
-                filter(
-                    lambda x: x.get("transaction")
-                    == self.kwargs.get(self.slug_url_kwarg),
-                    get_unconfirmed_transactions(),
-                )
-            )
-            if not txs_pending:
+            # a tx confirmed since it was cached as missing is found above
+            if is_known_missing_tx(tx_id):
+                raise e
+            tx = get_pending_tx(tx_id)
+            if not tx:
+                set_missing_tx(tx_id)
                 raise e
 
-            tx = txs_pending[0]
             obj = Transaction(
                 id=int(tx["transaction"]),
                 deadline=tx["deadline"],